@@ -6,4 +6,4 @@ class AccountConfig(AppConfig):
     name = "app.account"
 
     def ready(self):
-        from app.account import signal  # noqa
+        from app.account import cache, signal  # noqa
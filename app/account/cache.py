@@ -0,0 +1,151 @@
+import copy
+import hashlib
+import time
+from datetime import datetime, timezone
+from typing import Iterable, List
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from core.singleflight import SingleFlight
+
+from .models import AccountModel
+
+
+class AccountCache:
+    """
+    accounts and their group names cached by id, so authenticating a request
+    and answering a conditional GET with 304 cost no query. entries are
+    dropped when an account or its groups change, and every change bumps the
+    collection version the account list is tagged with.
+
+    concurrent requests missing the same entry share the query filling it, the
+    fill is cheaper than a lock in redis so it is only shared within the
+    process.
+    """
+
+    account_key = "account:{account_id}"
+    groups_key = "account:{account_id}:groups"
+    version_key = "account:collection_version"
+
+    def __init__(self):
+        self.fills = SingleFlight("account")
+
+    def get(self, account_id: str) -> AccountModel:
+        key = self.account_key.format(account_id=account_id)
+        account = cache.get(key)
+        if account is None:
+            # the requests sharing the fill each get their own instance
+            account = copy.copy(
+                self.fills.do(key, lambda: self.fill_account(key, account_id))
+            )
+        return account
+
+    def group_names(self, account: AccountModel) -> List[str]:
+        key = self.groups_key.format(account_id=account.pk)
+        names = cache.get(key)
+        if names is None:
+            names = list(
+                self.fills.do(key, lambda: self.fill_group_names(key, account))
+            )
+        return names
+
+    # noinspection PyMethodMayBeStatic
+    def fill_account(self, key: str, account_id: str) -> AccountModel:
+        account = AccountModel.objects.get(pk=account_id)
+        cache.set(key, account, timeout=settings.ACCOUNT_CACHE_TIMEOUT)
+        return account
+
+    # noinspection PyMethodMayBeStatic
+    def fill_group_names(self, key: str, account: AccountModel) -> List[str]:
+        names = list(account.groups.values_list("name", flat=True))
+        cache.set(key, names, timeout=settings.ACCOUNT_CACHE_TIMEOUT)
+        return names
+
+    def invalidate(self, account_ids: Iterable):
+        keys = [
+            key.format(account_id=pk)
+            for pk in account_ids
+            for key in (self.account_key, self.groups_key)
+        ]
+
+        def drop():
+            cache.delete_many(keys)
+            cache.set(self.version_key, time.time_ns(), timeout=None)
+
+        drop()
+        # a request that read the old row before the commit may have cached it
+        transaction.on_commit(drop)
+
+    def collection_version(self) -> int:
+        """
+        the time of the last account change in nanoseconds, or of the first
+        read when the cache lost it
+        """
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = cache.get(self.version_key) or time.time_ns()
+        return version
+
+    def account_etag(self, request) -> str:
+        return self.etag(request, request.user.pk, request.user.updated_at.isoformat())
+
+    def collection_etag(self, request) -> str:
+        return self.etag(request, self.collection_version(), request.get_full_path())
+
+    def collection_last_modified(self, request) -> datetime:
+        return datetime.fromtimestamp(self.collection_version() / 1e9, timezone.utc)
+
+    @staticmethod
+    def etag(request, *parts) -> str:
+        # the browsable api and json representations are tagged apart
+        parts = (*parts, getattr(request, "accepted_media_type", ""))
+        digest = hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()
+        return f'W/"{digest[:32]}"'
+
+
+account_cache = AccountCache()
+
+
+@receiver(post_save, sender=AccountModel)
+@receiver(post_delete, sender=AccountModel)
+def invalidate_account(sender, instance, **kwargs):
+    account_cache.invalidate([instance.pk])
+
+
+@receiver(m2m_changed, sender=AccountModel.groups.through)
+def invalidate_account_groups(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        # a group about to lose all its accounts
+        account_ids = AccountModel.objects.filter(groups=instance).values_list(
+            "pk", flat=True
+        )
+    elif action in ("post_add", "post_remove", "post_clear"):
+        account_ids = (pk_set or []) if reverse else [instance.pk]
+    else:
+        return None
+    account_ids = list(account_ids)
+    if account_ids:
+        account_cache.invalidate(account_ids)
+    return None
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_group_members(sender, instance, **kwargs):
+    # the memberships of a deleted group cascade without m2m_changed
+    account_ids = list(
+        AccountModel.objects.filter(groups=instance).values_list("pk", flat=True)
+    )
+    if account_ids:
+        account_cache.invalidate(account_ids)
+    return None
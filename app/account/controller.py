@@ -4,18 +4,27 @@ from random import choices
 from string import digits
 
 import jwt
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.contrib.auth import authenticate
+from django.contrib.auth import aauthenticate, authenticate
 from django.contrib.auth.models import Group
 from django.core.cache import cache
+from django.db import transaction
 from jwt.exceptions import PyJWTError
 from rest_framework.request import Request
 
-from core.constants import AccountStatusEnum, GroupEnum
+from core.constants import (
+    AccountEventEnum,
+    AccountStatusEnum,
+    EmailTemplateEnum,
+    GroupEnum,
+)
+from core.event import EventNotificationHandler
 from core.exceptions import AppException
 from core.interfaces.notifications import Notifier
 from core.notifications import EmailNotificationHandler
 from core.services import KeycloakAuthService
+from core.tracing import traced_methods
 
 from .models import AccountModel
 from .repository import AccountRepository
@@ -31,6 +40,7 @@ from .serializer import (
 )
 
 
+@traced_methods()
 class AccountController(Notifier):
     def __init__(
         self,
@@ -71,6 +81,51 @@ class AccountController(Notifier):
                 url=verification_url,
             )
             updated_account.groups.add(Group.objects.get(name=GroupEnum.user.value))
+            self._publish_event(
+                event=AccountEventEnum.created,
+                account_id=updated_account.id,
+                data={
+                    "username": updated_account.username,
+                    "email": updated_account.email,
+                    "status": updated_account.status,
+                },
+            )
+            return AccountSerializer(updated_account)
+        raise AppException.ValidationException(error_message=serializer.errors)
+
+    async def acreate_account(self, obj_data: dict, verification_url: str):
+        serializer = CreateAccountSerializer(data=obj_data)
+        if serializer.is_valid():
+            data = serializer.data
+            data["status"] = AccountStatusEnum.inactive.value
+            account = await self.account_repository.acreate(data)
+            iam_account_id = await self.keycloak_auth_service.acreate_user(
+                obj_data={
+                    "username": str(account.id),
+                    "password": obj_data.get("password"),
+                    "email": data.get("email"),
+                }
+            )
+            updated_account = await self.account_repository.aupdate_by_id(
+                obj_id=account.id, obj_data={"iam_provider_id": iam_account_id}
+            )
+            # mails are rendered and handed to the notifier synchronously
+            await sync_to_async(self.send_account_verification_link)(
+                user_id=str(account.id),
+                url=verification_url,
+            )
+            await updated_account.groups.aadd(
+                await Group.objects.aget(name=GroupEnum.user.value)
+            )
+            await sync_to_async(self._publish_event)(
+                event=AccountEventEnum.created,
+                account_id=updated_account.id,
+                data={
+                    "username": updated_account.username,
+                    "email": updated_account.email,
+                    "status": updated_account.status,
+                },
+            )
             return AccountSerializer(updated_account)
         raise AppException.ValidationException(error_message=serializer.errors)
 
@@ -80,6 +135,14 @@ class AccountController(Notifier):
             raise AppException.BadRequestException(
                 error_message="email already verified"
             )
+        if self.pending_notification(
+            EmailNotificationHandler.template_key(
+                recipients=account.email,
+                template_name=EmailTemplateEnum.email_verification.value,
+            )
+        ):
+            # the link sent moments ago is still valid, skip signing a new one
+            return AccountSerializer(account)
         token = self.generate_token(
             payload={
                 "id": str(account.id),
@@ -89,13 +152,14 @@ class AccountController(Notifier):
         self._send_email(
             obj_data={
                 "email": account.email,
-                "template_name": "email_verification.html",
+                "template_name": EmailTemplateEnum.email_verification.value,
                 "metadata": {
                     "user_id": str(account.id),
                     "email": account.email,
                     "verification_link": f"{url}?token={token}",
                     "subject": "Verify Account Email",
                 },
+                "dedupe_window": settings.NOTIFICATION_DEDUPE_WINDOW,
             }
         )
         return AccountSerializer(account)
@@ -106,9 +170,13 @@ class AccountController(Notifier):
     def verify_account_email(self, token: str):
         try:
             payload: dict = self.decode_token(token)
-            return self.account_repository.update_by_id(
+            account = self.account_repository.update_by_id(
                 obj_id=payload.get("id"), obj_data={"is_email_verified": True}
             )
+            self._publish_event(
+                event=AccountEventEnum.email_verified, account_id=account.id
+            )
+            return account
         except (AppException.BadRequestException, AppException.NotFoundException):
             return None
 
@@ -178,6 +246,34 @@ class AccountController(Notifier):
             )
         raise AppException.ValidationException(error_message=serializer.errors)
 
+    async def alogin_account(self, request):
+        serializer = LoginAccountSerializer(data=request.data)
+        if serializer.is_valid():
+            data = serializer.validated_data
+            if account := await aauthenticate(
+                request=request,
+                username=data.get("username"),
+                password=data.get("password"),
+            ):
+                account = await self.ais_account_in_iam(
+                    account=account, password=data.get("password")
+                )
+                iam_token = await self.keycloak_auth_service.aget_token(
+                    obj_data={
+                        "username": str(account.id),
+                        "password": data.get("password"),
+                    }
+                )
+                await self.account_repository.aupdate_by_id(
+                    obj_id=account.id,
+                    obj_data={"last_login": datetime.now(timezone.utc)},
+                )
+                return iam_token
+            raise AppException.BadRequestException(
+                error_message="username or password invalid"
+            )
+        raise AppException.ValidationException(error_message=serializer.errors)
+
     def is_account_in_iam(self, account, password: str):
         if not account.iam_provider_id:
             iam_account_id = self.keycloak_auth_service.create_user(
@@ -192,6 +288,20 @@ class AccountController(Notifier):
             )
         return account
 
+    async def ais_account_in_iam(self, account, password: str):
+        if not account.iam_provider_id:
+            iam_account_id = await self.keycloak_auth_service.acreate_user(
+                obj_data={
+                    "username": str(account.id),
+                    "password": password,
+                    "email": account.email,
+                }
+            )
+            return await self.account_repository.aupdate_by_id(
+                obj_id=account.id, obj_data={"iam_provider_id": iam_account_id}
+            )
+        return account
+
     def refresh_user_token(self, request):
         serializer = RefreshTokenSerializer(data=request.data)
         if serializer.is_valid():
@@ -200,6 +310,14 @@ class AccountController(Notifier):
             )
         raise AppException.ValidationException(error_message=serializer.errors)
 
+    async def arefresh_user_token(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        if serializer.is_valid():
+            return await self.keycloak_auth_service.arefresh_token(
+                refresh_token=serializer.validated_data.get("refresh_token")
+            )
+        raise AppException.ValidationException(error_message=serializer.errors)
+
     def reset_account_password_request(self, email: str):
         account = self.account_repository.find({"email": email})
         self.send_otp(email=email)
@@ -224,7 +342,7 @@ class AccountController(Notifier):
             self._send_email(
                 obj_data={
                     "email": account.email,
-                    "template_name": "account_password_reset.html",
+                    "template_name": EmailTemplateEnum.password_reset.value,
                     "metadata": {
                         "user_id": str(account.id),
                         "email": account.email,
@@ -268,6 +386,11 @@ class AccountController(Notifier):
         self._email_otp(account_id=str(account.id), email=account.email)
         return AccountSerializer(account)
 
+    async def asend_otp(self, email: str):
+        account = await self.account_repository.afind({"email": email})
+        await self._aemail_otp(account_id=str(account.id), email=account.email)
+        return AccountSerializer(account)
+
     def otp_confirmation(self, request):
         serializer = ConfirmOtpSerializer(data=request.data)
         if serializer.is_valid():
@@ -277,6 +400,15 @@ class AccountController(Notifier):
             )
         raise AppException.ValidationException(error_message=serializer.errors)
 
+    async def aotp_confirmation(self, request):
+        serializer = ConfirmOtpSerializer(data=request.data)
+        if serializer.is_valid():
+            return await self.aconfirm_otp(
+                account_id=serializer.validated_data.get("id"),
+                otp_code=serializer.validated_data.get("otp_code"),
+            )
+        raise AppException.ValidationException(error_message=serializer.errors)
+
     def confirm_otp(self, account_id: str, otp_code: str) -> dict:
         result = cache.get(self.otp_code_key.format(account_id=account_id))
         if not result:
@@ -291,21 +423,63 @@ class AccountController(Notifier):
         cache.delete(self.otp_code_key.format(account_id=account_id))
         return {"id": account_id, "sec_code": sec_code}
 
+    async def aconfirm_otp(self, account_id: str, otp_code: str) -> dict:
+        result = await cache.aget(self.otp_code_key.format(account_id=account_id))
+        if not result:
+            raise AppException.BadRequestException(error_message="otp code has expired")
+        if otp_code != result and otp_code not in settings.MASTER_OTP_CODES:
+            raise AppException.BadRequestException(error_message="invalid otp code")
+        sec_code: str = await self._acreate_sec_code_record(
+            account_id=account_id,
+            sec_code=self._generate_security_code(length=16),
+            code_expiration=5,
+        )
+        await cache.adelete(self.otp_code_key.format(account_id=account_id))
+        return {"id": account_id, "sec_code": sec_code}
+
     def _email_otp(self, account_id: str, email: str):
-        otp_code: str = self._generate_otp_code(length=6)
-        self._create_otp_record(
-            account_id=account_id, otp_code=otp_code, code_expiration=5
+        otp_code: str = self._create_otp_record(
+            account_id=account_id,
+            otp_code=self._generate_otp_code(length=6),
+            code_expiration=5,
         )
         self._send_email(
             obj_data={
                 "email": email,
-                "template_name": "account_otp_code.html",
+                "template_name": EmailTemplateEnum.otp_code.value,
+                "metadata": {
+                    "account_id": account_id,
+                    "email": email,
+                    "otp": otp_code,
+                    "subject": "One-Time Password (OTP) Verification",
+                },
+                "dedupe_window": settings.NOTIFICATION_DEDUPE_WINDOW,
+                # a fresh code is mailed right away, a resent one is not
+                "dedupe_payload": otp_code,
+            }
+        )
+        return None
+
+    async def _aemail_otp(self, account_id: str, email: str):
+        otp_code: str = await self._acreate_otp_record(
+            account_id=account_id,
+            otp_code=self._generate_otp_code(length=6),
+            code_expiration=5,
+        )
+        # mails are rendered and handed to the notifier synchronously
+        await sync_to_async(self._send_email)(
+            obj_data={
+                "email": email,
+                "template_name": EmailTemplateEnum.otp_code.value,
                 "metadata": {
                     "account_id": account_id,
                     "email": email,
                     "otp": otp_code,
                     "subject": "One-Time Password (OTP) Verification",
                 },
+                "dedupe_window": settings.NOTIFICATION_DEDUPE_WINDOW,
+                # a fresh code is mailed right away, a resent one is not
+                "dedupe_payload": otp_code,
             }
         )
         return None
@@ -323,12 +497,34 @@ class AccountController(Notifier):
         cache.delete(self.sec_code_key.format(account_id=account_id))
         return result
 
-    def _create_otp_record(self, account_id: str, otp_code: str, code_expiration: int):
-        return cache.set(
-            self.otp_code_key.format(account_id=account_id),
-            otp_code,
-            timeout=60 * code_expiration,
-        )
+    def _create_otp_record(
+        self, account_id: str, otp_code: str, code_expiration: int
+    ) -> str:
+        """
+        store the otp code unless one is still active, in which case it is kept
+        with its original expiry so resent mails carry the same code
+        :return: the active otp code
+        """
+        key = self.otp_code_key.format(account_id=account_id)
+        if cache.add(key, otp_code, timeout=60 * code_expiration):
+            return otp_code
+        active_code = cache.get(key)
+        if active_code is None:
+            cache.set(key, otp_code, timeout=60 * code_expiration)
+            return otp_code
+        return active_code
+
+    async def _acreate_otp_record(
+        self, account_id: str, otp_code: str, code_expiration: int
+    ) -> str:
+        key = self.otp_code_key.format(account_id=account_id)
+        if await cache.aadd(key, otp_code, timeout=60 * code_expiration):
+            return otp_code
+        active_code = await cache.aget(key)
+        if active_code is None:
+            await cache.aset(key, otp_code, timeout=60 * code_expiration)
+            return otp_code
+        return active_code
 
     def _create_sec_code_record(
         self, account_id: str, sec_code: str, code_expiration: int
@@ -343,6 +539,19 @@ class AccountController(Notifier):
             return sec_code
         return result
 
+    async def _acreate_sec_code_record(
+        self, account_id: str, sec_code: str, code_expiration: int
+    ):
+        result = await cache.aget(self.sec_code_key.format(account_id=account_id))
+        if not result:
+            await cache.aset(
+                self.sec_code_key.format(account_id=account_id),
+                sec_code,
+                timeout=60 * code_expiration,
+            )
+            return sec_code
+        return result
+
     def _generate_otp_code(self, length: int) -> str:
         return "".join(choices(digits, k=length))
 
@@ -361,14 +570,32 @@ class AccountController(Notifier):
                 "status": AccountStatusEnum.deactivated.value,
             },
         )
+        self._publish_event(
+            event=AccountEventEnum.deactivated,
+            account_id=request.user.id,
+            data={"status": AccountStatusEnum.deactivated.value},
+        )
         return None
 
     def _send_email(self, obj_data: dict):
-        self.notify(
+        return self.notify(
             EmailNotificationHandler(
                 recipients=obj_data.get("email"),
                 template_name=obj_data.get("template_name"),
                 metadata=obj_data.get("metadata"),
+                dedupe_window=obj_data.get("dedupe_window"),
+                dedupe_payload=obj_data.get("dedupe_payload"),
+            )
+        )
+
+    def _publish_event(
+        self, event: AccountEventEnum, account_id: str, data: dict = None
+    ):
+        # events are only published once the surrounding transaction commits so
+        # consumers never observe a change that was rolled back
+        transaction.on_commit(
+            lambda: self.notify(
+                EventNotificationHandler(event=event, account_id=account_id, data=data)
             )
         )
         return None
@@ -382,5 +609,10 @@ class AccountController(Notifier):
             account.groups.add(
                 Group.objects.get(name=serializer.validated_data.get("group"))
             )
+            self._publish_event(
+                event=AccountEventEnum.group_added,
+                account_id=account.id,
+                data={"group": serializer.validated_data.get("group")},
+            )
             return AccountSerializer(account)
         raise AppException.ValidationException(error_message=serializer.errors)
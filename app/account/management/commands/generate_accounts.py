@@ -0,0 +1,324 @@
+import bisect
+import hashlib
+import io
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from app.account.models import AccountModel
+from core.constants import AccountStatusEnum, GroupEnum
+
+FIRST_NAMES = (
+    "ama akosua kwame kofi yaw abena efua kojo adwoa kwabena james mary john "
+    "patricia robert jennifer michael linda david elizabeth william barbara "
+    "richard susan joseph jessica thomas sarah charles karen daniel nancy "
+    "matthew lisa anthony betty mark sandra paul ashley steven emily andrew "
+    "donna joshua michelle kenneth carol kevin amanda brian melissa george "
+    "deborah timothy stephanie ronald rebecca jason laura edward sharon"
+).split()
+LAST_NAMES = (
+    "asumadu mensah owusu boateng asante osei addo appiah agyeman darko smith "
+    "johnson williams brown jones garcia miller davis rodriguez martinez "
+    "hernandez lopez gonzalez wilson anderson thomas taylor moore jackson "
+    "martin lee perez thompson white harris sanchez clark ramirez lewis "
+    "robinson walker young allen king wright scott torres nguyen hill flores"
+).split()
+DOMAINS = ("example.com", "example.org", "example.net", "mail.example.com")
+STATUS_WEIGHTS = {
+    AccountStatusEnum.active.value: 82,
+    AccountStatusEnum.inactive.value: 9,
+    AccountStatusEnum.deactivated.value: 5,
+    AccountStatusEnum.disabled.value: 3,
+    AccountStatusEnum.blocked.value: 1,
+}
+GROUP_WEIGHTS = {GroupEnum.user.value: 97, GroupEnum.admin.value: 3}
+ACCOUNT_FIELDS = (
+    "id",
+    "username",
+    "phone",
+    "email",
+    "password",
+    "status",
+    "is_email_verified",
+    "is_phone_verified",
+    "is_active",
+    "is_deleted",
+    "is_staff",
+    "is_superuser",
+    "api_key_enabled",
+    "iam_provider_id",
+    "last_login",
+    "created_at",
+    "created_by",
+    "updated_at",
+    "deleted_at",
+    "deleted_by",
+)
+
+
+def weighted_choice(rng: random.Random, weights: dict):
+    """
+    a chooser of the keys of weights in proportion to their values, cheaper
+    per call than random.choices
+    """
+    population = tuple(weights)
+    cumulative = tuple(itertools.accumulate(weights.values()))
+    total = cumulative[-1]
+    return lambda: population[bisect.bisect(cumulative, rng.random() * total)]
+
+
+def random_uuid(rng: random.Random) -> str:
+    """
+    a version 4 uuid drawn from rng, in the hex form postgres accepts
+    """
+    value = rng.getrandbits(128) & ~(0xF000 << 64) & ~(0xC000 << 48)
+    return f"{value | 0x4000 << 64 | 0x8000 << 48:032x}"
+
+
+def marker_tag(marker: str) -> int:
+    """
+    a number derived from the marker, set in the usernames, emails and phone
+    numbers so runs with different markers do not collide
+    """
+    return int(hashlib.sha256(marker.encode("UTF-8")).hexdigest()[:10], 16)
+
+
+class Command(BaseCommand):
+    help = (
+        "generate synthetic accounts with group memberships for benchmarks, "
+        "loaded with COPY in batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("count", type=int, help="number of accounts to create")
+        parser.add_argument("--batch-size", type=int, default=50000)
+        parser.add_argument(
+            "--password",
+            default="Synthetic-Account-1",
+            help="password of every account, hashed once",
+        )
+        parser.add_argument(
+            "--days", type=int, default=730, help="spread of the creation dates"
+        )
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument(
+            "--marker",
+            default="generate_accounts",
+            help="created_by of the generated accounts, used to number and delete them",
+        )
+        parser.add_argument(
+            "--defer-indexes",
+            action="store_true",
+            help="drop the non-unique indexes and foreign keys during the load "
+            "and rebuild them after, for loads of millions of rows",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="delete the accounts generated earlier with the same marker first",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("generate_accounts loads rows with postgres COPY")
+        count, marker = options.get("count"), options.get("marker")
+        if count < 1:
+            raise CommandError("count must be positive")
+        if options.get("delete"):
+            deleted = self.delete_accounts(marker)
+            self.stdout.write(f"{deleted} generated account(s) deleted")
+        start = AccountModel.objects.filter(created_by=marker).count()
+        # a seeded run is reproducible, continuing one or seeding a run with
+        # another marker must not repeat its ids
+        seed = options.get("seed")
+        rng = random.Random(None if seed is None else f"{seed}:{marker}:{start}")
+        # hashing is what makes creating accounts slow, every row shares one
+        password = make_password(options.get("password"))
+        groups = {
+            name: Group.objects.get_or_create(name=name)[0].id for name in GROUP_WEIGHTS
+        }
+        started = time.monotonic()
+        tables = [AccountModel._meta.db_table, self.membership_table()[0]]
+        if options.get("defer_indexes"):
+            with self.deferred_indexes(tables):
+                created = self.load(rng, start, count, password, groups, options)
+        else:
+            created = self.load(rng, start, count, password, groups, options)
+        with connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(table)}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{created} account(s) created in {time.monotonic() - started:.1f}s"
+            )
+        )
+
+    def load(self, rng, start, count, password, groups, options) -> int:
+        rows = self.account_rows(
+            rng, password, options.get("marker"), options.get("days")
+        )
+        next(rows)
+        started, created = time.monotonic(), 0
+        batch_size = options.get("batch_size")
+        for batch_start in range(start, start + count, batch_size):
+            batch_end = min(batch_start + batch_size, start + count)
+            accounts, memberships = io.StringIO(), io.StringIO()
+            for index in range(batch_start, batch_end):
+                account_id, group, line = rows.send(index)
+                accounts.write(f"{line}\n")
+                memberships.write(f"{account_id}\t{groups[group]}\n")
+            with transaction.atomic():
+                self.copy(accounts, AccountModel._meta.db_table, self.account_columns())
+                self.copy(memberships, *self.membership_table())
+            created += batch_end - batch_start
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{created}/{count} account(s) created, "
+                f"{created / elapsed if elapsed else 0:.0f} rows/s"
+            )
+        return created
+
+    @contextmanager
+    def deferred_indexes(self, tables: list):
+        """
+        drop the indexes and foreign keys of tables that no constraint needs
+        (unique constraints stay, they catch duplicates), and build them again
+        once after the load instead of maintaining them row by row
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT format('ALTER TABLE %%I DROP CONSTRAINT %%I', "
+                "cls.relname, con.conname), format('ALTER TABLE %%I ADD "
+                "CONSTRAINT %%I %%s', cls.relname, con.conname, "
+                "pg_get_constraintdef(con.oid)) FROM pg_constraint con JOIN "
+                "pg_class cls ON cls.oid = con.conrelid WHERE con.contype = 'f' "
+                "AND cls.relname = ANY(%s) "
+                "UNION ALL SELECT format('DROP INDEX %%I.%%I', schemaname, "
+                "indexname), indexdef FROM pg_indexes WHERE tablename = ANY(%s) "
+                "AND indexname NOT IN (SELECT conname FROM pg_constraint)",
+                [tables, tables],
+            )
+            deferred = cursor.fetchall()
+            self.stdout.write("deferred until the load completes:")
+            for _, create in deferred:
+                self.stdout.write(f"  {create};")
+            for drop, _ in deferred:
+                cursor.execute(drop)
+        try:
+            yield
+        finally:
+            started = time.monotonic()
+            with connection.cursor() as cursor:
+                for _, create in deferred:
+                    cursor.execute(create)
+            self.stdout.write(
+                f"{len(deferred)} index(es) and foreign key(s) rebuilt in "
+                f"{time.monotonic() - started:.1f}s"
+            )
+
+    # noinspection PyMethodMayBeStatic
+    def account_rows(self, rng, password, marker, days):
+        """
+        a generator sent the index of every account to generate, yielding its
+        (account id, group, COPY line). the unique values are derived from the
+        marker and the index. the values never contain tabs, newlines or
+        backslashes so none is escaped.
+        """
+        status_of, group_of = (
+            weighted_choice(rng, STATUS_WEIGHTS),
+            weighted_choice(rng, GROUP_WEIGHTS),
+        )
+        active, inactive, deactivated = (
+            AccountStatusEnum.active.value,
+            AccountStatusEnum.inactive.value,
+            AccountStatusEnum.deactivated.value,
+        )
+        now, spread = datetime.now(timezone.utc), days * 86400
+        tag = marker_tag(marker)
+        index = yield
+        while True:
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            status, group = status_of(), group_of()
+            account_id = random_uuid(rng)
+            age = rng.random() * spread
+            created_at = now - timedelta(seconds=age)
+            updated_at = (
+                created_at + timedelta(seconds=rng.random() * age)
+            ).isoformat()
+            last_login = (
+                (created_at + timedelta(seconds=rng.random() * age)).isoformat()
+                if status == active and rng.random() < 0.8
+                else r"\N"
+            )
+            removed = status == deactivated
+            index = (
+                yield account_id,
+                group,
+                "\t".join(
+                    (
+                        account_id,
+                        f"{first}.{last}.{tag:x}.{index}",
+                        f"+999{tag:013d}{index:010d}",
+                        f"{first}.{last}.{tag:x}.{index}@{rng.choice(DOMAINS)}",
+                        password,
+                        status,
+                        "f" if status == inactive else "t",
+                        "t" if rng.random() < 0.4 else "f",
+                        "f" if removed else "t",
+                        "t" if removed else "f",
+                        "f",
+                        "f",
+                        "f",
+                        random_uuid(rng),
+                        last_login,
+                        created_at.isoformat(),
+                        marker,
+                        updated_at,
+                        updated_at if removed else r"\N",
+                        account_id if removed else r"\N",
+                    )
+                ),
+            )
+
+    # noinspection PyMethodMayBeStatic
+    def account_columns(self):
+        return [AccountModel._meta.get_field(name).column for name in ACCOUNT_FIELDS]
+
+    # noinspection PyMethodMayBeStatic
+    def membership_table(self):
+        field = AccountModel._meta.get_field("groups")
+        return (
+            field.remote_field.through._meta.db_table,
+            [field.m2m_column_name(), field.m2m_reverse_name()],
+        )
+
+    # noinspection PyMethodMayBeStatic
+    def copy(self, rows: io.StringIO, table: str, columns: list):
+        rows.seek(0)
+        quoted = ", ".join(connection.ops.quote_name(column) for column in columns)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {connection.ops.quote_name(table)} ({quoted}) FROM STDIN",
+                rows,
+                1 << 20,
+            )
+
+    def delete_accounts(self, marker: str) -> int:
+        table, (account_column, _) = self.membership_table()
+        accounts = connection.ops.quote_name(AccountModel._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(table)} WHERE "
+                f"{connection.ops.quote_name(account_column)} IN "
+                f"(SELECT id FROM {accounts} WHERE created_by = %s)",
+                [marker],
+            )
+            cursor.execute(f"DELETE FROM {accounts} WHERE created_by = %s", [marker])
+            return cursor.rowcount
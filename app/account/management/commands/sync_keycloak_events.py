@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.account.subscription import KeycloakEventPoller
+from core.services import KeycloakAuthService
+
+
+class Command(BaseCommand):
+    help = "apply new keycloak user and admin events to the local accounts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="seconds between polls, runs a single poll when not set",
+        )
+        parser.add_argument("--page-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        poller = KeycloakEventPoller(
+            keycloak_auth_service=KeycloakAuthService(),
+            page_size=options.get("page_size"),
+        )
+        while True:
+            updated = poller.poll()
+            self.stdout.write(f"{updated} account(s) synchronised with keycloak")
+            if not options.get("interval"):
+                return None
+            time.sleep(options.get("interval"))
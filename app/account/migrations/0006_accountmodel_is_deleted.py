@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("account", "0005_remove_accountmodel_temporal_password"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="accountmodel",
+            name="is_deleted",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -53,6 +53,7 @@ class AccountModel(BaseModel, AbstractBaseUser, PermissionsMixin):
     last_login = models.DateTimeField(null=True)
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    is_deleted = models.BooleanField(default=False)
 
     USERNAME_FIELD = "username"
     objects = UserManager()
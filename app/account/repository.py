@@ -1,8 +1,23 @@
 from core.repository import SqlBaseRepository
 
+from .cache import account_cache
 from .models import AccountModel
 
 
 class AccountRepository(SqlBaseRepository):
     model = AccountModel
     object_name = "account"
+
+    def update_all(self, filter_param: dict, obj_data: dict) -> int:
+        """
+        set based updates skip the post_save signal, the cached accounts they
+        change are dropped here
+        """
+        account_ids = list(
+            self.model.objects.filter(**filter_param).values_list("pk", flat=True)
+        )
+        if not account_ids:
+            return 0
+        updated = super().update_all({"pk__in": account_ids, **filter_param}, obj_data)
+        account_cache.invalidate(account_ids)
+        return updated
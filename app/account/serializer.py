@@ -1,10 +1,14 @@
 from rest_framework import serializers
 
 from core.constants import GroupEnum
-from core.serializers import EnumFieldSerializer, PaginatedSerializer
+from core.serializers import (
+    EnumFieldSerializer,
+    PaginatedSerializer,
+    TimedSerializerMixin,
+)
 
 
-class AccountSerializer(serializers.Serializer):
+class AccountSerializer(TimedSerializerMixin, serializers.Serializer):
     id = serializers.UUIDField(required=True)
     username = serializers.CharField(required=True)
     phone = serializers.CharField(required=True)
@@ -22,7 +26,7 @@ class PaginatedAccountSerializer(PaginatedSerializer):
     results = AccountSerializer(many=True)
 
 
-class CreateAccountSerializer(serializers.Serializer):
+class CreateAccountSerializer(TimedSerializerMixin, serializers.Serializer):
     username = serializers.CharField(required=True)
     phone = serializers.CharField(required=True)
     email = serializers.EmailField(required=True)
@@ -42,7 +46,7 @@ class UpdateAccountSerializer(serializers.Serializer):
     email = serializers.EmailField(required=False)
 
 
-class LoginAccountSerializer(serializers.Serializer):
+class LoginAccountSerializer(TimedSerializerMixin, serializers.Serializer):
     username = serializers.CharField(required=True)
     password = serializers.CharField(required=True)
 
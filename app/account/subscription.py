@@ -0,0 +1,187 @@
+import json
+from datetime import datetime, timezone
+from typing import Callable, List
+
+from django.core.cache import cache
+
+from core.constants import AccountStatusEnum
+from core.event import EventSubscriptionHandler
+from core.services import KeycloakAuthService
+
+from .repository import AccountRepository
+
+
+class AccountDeletionSubscriptionHandler(EventSubscriptionHandler):
+    """
+    deactivates the accounts of users deleted by an upstream service. the
+    event data carries the id of the deleted account.
+    """
+
+    def __init__(self, account_repository: AccountRepository = None):
+        self.account_repository = account_repository or AccountRepository()
+
+    def handler(self, data: dict):
+        return self.handle_batch([data])
+
+    def handle_batch(self, events: List[dict]):
+        account_ids = {event.get("id") for event in events if event.get("id")}
+        if not account_ids:
+            return 0
+        now = datetime.now(timezone.utc)
+        return self.account_repository.update_all(
+            filter_param={"id__in": account_ids, "is_active": True},
+            obj_data={
+                "is_active": False,
+                "is_deleted": True,
+                "status": AccountStatusEnum.deactivated.value,
+                "deleted_at": now,
+                "updated_at": now,
+            },
+        )
+
+
+class KeycloakEventSubscriptionHandler(EventSubscriptionHandler):
+    """
+    applies Keycloak user and admin events to the local accounts. a batch is
+    folded into the final state of every affected account and written with one
+    set based update per distinct change instead of one query per event.
+    """
+
+    def __init__(self, account_repository: AccountRepository = None):
+        self.account_repository = account_repository or AccountRepository()
+
+    def handler(self, data: dict):
+        return self.handle_batch([data])
+
+    def handle_batch(self, events: List[dict]):
+        now = datetime.now(timezone.utc)
+        changes = {}
+        for event in sorted(events, key=lambda event: event.get("time") or 0):
+            iam_user_id, change = self.account_change(event, now)
+            if iam_user_id and change:
+                changes.setdefault(iam_user_id, {}).update(change)
+        grouped_changes = {}
+        for iam_user_id, change in changes.items():
+            grouped_changes.setdefault(tuple(sorted(change.items())), []).append(
+                iam_user_id
+            )
+        updated = 0
+        for change, iam_user_ids in grouped_changes.items():
+            updated += self.account_repository.update_all(
+                filter_param={"iam_provider_id__in": iam_user_ids},
+                obj_data={**dict(change), "updated_at": now},
+            )
+        return updated
+
+    def account_change(self, event: dict, now: datetime):
+        """
+        :return: the keycloak id of the user an event refers to and the account
+        fields it changes
+        """
+        if "operationType" in event:
+            return self.admin_event_change(event, now)
+        if event.get("type") == "VERIFY_EMAIL":
+            return event.get("userId"), {"is_email_verified": True}
+        if event.get("type") == "DELETE_ACCOUNT":
+            return event.get("userId"), self.deleted(now)
+        return None, None
+
+    def admin_event_change(self, event: dict, now: datetime):
+        resource = (event.get("resourcePath") or "").split("/")
+        if event.get("resourceType") != "USER" or len(resource) != 2:
+            return None, None
+        if event.get("operationType") == "DELETE":
+            return resource[1], self.deleted(now)
+        if event.get("operationType") != "UPDATE":
+            return None, None
+        representation = event.get("representation") or {}
+        if isinstance(representation, str):
+            representation = json.loads(representation)
+        change = {}
+        if "emailVerified" in representation:
+            change["is_email_verified"] = bool(representation.get("emailVerified"))
+        if "enabled" in representation:
+            change["is_active"] = bool(representation.get("enabled"))
+        return resource[1], change
+
+    # noinspection PyMethodMayBeStatic
+    def deleted(self, now: datetime) -> dict:
+        return {
+            "is_active": False,
+            "is_deleted": True,
+            "status": AccountStatusEnum.deactivated.value,
+            "deleted_at": now,
+        }
+
+
+class KeycloakEventPoller:
+    """
+    pulls new events from the Keycloak events APIs and applies them with the
+    KeycloakEventSubscriptionHandler. the time of the newest applied event is
+    kept as a checkpoint in the cache so every poll only reads what is new.
+    """
+
+    checkpoint_key = "keycloak_{source}_events_checkpoint"
+    user_event_types = ["VERIFY_EMAIL", "DELETE_ACCOUNT"]
+
+    def __init__(
+        self,
+        keycloak_auth_service: KeycloakAuthService,
+        subscription_handler: KeycloakEventSubscriptionHandler = None,
+        page_size: int = 100,
+    ):
+        self.keycloak_auth_service = keycloak_auth_service
+        self.subscription_handler = (
+            subscription_handler or KeycloakEventSubscriptionHandler()
+        )
+        self.page_size = page_size
+
+    def poll(self) -> int:
+        """
+        :return: the number of updated accounts
+        """
+        updated = self.sync(
+            source="user",
+            fetch=self.keycloak_auth_service.get_user_events,
+            query={"type": self.user_event_types},
+        )
+        updated += self.sync(
+            source="admin",
+            fetch=self.keycloak_auth_service.get_admin_events,
+            query={"resourceTypes": ["USER"], "operationTypes": ["UPDATE", "DELETE"]},
+        )
+        return updated
+
+    def sync(self, source: str, fetch: Callable, query: dict) -> int:
+        checkpoint = cache.get(self.checkpoint_key.format(source=source)) or 0
+        events = self.fetch_since(fetch=fetch, query=query, checkpoint=checkpoint)
+        if not events:
+            return 0
+        updated = self.subscription_handler.handle_batch(events)
+        cache.set(
+            self.checkpoint_key.format(source=source),
+            max(event.get("time") for event in events),
+            timeout=None,
+        )
+        return updated
+
+    def fetch_since(self, fetch: Callable, query: dict, checkpoint: int) -> list:
+        """
+        page through the events (returned newest first) until the checkpoint is
+        reached. events at the checkpoint itself are read again, which is safe
+        because applying an event is idempotent.
+        """
+        if checkpoint:
+            query = {
+                **query,
+                "dateFrom": datetime.fromtimestamp(
+                    checkpoint / 1000, tz=timezone.utc
+                ).strftime("%Y-%m-%d"),
+            }
+        events, first = [], 0
+        while True:
+            page = fetch(query={**query, "first": first, "max": self.page_size})
+            events.extend(event for event in page if event.get("time") >= checkpoint)
+            if len(page) < self.page_size or page[-1].get("time") < checkpoint:
+                return events
+            first += self.page_size
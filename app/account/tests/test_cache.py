@@ -0,0 +1,86 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.test import tag
+
+from app.account.cache import account_cache
+from core.constants import GroupEnum
+
+from .base_test_case import AccountTestCase
+
+
+@tag("app.account.cache")
+class TestAccountCache(AccountTestCase):
+    def test_account_is_read_once(self):
+        account = account_cache.get(self.account_model.id)
+        with self.assertNumQueries(0):
+            cached = account_cache.get(self.account_model.id)
+        self.assertEqual(cached, account)
+        self.assertEqual(cached.email, self.account_model.email)
+
+    def test_concurrent_misses_share_one_fill(self):
+        released = threading.Event()
+        threading.Timer(0.1, released.set).start()
+        results = []
+        with mock.patch.object(
+            account_cache,
+            "fill_account",
+            side_effect=lambda *_: released.wait(5) and self.account_model,
+        ) as fill_account:
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(
+                        account_cache.get(self.account_model.id)
+                    )
+                )
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        fill_account.assert_called_once()
+        self.assertEqual(len({id(result) for result in results}), 4)
+        self.assertTrue(all(result == self.account_model for result in results))
+
+    def test_save_invalidates(self):
+        account_cache.get(self.account_model.id)
+        version = account_cache.collection_version()
+        self.account_repository.update_by_id(
+            obj_id=self.account_model.id, obj_data={"phone": "+233200000001"}
+        )
+        self.assertEqual(
+            account_cache.get(self.account_model.id).phone, "+233200000001"
+        )
+        self.assertGreater(account_cache.collection_version(), version)
+
+    def test_update_all_invalidates(self):
+        account_cache.get(self.account_model.id)
+        updated = self.account_repository.update_all(
+            filter_param={"id": self.account_model.id}, obj_data={"is_active": False}
+        )
+        self.assertEqual(updated, 1)
+        self.assertFalse(account_cache.get(self.account_model.id).is_active)
+        self.assertEqual(
+            self.account_repository.update_all(
+                filter_param={"id": self.account_model.id, "is_active": True},
+                obj_data={"is_active": False},
+            ),
+            0,
+        )
+
+    def test_group_change_invalidates(self):
+        self.assertEqual(account_cache.group_names(self.account_model), [])
+        group = Group.objects.get(name=GroupEnum.super_admin.value)
+        self.account_model.groups.add(group)
+        self.assertEqual(account_cache.group_names(self.account_model), [group.name])
+        group.user_set.clear()
+        self.assertEqual(account_cache.group_names(self.account_model), [])
+
+    def test_group_delete_invalidates(self):
+        group = Group.objects.create(name="temporary")
+        self.account_model.groups.add(group)
+        self.assertEqual(account_cache.group_names(self.account_model), [group.name])
+        group.delete()
+        self.assertEqual(account_cache.group_names(self.account_model), [])
@@ -0,0 +1,67 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, tag
+
+from app.account.models import AccountModel
+from core.constants import AccountStatusEnum, GroupEnum
+
+
+@tag("app.account.commands")
+class TestGenerateAccounts(TestCase):
+    marker = "generate_accounts"
+
+    def generate(self, *args):
+        output = StringIO()
+        call_command("generate_accounts", *args, "--seed", "7", stdout=output)
+        return output.getvalue()
+
+    def test_generate_accounts(self):
+        output = self.generate("120", "--batch-size", "50")
+        accounts = AccountModel.objects.filter(created_by=self.marker)
+        self.assertIn("120 account(s) created", output)
+        self.assertEqual(accounts.count(), 120)
+        self.assertEqual(accounts.values("email").distinct().count(), 120)
+        self.assertEqual(
+            accounts.filter(
+                groups__name__in=[GroupEnum.user.value, GroupEnum.admin.value]
+            ).count(),
+            120,
+        )
+        self.assertTrue(accounts.filter(status=AccountStatusEnum.active.value).exists())
+        account = accounts.filter(status=AccountStatusEnum.active.value).first()
+        self.assertTrue(account.check_password("Synthetic-Account-1"))
+
+    def test_generate_accounts_continues_numbering(self):
+        self.generate("10")
+        self.generate("10")
+        self.assertEqual(
+            AccountModel.objects.filter(created_by=self.marker).count(), 20
+        )
+
+    def test_generate_accounts_with_another_marker(self):
+        self.generate("10")
+        self.generate("10", "--marker", "another_run")
+        self.assertEqual(
+            AccountModel.objects.filter(created_by="another_run").count(), 10
+        )
+
+    def test_generate_accounts_delete(self):
+        self.generate("10")
+        output = self.generate("5", "--delete")
+        self.assertIn("10 generated account(s) deleted", output)
+        self.assertEqual(AccountModel.objects.filter(created_by=self.marker).count(), 5)
+
+    def test_generate_accounts_defer_indexes(self):
+        output = self.generate("10", "--defer-indexes")
+        self.assertIn("index(es) and foreign key(s) rebuilt", output)
+        self.assertEqual(
+            AccountModel.objects.filter(created_by=self.marker).count(), 10
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_indexes WHERE tablename = %s",
+                [AccountModel._meta.db_table],
+            )
+            self.assertEqual(cursor.fetchone()[0], 7)
@@ -1,7 +1,9 @@
+import time
 import uuid
 from unittest import mock
 
 from django.conf import settings
+from django.core.cache import cache
 from django.test import tag
 from rest_framework import status
 from rest_framework.parsers import JSONParser
@@ -9,7 +11,9 @@ from rest_framework.request import Request
 
 from app.account.models import AccountModel
 from app.account.serializer import AccountSerializer
+from core.constants import AccountEventEnum, EmailTemplateEnum
 from core.exceptions import AppException
+from core.notifications import EmailNotificationHandler
 
 from .base_test_case import AccountTestCase
 
@@ -50,6 +54,19 @@ class TestAccountController(AccountTestCase):
         self.assertIsInstance(result, AccountSerializer)
         self.assertIsInstance(result.data, dict)
 
+    def test_create_account_publishes_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.account_controller.create_account(
+                obj_data=self.account_test_data.create_account(),
+                verification_url="https://example.com",
+            )
+        self.kafka_event.assert_called_once()
+        event = self.kafka_event.call_args.kwargs
+        self.assertEqual(event.get("topic"), settings.KAFKA_ACCOUNT_EVENT_TOPIC)
+        self.assertEqual(event.get("key"), result.data.get("id"))
+        self.assertEqual(event.get("value").get("type"), AccountEventEnum.created.value)
+        self.assertEqual(event.get("value").get("id"), result.data.get("id"))
+
     def test_create_account_invalid_data_exc(self):
         with self.assertRaises(AppException.ValidationException) as exception:
             self.account_controller.create_account(
@@ -347,6 +364,17 @@ class TestAccountController(AccountTestCase):
         request.user = self.account_model
         result = self.account_controller.deactivate_account(request)
         self.assertIsNone(result)
+        self.assertTrue(AccountModel.objects.get(pk=self.account_model.id).is_deleted)
+
+    def test_deactivate_account_publishes_event(self):
+        request = Request(self.request_factory.get(self.request_url))
+        request.user = self.account_model
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account_controller.deactivate_account(request)
+        self.kafka_event.assert_called_once()
+        event = self.kafka_event.call_args.kwargs.get("value")
+        self.assertEqual(event.get("type"), AccountEventEnum.deactivated.value)
+        self.assertEqual(event.get("id"), str(self.account_model.id))
 
     def test_deactivate_account_not_found_exc(self):
         with self.assertRaises(AppException.NotFoundException) as exception:
@@ -446,3 +474,140 @@ class TestAccountController(AccountTestCase):
             self.account_controller.update_group(request)
         self.assertEqual(exception.exception.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIsNotNone(exception.exception.error_message)
+
+    def test_send_otp_keyed_by_account(self):
+        self.account_controller.send_otp(email=self.account_model.email)
+        self.kafka_email.assert_called_once()
+        self.assertEqual(
+            self.kafka_email.call_args.kwargs.get("key"), str(self.account_model.id)
+        )
+
+    def test_resent_otp_is_deduplicated(self):
+        for _ in range(3):
+            self.account_controller.send_otp(email=self.account_model.email)
+        self.kafka_email.assert_called_once()
+        otp_code = self.kafka_email.call_args.kwargs.get("value").get("html_body")
+        self.assertIn(
+            cache.get(f"{self.account_model.id}_otp_code"),
+            otp_code,
+        )
+
+    def test_resent_otp_reuses_active_code(self):
+        self.account_controller.send_otp(email=self.account_model.email)
+        otp_code = cache.get(f"{self.account_model.id}_otp_code")
+        # the dedupe window passes while the otp code is still active
+        cache.delete(
+            self.account_controller.notification_key.format(
+                key=EmailNotificationHandler.template_key(
+                    recipients=self.account_model.email,
+                    template_name=EmailTemplateEnum.otp_code.value,
+                    payload=otp_code,
+                )
+            )
+        )
+        self.account_controller.send_otp(email=self.account_model.email)
+        self.assertEqual(self.kafka_email.call_count, 2)
+        self.assertEqual(cache.get(f"{self.account_model.id}_otp_code"), otp_code)
+
+    def test_resent_otp_keeps_its_expiry(self):
+        key = f"{self.account_model.id}_otp_code"
+        cache.set(key, "123456", timeout=1)
+        self.account_controller.send_otp(email=self.account_model.email)
+        self.assertIn(
+            "123456", self.kafka_email.call_args.kwargs.get("value").get("html_body")
+        )
+        time.sleep(1.1)
+        self.assertIsNone(cache.get(key))
+
+    def test_fresh_otp_is_not_deduplicated(self):
+        with mock.patch.object(
+            self.account_controller,
+            "_generate_otp_code",
+            side_effect=["111111", "222222"],
+        ):
+            self.account_controller.send_otp(email=self.account_model.email)
+            self.account_controller.confirm_otp(
+                account_id=str(self.account_model.id), otp_code="111111"
+            )
+            self.account_controller.send_otp(email=self.account_model.email)
+        self.assertEqual(self.kafka_email.call_count, 2)
+
+    def test_resent_verification_link_is_deduplicated(self):
+        with mock.patch.object(
+            self.account_controller,
+            "generate_token",
+            wraps=self.account_controller.generate_token,
+        ) as generate_token:
+            for _ in range(3):
+                self.account_controller.send_account_verification_link(
+                    user_id=self.account_model.id, url=self.request_url
+                )
+        generate_token.assert_called_once()
+        self.kafka_email.assert_called_once()
+
+    async def test_acreate_account(self):
+        result = await self.account_controller.acreate_account(
+            obj_data=self.account_test_data.create_account(),
+            verification_url="https://example.com",
+        )
+        self.assertIsInstance(result, AccountSerializer)
+        account = await AccountModel.objects.aget(pk=result.data.get("id"))
+        self.assertIsNotNone(account.iam_provider_id)
+        self.assertTrue(await account.groups.aexists())
+        self.kafka_email.assert_called_once()
+
+    async def test_alogin_user(self):
+        request = Request(
+            self.request_factory.post(
+                self.request_url,
+                self.account_test_data.login_account(),
+                format=self.data_format,
+            ),
+            parsers=[JSONParser()],
+        )
+        result = await self.account_controller.alogin_account(request)
+        self.assertEqual(result, self.mock_keycloak_auth.tokens)
+        await self.account_model.arefresh_from_db()
+        self.assertIsNotNone(self.account_model.last_login)
+
+    async def test_alogin_user_invalid_credential_exc(self):
+        request = Request(
+            self.request_factory.post(
+                self.request_url,
+                self.account_test_data.login_account(password="invalid"),
+                format=self.data_format,
+            ),
+            parsers=[JSONParser()],
+        )
+        with self.assertRaises(AppException.BadRequestException):
+            await self.account_controller.alogin_account(request)
+
+    async def test_arefresh_user_token(self):
+        request = Request(
+            self.request_factory.post(
+                self.request_url,
+                self.account_test_data.refresh_token(self.refresh_token),
+                format=self.data_format,
+            ),
+            parsers=[JSONParser()],
+        )
+        result = await self.account_controller.arefresh_user_token(request)
+        self.assertEqual(result, self.mock_keycloak_auth.tokens)
+
+    async def test_asend_and_confirm_otp(self):
+        await self.account_controller.asend_otp(email=self.account_model.email)
+        await self.account_controller.asend_otp(email=self.account_model.email)
+        self.kafka_email.assert_called_once()
+        otp_code = await cache.aget(f"{self.account_model.id}_otp_code")
+        result = await self.account_controller.aconfirm_otp(
+            account_id=str(self.account_model.id), otp_code=otp_code
+        )
+        self.assertEqual(
+            result.get("sec_code"),
+            await cache.aget(f"{self.account_model.id}_sec_code"),
+        )
+        self.assertIsNone(await cache.aget(f"{self.account_model.id}_otp_code"))
+        with self.assertRaises(AppException.BadRequestException):
+            await self.account_controller.aconfirm_otp(
+                account_id=str(self.account_model.id), otp_code=otp_code
+            )
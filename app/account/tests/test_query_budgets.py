@@ -0,0 +1,237 @@
+import os
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.test import tag
+from django.urls import reverse
+from rest_framework import status
+
+from app.account import views
+from app.account.models import AccountModel
+from core.notifications.system_sender import get_system_sender_id
+from tests import BaseTestCase
+from tests.query_budget import (
+    BudgetFile,
+    QueryBudgetMixin,
+    query_budget,
+)
+
+from .test_data import AccountTestData
+
+
+@tag("app.account.query_budget")
+class TestAccountQueryBudgets(QueryBudgetMixin, BaseTestCase):
+    """
+    one request to every view of app/account/urls.py within its budget, with
+    tokens signed by the keycloak stub instead of a mocked decode
+    """
+
+    budget_file = BudgetFile(
+        os.path.join(os.path.dirname(__file__), "query_budgets.json")
+    )
+
+    def setup_test_data(self):
+        super().setup_test_data()
+        self.account_test_data = AccountTestData()
+        self.account_model = AccountModel.objects.create(
+            iam_provider_id="iam-test-account",
+            **self.account_test_data.existing_account,
+        )
+        self.super_admin_model = AccountModel.objects.get(
+            username=settings.SUPER_ADMIN_USERNAME
+        )
+        self.controller = views.account_controller
+        # the admin token is fetched once per process and reused until it
+        # expires, budgets measure requests made with it already cached
+        self.controller.keycloak_auth_service.keycloak_admin.connection.get_token()
+        # so is the realm public key tokens are verified with
+        self.controller.keycloak_auth_service.keycloak_openid.public_key()
+        # and the id notifications are sent on behalf of
+        get_system_sender_id()
+        tokens = self.keycloak.issue_tokens(str(self.account_model.id))
+        self.headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        self.refresh_token = tokens["refresh_token"]
+        admin_tokens = self.keycloak.issue_tokens(str(self.super_admin_model.id))
+        self.admin_headers = {"Authorization": f"Bearer {admin_tokens['access_token']}"}
+
+    @query_budget("view_all_accounts")
+    def test_view_all_accounts(self):
+        response = self.client.get(
+            f"{reverse('view_all_accounts')}?page_size=20",
+            headers=self.admin_headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @query_budget("get_account")
+    def test_get_account(self):
+        response = self.client.get(reverse("get_account"), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_account_not_modified(self):
+        etag = self.client.get(reverse("get_account"), headers=self.headers)["ETag"]
+        with self.assertQueryBudget("get_account_not_modified", queries=0):
+            response = self.client.get(
+                reverse("get_account"), headers={**self.headers, "If-None-Match": etag}
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_view_all_accounts_not_modified(self):
+        url = f"{reverse('view_all_accounts')}?page_size=20"
+        etag = self.client.get(url, headers=self.admin_headers)["ETag"]
+        with self.assertQueryBudget("view_all_accounts_not_modified", queries=0):
+            response = self.client.get(
+                url, headers={**self.admin_headers, "If-None-Match": etag}
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @query_budget("create_account")
+    def test_create_account(self):
+        response = self.client.post(
+            reverse("create_account"),
+            data=self.account_test_data.create_account(),
+            format=self.data_format,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_verify_account_email(self):
+        token = self.controller.generate_token({"id": str(self.account_model.id)})
+        with self.assertQueryBudget("verify_account_email"):
+            response = self.client.get(
+                f"{reverse('verify_account_email')}?{urlencode({'token': token})}"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @query_budget("resend_email_verification")
+    def test_resend_email_verification(self):
+        response = self.client.get(
+            reverse("resend_email_verification"), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @query_budget("generate_api_key")
+    def test_generate_api_key(self):
+        response = self.client.get(reverse("generate_api_key"), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_account_by_apikey(self):
+        apikey = self.client.get(
+            reverse("generate_api_key"), headers=self.headers
+        ).json()["apikey"]
+        with self.assertQueryBudget("get_account_by_apikey"):
+            response = self.client.get(
+                reverse("get_account_by_apikey", args=[apikey]), headers=self.headers
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_toggle_apikey_status(self):
+        self.client.get(reverse("generate_api_key"), headers=self.headers)
+        with self.assertQueryBudget("toggle_apikey_status"):
+            response = self.client.get(
+                reverse("toggle_apikey_status"), headers=self.headers
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @query_budget("login_account")
+    def test_login_account(self):
+        response = self.client.post(
+            reverse("login_account"),
+            data=self.account_test_data.login_account(),
+            format=self.data_format,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @query_budget("refresh_access_token")
+    def test_refresh_access_token(self):
+        response = self.client.post(
+            reverse("refresh_access_token"),
+            data=self.account_test_data.refresh_token(self.refresh_token),
+            format=self.data_format,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @query_budget("reset_password_request")
+    def test_reset_password_request(self):
+        response = self.client.get(
+            f"{reverse('reset_password_request')}?"
+            f"{urlencode({'email': self.account_model.email})}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_reset_password(self):
+        sec_code = self.controller._create_sec_code_record(
+            account_id=str(self.account_model.id),
+            sec_code="test-sec-code",
+            code_expiration=5,
+        )
+        with self.assertQueryBudget("reset_password"):
+            response = self.client.post(
+                reverse("reset_password"),
+                data={
+                    "id": str(self.account_model.id),
+                    "sec_code": sec_code,
+                    "new_password": "new_password",
+                },
+                format=self.data_format,
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @query_budget("change_password")
+    def test_change_password(self):
+        response = self.client.post(
+            reverse("change_password"),
+            data=self.account_test_data.change_password(),
+            format=self.data_format,
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @query_budget("send_one_time_password")
+    def test_send_one_time_password(self):
+        response = self.client.get(
+            f"{reverse('send_one_time_password')}?"
+            f"{urlencode({'email': self.account_model.email})}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_confirm_one_time_password(self):
+        self.client.get(
+            f"{reverse('send_one_time_password')}?"
+            f"{urlencode({'email': self.account_model.email})}"
+        )
+        with self.assertQueryBudget("confirm_one_time_password"):
+            response = self.client.post(
+                reverse("confirm_one_time_password"),
+                data={
+                    "id": str(self.account_model.id),
+                    "otp_code": settings.MASTER_OTP_CODES[0],
+                },
+                format=self.data_format,
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @query_budget("deactivate_account")
+    def test_deactivate_account(self):
+        response = self.client.delete(
+            reverse("deactivate_account"), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    @query_budget("update_account_group")
+    def test_update_account_group(self):
+        response = self.client.patch(
+            reverse("update_account_group"),
+            data=self.account_test_data.change_group(str(self.account_model.id)),
+            format=self.data_format,
+            headers=self.admin_headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_exceeded_budget_reports_sql_diff(self):
+        if self.budget_file.updating:
+            self.skipTest("budgets are being recorded")
+        with self.assertRaises(AssertionError) as context:
+            with self.assertQueryBudget("get_account", queries=1):
+                self.client.get(reverse("get_account"), headers=self.headers)
+        message = str(context.exception)
+        self.assertIn("get_account exceeded its budget: queries 2 > 1", message)
+        self.assertIn('FROM "user_accounts"', message)
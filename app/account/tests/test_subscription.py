@@ -0,0 +1,102 @@
+import json
+import uuid
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import tag
+
+from app.account.models import AccountModel
+from app.account.subscription import (
+    AccountDeletionSubscriptionHandler,
+    KeycloakEventPoller,
+    KeycloakEventSubscriptionHandler,
+)
+from core.constants import AccountStatusEnum
+
+from .base_test_case import AccountTestCase
+
+
+@tag("app.account.subscription")
+class TestAccountDeletionSubscriptionHandler(AccountTestCase):
+    def test_handle_batch(self):
+        handler = AccountDeletionSubscriptionHandler(self.account_repository)
+        result = handler.handle_batch(
+            [{"id": str(self.account_model.id)}, {"id": str(uuid.uuid4())}, {}]
+        )
+        self.assertEqual(result, 1)
+        account = AccountModel.objects.get(pk=self.account_model.id)
+        self.assertFalse(account.is_active)
+        self.assertTrue(account.is_deleted)
+        self.assertEqual(account.status, AccountStatusEnum.deactivated.value)
+        self.assertIsNotNone(account.deleted_at)
+
+    def test_handler_is_idempotent(self):
+        handler = AccountDeletionSubscriptionHandler(self.account_repository)
+        handler.handler({"id": str(self.account_model.id)})
+        self.assertEqual(handler.handler({"id": str(self.account_model.id)}), 0)
+
+
+@tag("app.account.subscription")
+class TestKeycloakEventSubscriptionHandler(AccountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.iam_user_id = str(uuid.uuid4())
+        self.account_repository.update_by_id(
+            obj_id=self.account_model.id,
+            obj_data={"iam_provider_id": self.iam_user_id},
+        )
+        self.handler = KeycloakEventSubscriptionHandler(self.account_repository)
+
+    def admin_event(self, time, operation="UPDATE", representation=None):
+        return {
+            "time": time,
+            "operationType": operation,
+            "resourceType": "USER",
+            "resourcePath": f"users/{self.iam_user_id}",
+            "representation": json.dumps(representation or {}),
+        }
+
+    def test_verify_email_event(self):
+        result = self.handler.handler(
+            {"time": 1, "type": "VERIFY_EMAIL", "userId": self.iam_user_id}
+        )
+        self.assertEqual(result, 1)
+        account = AccountModel.objects.get(pk=self.account_model.id)
+        self.assertTrue(account.is_email_verified)
+
+    def test_handle_batch_applies_latest_state(self):
+        result = self.handler.handle_batch(
+            [
+                self.admin_event(time=3, representation={"enabled": True}),
+                self.admin_event(time=2, representation={"enabled": False}),
+                {"time": 1, "type": "LOGIN", "userId": self.iam_user_id},
+            ]
+        )
+        self.assertEqual(result, 1)
+        account = AccountModel.objects.get(pk=self.account_model.id)
+        self.assertTrue(account.is_active)
+
+    def test_delete_event(self):
+        self.handler.handler(self.admin_event(time=1, operation="DELETE"))
+        account = AccountModel.objects.get(pk=self.account_model.id)
+        self.assertFalse(account.is_active)
+        self.assertTrue(account.is_deleted)
+        self.assertEqual(account.status, AccountStatusEnum.deactivated.value)
+
+    def test_poller_checkpoint(self):
+        self.addCleanup(cache.clear)
+        keycloak_auth_service = mock.Mock()
+        keycloak_auth_service.get_user_events.return_value = [
+            {"time": 20, "type": "VERIFY_EMAIL", "userId": self.iam_user_id}
+        ]
+        keycloak_auth_service.get_admin_events.return_value = [
+            self.admin_event(time=10, representation={"enabled": False})
+        ]
+        poller = KeycloakEventPoller(keycloak_auth_service, self.handler)
+        self.assertEqual(poller.poll(), 2)
+        self.assertEqual(cache.get("keycloak_user_events_checkpoint"), 20)
+        self.assertEqual(cache.get("keycloak_admin_events_checkpoint"), 10)
+        keycloak_auth_service.get_user_events.return_value = []
+        poller.poll()
+        query = keycloak_auth_service.get_user_events.call_args.kwargs.get("query")
+        self.assertIn("dateFrom", query)
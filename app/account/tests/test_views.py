@@ -1,7 +1,7 @@
 from unittest import mock
 from urllib.parse import urlencode
 
-from django.test import tag
+from django.test import override_settings, tag
 from django.urls import reverse
 from rest_framework import status
 
@@ -55,6 +55,48 @@ class TestAccountView(AccountTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIsInstance(response_data, dict)
 
+    def test_get_account_not_modified(self):
+        self.jwt_decode.return_value = self.mock_decode_token()
+        response = self.client.get(reverse("get_account"), headers=self.headers)
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertIn("Last-Modified", response)
+        response = self.client.get(
+            reverse("get_account"),
+            headers={**self.headers, "If-None-Match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_get_account_modified(self):
+        self.jwt_decode.return_value = self.mock_decode_token()
+        etag = self.client.get(reverse("get_account"), headers=self.headers)["ETag"]
+        self.account_repository.update_by_id(
+            obj_id=self.account_model.id, obj_data={"is_phone_verified": True}
+        )
+        response = self.client.get(
+            reverse("get_account"), headers={**self.headers, "If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["is_phone_verified"])
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_view_all_accounts_not_modified(self):
+        self.jwt_decode.return_value = self.mock_decode_token(
+            id_=self.super_admin_model.id
+        )
+        url = f"{reverse('view_all_accounts')}?page=1&page_size=1"
+        etag = self.client.get(url, headers=self.headers)["ETag"]
+        response = self.client.get(url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotEqual(
+            self.client.get(f"{url}&page=2", headers=self.headers)["ETag"], etag
+        )
+        self.account_repository.update_all(
+            filter_param={"id": self.account_model.id}, obj_data={"is_active": False}
+        )
+        response = self.client.get(url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_get_account_unauthorized_exc(self):
         response = self.client.get(reverse("get_account"))
         response_data = response.json()
@@ -213,6 +255,25 @@ class TestAccountView(AccountTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIsInstance(response_data, dict)
 
+    @override_settings(RESPONSE_COMPRESSION_MIN_BYTES=1)
+    @mock.patch("core.services.keycloak_service.KeycloakAuthService.get_token")
+    @mock.patch("core.services.keycloak_service.KeycloakAuthService.change_password")
+    def test_change_password_is_not_compressed(
+        self, mock_change_password, mock_get_token
+    ):
+        self.jwt_decode.return_value = self.mock_decode_token()
+        mock_change_password.return_value = self.mock_keycloak_auth.change_password()
+        mock_get_token.return_value = self.mock_keycloak_auth.get_token()
+        response = self.client.post(
+            reverse("change_password"),
+            data=self.account_test_data.change_password(),
+            format=self.data_format,
+            headers={**self.headers, "Accept-Encoding": "gzip, br"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("access_token", response.json())
+
     def test_change_password_invalid_data_exc(self):
         self.jwt_decode.return_value = self.mock_decode_token()
         response = self.client.post(
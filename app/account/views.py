@@ -1,6 +1,6 @@
-import pinject
 from django.shortcuts import render
 from django.urls import reverse
+from django.views.decorators.http import condition
 from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework.decorators import (
     api_view,
@@ -10,6 +10,8 @@ from rest_framework.decorators import (
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from core.http.views import async_api_view
+from core.provider import LazyObjectGraph
 from core.services import KeycloakAuthService
 from core.utils import (
     IsSuperAdmin,
@@ -17,6 +19,7 @@ from core.utils import (
     api_responses,
 )
 
+from .cache import account_cache
 from .controller import AccountController
 from .repository import AccountRepository
 from .serializer import (
@@ -35,11 +38,11 @@ from .serializer import (
     UpdateAccountGroupSerializer,
 )
 
-obj_graph = pinject.new_object_graph(
-    modules=None,
-    classes=[AccountController, AccountRepository, KeycloakAuthService],
+obj_graph = LazyObjectGraph(
+    classes=[AccountController, AccountRepository, KeycloakAuthService]
 )
-account_controller: AccountController = obj_graph.provide(AccountController)
+# built on first use, not when the urls are imported by manage.py or the tests
+account_controller: AccountController = obj_graph.lazy(AccountController)
 api_doc_tag = ["Account"]
 
 
@@ -51,6 +54,10 @@ api_doc_tag = ["Account"]
 @api_view(http_method_names=["GET"])
 @authentication_classes([KeycloakAuthentication])
 @permission_classes([IsSuperAdmin])
+@condition(
+    etag_func=account_cache.collection_etag,
+    last_modified_func=account_cache.collection_last_modified,
+)
 def view_all_accounts(request):
     return account_controller.view_all_accounts(request)
 
@@ -61,11 +68,23 @@ def view_all_accounts(request):
 )
 @api_view(http_method_names=["GET"])
 @authentication_classes([KeycloakAuthentication])
+@condition(
+    etag_func=account_cache.account_etag,
+    last_modified_func=lambda request: request.user.updated_at,
+)
 def get_account(request):
     serializer = account_controller.get_account(request)
     return Response(data=serializer.data, status=200)
 
 
+def _create_account(request: Request):
+    serializer = account_controller.create_account(
+        request.data,
+        f"{request.scheme}://{request.get_host()}{reverse('verify_account_email')}",
+    )
+    return Response(data=serializer.data, status=201)
+
+
 @extend_schema(
     request=CreateAccountSerializer,
     responses=api_responses(
@@ -74,9 +93,9 @@ def get_account(request):
     tags=api_doc_tag,
     auth=[],
 )
-@api_view(http_method_names=["POST"])
-def create_account(request: Request):
-    serializer = account_controller.create_account(
+@async_api_view(http_method_names=["POST"], sync_view=_create_account)
+async def create_account(request: Request):
+    serializer = await account_controller.acreate_account(
         request.data,
         f"{request.scheme}://{request.get_host()}{reverse('verify_account_email')}",
     )
@@ -152,6 +171,11 @@ def toggle_apikey_status(request: Request):
     return Response(data=serializer.data, status=200)
 
 
+def _login_account(request):
+    result = account_controller.login_account(request)
+    return Response(data=result, status=200)
+
+
 @extend_schema(
     request=LoginAccountSerializer,
     responses=api_responses(
@@ -160,9 +184,14 @@ def toggle_apikey_status(request: Request):
     tags=api_doc_tag,
     auth=[],
 )
-@api_view(http_method_names=["POST"])
-def login_account(request):
-    result = account_controller.login_account(request)
+@async_api_view(http_method_names=["POST"], sync_view=_login_account)
+async def login_account(request):
+    result = await account_controller.alogin_account(request)
+    return Response(data=result, status=200)
+
+
+def _refresh_access_token(request):
+    result = account_controller.refresh_user_token(request)
     return Response(data=result, status=200)
 
 
@@ -172,9 +201,9 @@ def login_account(request):
     tags=api_doc_tag,
     auth=[],
 )
-@api_view(http_method_names=["POST"])
-def refresh_access_token(request):
-    result = account_controller.refresh_user_token(request)
+@async_api_view(http_method_names=["POST"], sync_view=_refresh_access_token)
+async def refresh_access_token(request):
+    result = await account_controller.arefresh_user_token(request)
     return Response(data=result, status=200)
 
 
@@ -230,6 +259,11 @@ def change_password(request):
     return Response(data=result, status=200)
 
 
+def _send_one_time_password(request: Request):
+    serializer = account_controller.send_otp(email=request.query_params.get("email"))
+    return Response(data=serializer.data, status=200)
+
+
 @extend_schema(
     parameters=[
         OpenApiParameter(
@@ -246,12 +280,19 @@ def change_password(request):
     tags=api_doc_tag,
     auth=[],
 )
-@api_view(http_method_names=["GET"])
-def send_one_time_password(request: Request):
-    serializer = account_controller.send_otp(email=request.query_params.get("email"))
+@async_api_view(http_method_names=["GET"], sync_view=_send_one_time_password)
+async def send_one_time_password(request: Request):
+    serializer = await account_controller.asend_otp(
+        email=request.query_params.get("email")
+    )
     return Response(data=serializer.data, status=200)
 
 
+def _confirm_one_time_password(request):
+    result = account_controller.otp_confirmation(request)
+    return Response(data=result, status=200)
+
+
 @extend_schema(
     request=ConfirmOtpSerializer,
     responses=api_responses(
@@ -260,9 +301,9 @@ def send_one_time_password(request: Request):
     tags=api_doc_tag,
     auth=[],
 )
-@api_view(http_method_names=["POST"])
-def confirm_one_time_password(request):
-    result = account_controller.otp_confirmation(request)
+@async_api_view(http_method_names=["POST"], sync_view=_confirm_one_time_password)
+async def confirm_one_time_password(request):
+    result = await account_controller.aotp_confirmation(request)
     return Response(data=result, status=200)
 
 
@@ -0,0 +1,345 @@
+"""
+End-to-end load benchmark of the account endpoints. The service is served
+in-process by a threaded WSGI server (or uvicorn, --server asgi) against
+postgres (a throwaway database), fakeredis, an in-memory kafka producer and
+an HTTP fake keycloak with configurable latency and error injection. Each scenario is driven by
+virtual users spread over load generator processes, at every concurrency
+level, and the p50/p95/p99 latency and requests per second are written to
+a JSON file that can be compared with the result of another commit.
+
+usage: python -m benchmarks.load [--scenarios login get_account]
+    [--concurrency 1 8 32] [--duration 20] [--warmup 3] [--threads 16]
+    [--server wsgi|asgi]
+    [--keycloak-latency-ms 15] [--keycloak-error-rate 0.0]
+    [--output benchmarks/results/load.json] [--baseline previous.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.load.fake_keycloak import FakeKeycloak
+from benchmarks.load.scenarios import SCENARIOS, run_process
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds")
+    parser.add_argument("--threads", type=int, default=16, help="server threads")
+    parser.add_argument(
+        "--server",
+        choices=["wsgi", "asgi"],
+        default="wsgi",
+        help="the asgi server (uvicorn) runs the async views on its event loop",
+    )
+    parser.add_argument(
+        "--processes", type=int, default=os.cpu_count() or 1, help="load generators"
+    )
+    parser.add_argument("--keycloak-latency-ms", type=float, default=15.0)
+    parser.add_argument("--keycloak-jitter-ms", type=float, default=5.0)
+    parser.add_argument("--keycloak-error-rate", type=float, default=0.0)
+    parser.add_argument("--accounts", type=int, default=64, help="seeded accounts")
+    parser.add_argument("--keepdb", action="store_true", help="keep the database")
+    parser.add_argument("--output", default="benchmarks/results/load.json")
+    parser.add_argument("--baseline", help="a previous result to compare with")
+    return parser.parse_args()
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """
+    nearest-rank percentile of an ordered list
+    """
+    if not ordered:
+        return 0.0
+    index = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(latencies: list, statuses: dict, duration: float) -> dict:
+    ordered = sorted(latencies)
+    errors = sum(
+        count for status, count in statuses.items() if not 200 <= int(status) < 400
+    )
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / duration, 2),
+        "latency_ms": {
+            "p50": round(percentile(ordered, 0.50), 3),
+            "p95": round(percentile(ordered, 0.95), 3),
+            "p99": round(percentile(ordered, 0.99), 3),
+            "max": round(ordered[-1], 3) if ordered else 0.0,
+            "mean": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        },
+        "status_codes": {str(status): count for status, count in statuses.items()},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def setup_django(keycloak: FakeKeycloak, args):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.load.settings")
+    os.environ["BENCHMARK_KEYCLOAK_URL"] = keycloak.url
+    os.environ["BENCHMARK_SERVER"] = args.server
+    import django
+
+    django.setup()
+    from django.db import connection
+
+    database_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, keepdb=args.keepdb
+    )
+    import core.producer
+    from benchmarks.load.fake_kafka import FakeKafkaProducer
+
+    # the producer is created lazily, installing the fake skips kafka altogether
+    core.producer._producer = FakeKafkaProducer()
+    return core.producer._producer, database_name
+
+
+def seed_accounts(keycloak: FakeKeycloak, count: int, password: str) -> list:
+    """
+    create the accounts the virtual users log in with, all sharing a password
+    hashed once, and sign their tokens with the fake keycloak key
+    """
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import Group
+
+    from app.account.models import AccountModel
+    from core.constants import AccountStatusEnum, GroupEnum
+
+    AccountModel.objects.filter(username__startswith="load-").delete()
+    hashed = make_password(password)
+    accounts = AccountModel.objects.bulk_create(
+        AccountModel(
+            username=f"load-{index}",
+            email=f"load-{index}@example.com",
+            phone=f"+1000{index:08d}",
+            password=hashed,
+            iam_provider_id=f"load-{index}",
+            is_email_verified=True,
+            status=AccountStatusEnum.active.value,
+        )
+        for index in range(count)
+    )
+    group = Group.objects.get(name=GroupEnum.user.value)
+    group.user_set.add(*accounts)
+    admin = AccountModel.objects.get(username=settings.SUPER_ADMIN_USERNAME)
+    admin_token = keycloak.issue_tokens(str(admin.id))["access_token"]
+    seeded = []
+    for account in accounts:
+        tokens = keycloak.issue_tokens(str(account.id))
+        seeded.append(
+            {
+                "id": str(account.id),
+                "username": account.username,
+                "email": account.email,
+                "password": password,
+                "access_token": tokens["access_token"],
+                "refresh_token": tokens["refresh_token"],
+                "admin_token": admin_token,
+                "pages": max(count // 20, 1),
+            }
+        )
+    return seeded
+
+
+def drop_database(database_name: str):
+    """
+    drop the benchmark database, disconnecting the server and notification
+    threads that still hold a connection to it
+    """
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_terminate_backend(pid) FROM pg_stat_activity"
+            " WHERE datname = current_database() AND pid <> pg_backend_pid()"
+        )
+    connection.close()
+    connection.creation.destroy_test_db(database_name, verbosity=0)
+
+
+def start_server(kind: str, threads: int):
+    import threading
+
+    from benchmarks.load.server import (
+        ASGIServer,
+        PooledWSGIServer,
+        QuietRequestHandler,
+    )
+
+    if kind == "asgi":
+        from django.core.asgi import get_asgi_application
+
+        server = ASGIServer(get_asgi_application())
+        server.serve_forever()
+    else:
+        from django.core.wsgi import get_wsgi_application
+
+        server = PooledWSGIServer(
+            ("127.0.0.1", 0), QuietRequestHandler, threads=threads
+        )
+        server.set_app(get_wsgi_application())
+        threading.Thread(target=server.serve_forever, name="wsgi", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def run_level(scenario, concurrency, base_url, accounts, args, otp_code) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = min(concurrency, args.processes)
+    users = [accounts[index % len(accounts)] for index in range(concurrency)]
+    workers = []
+    for process_index in range(processes):
+        process_users = users[process_index::processes]
+        workers.append(
+            context.Process(
+                target=run_process,
+                args=(
+                    scenario,
+                    base_url,
+                    process_users,
+                    process_index * 1000,
+                    args.duration,
+                    args.warmup,
+                    otp_code,
+                    results,
+                ),
+            )
+        )
+    for worker in workers:
+        worker.start()
+    sessions = [session for _ in workers for session in results.get()]
+    for worker in workers:
+        worker.join()
+    latencies, statuses, endpoints = [], {}, {}
+    for session in sessions:
+        for name, values in session["latencies"].items():
+            latencies.extend(values)
+            endpoints.setdefault(name, ([], {}))[0].extend(values)
+        for name, codes in session["statuses"].items():
+            for status, count in codes.items():
+                statuses[status] = statuses.get(status, 0) + count
+                endpoint_statuses = endpoints.setdefault(name, ([], {}))[1]
+                endpoint_statuses[status] = endpoint_statuses.get(status, 0) + count
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        **summarize(latencies, statuses, args.duration),
+        "endpoints": {
+            name: summarize(values, codes, args.duration)
+            for name, (values, codes) in endpoints.items()
+        },
+    }
+
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as baseline_file:
+        baseline = {
+            (result["scenario"], result["concurrency"]): result
+            for result in json.load(baseline_file)["results"]
+        }
+    print(f"\ncompared with {baseline_path}")
+    print(f"{'scenario':<16}{'users':>6}{'rps':>16}{'p95 ms':>20}")
+    for result in results:
+        before = baseline.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+        rps_change = (result["rps"] / before["rps"] - 1) * 100 if before["rps"] else 0
+        p95, p95_before = result["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        p95_change = (p95 / p95_before - 1) * 100 if p95_before else 0
+        print(
+            f"{result['scenario']:<16}{result['concurrency']:>6}"
+            f"{result['rps']:>9.1f} {rps_change:>+5.1f}%"
+            f"{p95:>13.1f} {p95_change:>+5.1f}%"
+        )
+
+
+def main():
+    args = parse_args()
+    keycloak = FakeKeycloak(
+        realm=os.environ.get("KEYCLOAK_REALM", "iam"),
+        latency_ms=args.keycloak_latency_ms,
+        jitter_ms=args.keycloak_jitter_ms,
+        error_rate=args.keycloak_error_rate,
+    ).start()
+    producer, database_name = setup_django(keycloak, args)
+    from django.conf import settings
+    from django.db import connection
+
+    accounts = seed_accounts(keycloak, args.accounts, password="Load-Benchmark-1")
+    connection.close()
+    server, base_url = start_server(args.server, args.threads)
+    results = []
+    print(
+        f"{'scenario':<16}{'users':>6}{'requests':>10}{'errors':>8}{'rps':>9}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    )
+    try:
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                result = run_level(
+                    scenario,
+                    concurrency,
+                    base_url,
+                    accounts,
+                    args,
+                    settings.MASTER_OTP_CODES[0],
+                )
+                results.append(result)
+                latency = result["latency_ms"]
+                print(
+                    f"{scenario:<16}{concurrency:>6}{result['requests']:>10}"
+                    f"{result['errors']:>8}{result['rps']:>9.1f}{latency['p50']:>9.1f}"
+                    f"{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+        keycloak.stop()
+        if not args.keepdb:
+            drop_database(database_name)
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "results": results,
+        "keycloak": keycloak.stats(),
+        "kafka": producer.stats(),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"results written to {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    started = time.monotonic()
+    main()
+    print(f"done in {time.monotonic() - started:.0f}s")
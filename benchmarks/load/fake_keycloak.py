@@ -0,0 +1,200 @@
+"""
+An HTTP stand-in for the Keycloak endpoints called by the service, so the load
+benchmark exercises the real python-keycloak client without a Keycloak server.
+"""
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+class FakeKeycloak:
+    """
+    Serves the realm public key, the token endpoint (password, refresh_token
+    and client_credentials grants), token introspection, user creation and
+    password resets. Tokens are RS256 JWTs signed with a key generated at
+    start. Every response is delayed by latency_ms (+/- jitter_ms) and a
+    fraction error_rate of them fail with a 503.
+    """
+
+    def __init__(
+        self,
+        realm: str,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        token_lifetime: int = 300,
+    ):
+        self.realm = realm
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.token_lifetime = token_lifetime
+        self.private_key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        )
+        self.public_key = base64.b64encode(
+            self.private_key.public_key().public_bytes(
+                serialization.Encoding.DER,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+        ).decode()
+        self.calls = Counter()
+        self.errors = Counter()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.routes = [
+            ("GET", rf"/realms/{realm}/?", self.realm_info),
+            ("POST", rf"/realms/{realm}/protocol/openid-connect/token", self.token),
+            (
+                "POST",
+                rf"/realms/{realm}/protocol/openid-connect/token/introspect",
+                self.introspect,
+            ),
+            ("POST", rf"/admin/realms/{realm}/users", self.create_user),
+            (
+                "PUT",
+                rf"/admin/realms/{realm}/users/([^/]+)/reset-password",
+                self.reset_password,
+            ),
+        ]
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        threading.Thread(
+            target=self.server.serve_forever, name="fake-keycloak", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls), "injected_errors": dict(self.errors)}
+
+    def issue_tokens(self, subject: str) -> dict:
+        now = int(time.time())
+        claims = {
+            "iss": f"{self.url}realms/{self.realm}",
+            "sub": subject,
+            "preferred_username": subject,
+            "iat": now,
+            "exp": now + self.token_lifetime,
+            "jti": uuid.uuid4().hex,
+            "typ": "Bearer",
+        }
+        return {
+            "access_token": jwt.encode(claims, self.private_key, algorithm="RS256"),
+            "refresh_token": jwt.encode(
+                {**claims, "typ": "Refresh", "exp": now + 10 * self.token_lifetime},
+                self.private_key,
+                algorithm="RS256",
+            ),
+            "token_type": "Bearer",
+            "expires_in": self.token_lifetime,
+            "refresh_expires_in": 10 * self.token_lifetime,
+        }
+
+    def realm_info(self, request, body):
+        return 200, {"realm": self.realm, "public_key": self.public_key}, {}
+
+    def token(self, request, body):
+        form = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+        grant_type = form.get("grant_type")
+        if grant_type == "password":
+            return 200, self.issue_tokens(form.get("username")), {}
+        if grant_type == "refresh_token":
+            try:
+                claims = jwt.decode(
+                    form.get("refresh_token", ""),
+                    self.private_key.public_key(),
+                    algorithms=["RS256"],
+                )
+            except jwt.PyJWTError:
+                return 400, {"error": "invalid_grant"}, {}
+            return 200, self.issue_tokens(claims["sub"]), {}
+        if grant_type == "client_credentials":
+            return 200, self.issue_tokens(form.get("client_id")), {}
+        return 400, {"error": "unsupported_grant_type"}, {}
+
+    def introspect(self, request, body):
+        return 200, {"active": True}, {}
+
+    def create_user(self, request, body):
+        user_id = str(uuid.uuid4())
+        path = request.path.rstrip("/")
+        return 201, None, {"Location": f"{self.url.rstrip('/')}{path}/{user_id}"}
+
+    def reset_password(self, request, body, user_id=None):
+        return 204, None, {}
+
+    def dispatch(self, request, method: str):
+        path = request.path.split("?", 1)[0]
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        for route_method, pattern, view in self.routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                with self._lock:
+                    self.calls[view.__name__] += 1
+                self.delay()
+                if self.error_rate and random.random() < self.error_rate:
+                    with self._lock:
+                        self.errors[view.__name__] += 1
+                    return 503, {"error": "injected failure"}, {}
+                return view(request, body, *match.groups())
+        return 404, {"error": f"{method} {path} is not faked"}, {}
+
+    def delay(self):
+        if self.latency_ms or self.jitter_ms:
+            latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+            time.sleep(max(latency, 0) / 1000)
+
+    def handler_class(self):
+        keycloak = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def handle_method(self, method: str):
+                status, data, headers = keycloak.dispatch(self, method)
+                payload = b"" if data is None else json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self.handle_method("GET")
+
+            def do_POST(self):
+                self.handle_method("POST")
+
+            def do_PUT(self):
+                self.handle_method("PUT")
+
+            def log_message(self, format, *args):
+                return None
+
+        return Handler
@@ -0,0 +1,201 @@
+"""
+The scenarios driven by the load benchmark. This module only uses the standard
+library, it runs in the load generator processes which do not set up django.
+"""
+import http.client
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+ACCOUNT_PATH = "/api/v1/account/"
+
+
+class Session:
+    """
+    a virtual user, recording the latency and status of every call it makes
+    """
+
+    def __init__(
+        self, base_url: str, account: dict, worker: int, run_id: int, otp_code: str
+    ):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port
+        self.account = account
+        self.worker = worker
+        self.run_id = run_id
+        self.otp_code = otp_code
+        self.iteration = 0
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def call(
+        self,
+        name: str,
+        method: str,
+        path: str,
+        body: dict = None,
+        token: str = None,
+        query: dict = None,
+    ) -> Optional[dict]:
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        payload = json.dumps(body).encode() if body is not None else None
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            content = response.read()
+            status = response.status
+        except OSError:
+            content, status = b"", 0
+        finally:
+            connection.close()
+        self.latencies[name].append((time.perf_counter() - started) * 1000)
+        self.statuses[name][status] += 1
+        if 200 <= status < 300 and content:
+            try:
+                return json.loads(content)
+            except ValueError:
+                return None
+        return None
+
+    def results(self) -> dict:
+        return {
+            "latencies": dict(self.latencies),
+            "statuses": {name: dict(codes) for name, codes in self.statuses.items()},
+        }
+
+
+def signup(session: Session):
+    suffix = f"{session.run_id}-{session.worker}-{session.iteration}"
+    session.call(
+        "create_account",
+        "POST",
+        f"{ACCOUNT_PATH}create/",
+        body={
+            "username": f"signup-{suffix}",
+            "phone": f"+{session.run_id % 10**4:04d}"
+            f"{session.worker:05d}{session.iteration:08d}",
+            "email": f"signup-{suffix}@example.com",
+            "password": session.account["password"],
+        },
+    )
+
+
+def login(session: Session):
+    session.call(
+        "login_account",
+        "POST",
+        f"{ACCOUNT_PATH}login/",
+        body={
+            "username": session.account["username"],
+            "password": session.account["password"],
+        },
+    )
+
+
+def refresh(session: Session):
+    tokens = session.call(
+        "refresh_access_token",
+        "POST",
+        f"{ACCOUNT_PATH}refresh-token/",
+        body={"refresh_token": session.account["refresh_token"]},
+    )
+    if tokens and tokens.get("refresh_token"):
+        session.account["refresh_token"] = tokens["refresh_token"]
+
+
+def get_account(session: Session):
+    session.call(
+        "get_account",
+        "GET",
+        f"{ACCOUNT_PATH}detail/",
+        token=session.account["access_token"],
+    )
+
+
+def otp(session: Session):
+    session.call(
+        "send_one_time_password",
+        "GET",
+        f"{ACCOUNT_PATH}otp/",
+        query={"email": session.account["email"]},
+    )
+    session.call(
+        "confirm_one_time_password",
+        "POST",
+        f"{ACCOUNT_PATH}otp/confirm/",
+        body={"id": session.account["id"], "otp_code": session.otp_code},
+    )
+
+
+def list_accounts(session: Session):
+    session.call(
+        "view_all_accounts",
+        "GET",
+        ACCOUNT_PATH,
+        token=session.account["admin_token"],
+        query={
+            "page": session.iteration % session.account["pages"] + 1,
+            "page_size": 20,
+        },
+    )
+
+
+SCENARIOS: Dict[str, Callable[[Session], None]] = {
+    "signup": signup,
+    "login": login,
+    "refresh": refresh,
+    "get_account": get_account,
+    "otp": otp,
+    "list_accounts": list_accounts,
+}
+
+
+def run_process(
+    scenario: str,
+    base_url: str,
+    accounts: List[dict],
+    first_worker: int,
+    duration: float,
+    warmup: float,
+    otp_code: str,
+    results,
+):
+    """
+    run one virtual user per account in threads of this process for warmup
+    plus duration seconds, and put the calls made after the warmup on results
+    """
+    run = SCENARIOS[scenario]
+    started = time.monotonic()
+    measure_from, deadline = started + warmup, started + warmup + duration
+    sessions = []
+
+    def virtual_user(session: Session, warmup_session: Session):
+        while time.monotonic() < deadline:
+            run(session if time.monotonic() >= measure_from else warmup_session)
+            session.iteration += 1
+            warmup_session.iteration = session.iteration
+
+    threads = []
+    run_id = int(time.time())
+    for index, account in enumerate(accounts):
+        worker = first_worker + index
+        session = Session(base_url, account, worker, run_id, otp_code)
+        warmup_session = Session(base_url, account, worker, run_id, otp_code)
+        sessions.append(session)
+        threads.append(
+            threading.Thread(target=virtual_user, args=(session, warmup_session))
+        )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put([session.results() for session in sessions])
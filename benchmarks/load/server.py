@@ -0,0 +1,90 @@
+"""
+The WSGI and ASGI servers of the load benchmark.
+"""
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+
+try:
+    import uvicorn
+except ImportError:  # only the asgi server needs it
+    uvicorn = None
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    serves every connection from a fixed pool of threads, so the database
+    connections of the threads are reused across requests as they are by the
+    threads of a gunicorn worker (django's ThreadedWSGIServer opens a thread,
+    and a database connection, per request)
+    """
+
+    def __init__(self, *args, threads: int = 16, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        return None
+
+
+class ASGIServer:
+    """
+    serves the ASGI application with uvicorn from a thread. async views run on
+    its event loop, sync views in the thread django's ASGIHandler hands each
+    request to, as they are by a uvicorn worker
+    """
+
+    def __init__(self, application, host: str = "127.0.0.1", port: int = 0):
+        if uvicorn is None:
+            raise RuntimeError("the asgi server needs uvicorn, pip install uvicorn")
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((host, port))
+        self.server_address = self.socket.getsockname()
+        self.server = uvicorn.Server(
+            uvicorn.Config(
+                application,
+                lifespan="off",
+                access_log=False,
+                # keep the service's logging, dictConfig would replace it
+                log_config=None,
+                backlog=2048,
+            )
+        )
+        self.thread = threading.Thread(
+            target=self.server.run,
+            kwargs={"sockets": [self.socket]},
+            name="asgi",
+            daemon=True,
+        )
+
+    def serve_forever(self):
+        self.thread.start()
+        while not self.server.started and self.thread.is_alive():
+            threading.Event().wait(0.01)
+
+    def shutdown(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+    def server_close(self):
+        self.socket.close()
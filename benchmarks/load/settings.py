@@ -0,0 +1,37 @@
+"""
+Settings of the load benchmark: the service against postgres (a throwaway
+database created by the benchmark), fakeredis and the fake keycloak started by
+the benchmark, whose url is passed in BENCHMARK_KEYCLOAK_URL.
+"""
+import os
+
+from fakeredis import FakeConnection
+
+from config.settings.base import *  # noqa
+
+DEBUG = False
+ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
+
+# under ASGI django runs each request's sync code in a thread of its own, a
+# persistent connection would be left open by every one of them
+DATABASES["default"]["CONN_MAX_AGE"] = (  # noqa: F405
+    0 if os.environ.get("BENCHMARK_SERVER") == "asgi" else 60
+)
+# uvicorn keeps one event loop, the async views and their keycloak client live on it
+ASYNC_VIEWS = os.environ.get("BENCHMARK_SERVER") == "asgi"
+DATABASES["default"]["TEST"] = {  # noqa: F405
+    "NAME": env("BENCHMARK_DB_NAME", default="iam_load_benchmark")  # noqa: F405
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://",
+        "OPTIONS": {"connection_class": FakeConnection},
+    }
+}
+
+KEYCLOAK_SERVER_URL = os.environ.get("BENCHMARK_KEYCLOAK_URL", "http://127.0.0.1:8089/")
+# the fake producer never fails, nothing is spooled
+KAFKA_SPOOL_ENABLED = False
+METRICS_DIR = None
@@ -0,0 +1,111 @@
+"""
+Measure the size and encoding cost of the email notification payloads published
+to kafka, for every codec and compression type available, on payloads rendered
+from the real templates in templates/email.
+
+usage: python -m benchmarks.notification_payloads [--batch 50] [--rounds 200]
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.base")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.template.loader import render_to_string  # noqa: E402
+from kafka import codec as kafka_codec  # noqa: E402
+
+from core.codecs import CODECS, get_codec  # noqa: E402
+
+TEMPLATES = {
+    "account_otp_code.html": {"otp": "098765"},
+    "email_verification.html": {
+        "verification_link": "https://example.com/api/v1/account/verify/email/"
+        "?token=eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpZCI6IjEyMyJ9.signature"
+    },
+    "account_password_reset.html": {},
+    "account_password_change.html": {},
+    "account_deactivation.html": {},
+    "account_temporal_password.html": {"password": "Xy7!kq92LmP0"},
+}
+
+COMPRESSIONS = {
+    "none": (True, lambda data: data),
+    "gzip": (kafka_codec.has_gzip(), kafka_codec.gzip_encode),
+    "lz4": (kafka_codec.has_lz4(), kafka_codec.lz4_encode),
+    "zstd": (kafka_codec.has_zstd(), kafka_codec.zstd_encode),
+}
+
+
+def payloads(count: int):
+    """
+    email payloads as built by EmailNotificationHandler, cycling through the
+    templates with a different recipient each time
+    """
+    templates = list(TEMPLATES.items())
+    for index in range(count):
+        template, metadata = templates[index % len(templates)]
+        email = f"user{index}@example.com"
+        yield {
+            "user_id": str(uuid.uuid4()),
+            "sender": settings.SERVER_EMAIL,
+            "subject": "Notification",
+            "recipients": [email],
+            "html_body": render_to_string(
+                f"email/{template}", {"email": email, **metadata}
+            ),
+            "text_body": None,
+        }
+
+
+def encoders():
+    yield "json (stdlib, before)", lambda data: json.dumps(data).encode("UTF-8")
+    for name in CODECS:
+        try:
+            yield name, get_codec(name).encode
+        except Exception as exc:  # the codec's library is not installed
+            print(f"skipping {name}: {exc}")
+
+
+def measure(encode, compress, records: list, batch: int, rounds: int):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        encoded = [encode(record) for record in records]
+    encode_us = (time.perf_counter() - started) / (rounds * len(records)) * 1e6
+    single = sum(len(compress(data)) for data in encoded) / len(encoded)
+    batches = [b"".join(encoded[i : i + batch]) for i in range(0, len(encoded), batch)]
+    batched = sum(len(compress(data)) for data in batches) / len(encoded)
+    return encode_us, single, batched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    records = list(payloads(args.records))
+    print(
+        f"{'codec':<24}{'compression':<13}{'encode us':>10}"
+        f"{'bytes/record':>14}{f'bytes/record (batch {args.batch})':>28}"
+    )
+    for name, encode in encoders():
+        for compression, (available, compress) in COMPRESSIONS.items():
+            if not available:
+                continue
+            encode_us, single, batched = measure(
+                encode, compress, records, args.batch, args.rounds
+            )
+            print(
+                f"{name:<24}{compression:<13}{encode_us:>10.1f}"
+                f"{single:>14.0f}{batched:>28.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
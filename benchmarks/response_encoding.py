@@ -0,0 +1,78 @@
+"""
+Measure the size and CPU cost of the account list responses for every renderer
+and response compression available, on pages of AccountSerializer data as
+returned by the account endpoints.
+
+usage: python -m benchmarks.response_encoding [--rows 100] [--rounds 200]
+"""
+import argparse
+import gzip
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.base")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from app.account.serializer import AccountSerializer  # noqa: E402
+from core.http import FastJSONRenderer  # noqa: E402
+from core.http.compression import brotli  # noqa: E402
+from tests.benchmarks.data import accounts  # noqa: E402
+
+RENDERERS = {
+    "JSONRenderer (before)": JSONRenderer(),
+    "FastJSONRenderer": FastJSONRenderer(),
+}
+
+COMPRESSIONS = {
+    "none": (True, lambda data: data),
+    "gzip": (
+        True,
+        lambda data: gzip.compress(
+            data, compresslevel=settings.RESPONSE_COMPRESSION_GZIP_LEVEL, mtime=0
+        ),
+    ),
+    "br": (
+        brotli is not None,
+        lambda data: brotli.compress(
+            data, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY
+        ),
+    ),
+}
+
+
+def timed(func, data, rounds: int):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = func(data)
+    return result, (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    data = AccountSerializer(accounts(args.rows), many=True).data
+    print(
+        f"{'renderer':<24}{'compression':<13}{'render us':>10}"
+        f"{'compress us':>13}{'bytes':>9}"
+    )
+    for name, renderer in RENDERERS.items():
+        content, render_us = timed(renderer.render, data, args.rounds)
+        for compression, (available, compress) in COMPRESSIONS.items():
+            if not available:
+                continue
+            compressed, compress_us = timed(compress, content, args.rounds)
+            print(
+                f"{name:<24}{compression:<13}{render_us:>10.1f}"
+                f"{compress_us:>13.1f}{len(compressed):>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compare renders per second of the notification templates through the django
+template loader (render_to_string) and the precompiled template engine, along
+with the size of the html each produces.
+
+usage: python -m benchmarks.template_rendering [--rounds 2000]
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.base")
+django.setup()
+
+from django.template.loader import render_to_string  # noqa: E402
+
+from core.constants import EmailTemplateEnum  # noqa: E402
+from core.notifications.template_engine import (  # noqa: E402
+    template_engine,
+)
+
+CONTEXT = {
+    "email": "user@example.com",
+    "otp": "098765",
+    "password": "Xy7!kq92LmP0",
+    "verification_link": "https://example.com/api/v1/account/verify/email/?token=t",
+    "assignee_email": "admin@example.com",
+    "assigner_email": "root@example.com",
+}
+
+
+def renders_per_second(render, name: str, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        render(name, CONTEXT)
+    return rounds / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    print(
+        f"{'template':<34}{'django/s':>10}{'engine/s':>11}{'speedup':>9}"
+        f"{'django bytes':>14}{'engine bytes':>14}"
+    )
+    for template in EmailTemplateEnum:
+        name = f"email/{template.value}"
+        django_rate = renders_per_second(render_to_string, name, args.rounds)
+        engine_rate = renders_per_second(template_engine.render, name, args.rounds)
+        print(
+            f"{template.value:<34}{django_rate:>10.0f}{engine_rate:>11.0f}"
+            f"{engine_rate / django_rate:>8.1f}x"
+            f"{len(render_to_string(name, CONTEXT)):>14}"
+            f"{len(template_engine.render(name, CONTEXT)):>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 import ast
 import os
+import tempfile
 from pathlib import Path
 
 import environ
@@ -33,6 +34,30 @@ SUPER_ADMIN_USERNAME = env("SUPER_ADMIN_USERNAME")
 SUPER_ADMIN_EMAIL = env("SUPER_ADMIN_EMAIL")
 SUPER_ADMIN_PHONE = env("SUPER_ADMIN_PHONE")
 SUPER_ADMIN_PASSWORD = env("SUPER_ADMIN_PASSWORD")
+NOTIFICATION_SENDER_ID = env("NOTIFICATION_SENDER_ID", default=None)
+NOTIFICATION_DISPATCH_ASYNC = env.bool("NOTIFICATION_DISPATCH_ASYNC", default=True)
+# seconds within which a repeated otp or verification mail is suppressed
+NOTIFICATION_DEDUPE_WINDOW = env.int("NOTIFICATION_DEDUPE_WINDOW", default=60)
+NOTIFICATION_BLOCK_TIMEOUT = env.float("NOTIFICATION_BLOCK_TIMEOUT", default=0.05)
+# the high lane must keep a single worker and the wait policy, account events
+# rely on it for their order
+NOTIFICATION_LANES = {
+    "urgent": {
+        "workers": env.int("NOTIFICATION_URGENT_WORKERS", default=2),
+        "maxsize": env.int("NOTIFICATION_URGENT_QUEUE_SIZE", default=1000),
+        "policy": "block",
+    },
+    "high": {
+        "workers": 1,
+        "maxsize": env.int("NOTIFICATION_HIGH_QUEUE_SIZE", default=1000),
+        "policy": "wait",
+    },
+    "low": {
+        "workers": env.int("NOTIFICATION_LOW_WORKERS", default=1),
+        "maxsize": env.int("NOTIFICATION_LOW_QUEUE_SIZE", default=10000),
+        "policy": "drop",
+    },
+}
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
@@ -46,16 +71,23 @@ LOGGING = {
     "loggers": {
         "root": {
             "level": "INFO",
-            "handlers": ["console_handler", "mail_admins"],
+            "handlers": ["console_handler", "async_mail_handler"],
         },
         "django.request": {
-            "handlers": ["error_file_handler", "console_handler", "mail_admins"],
+            "handlers": ["console_handler", "async_error_handler"],
             "propagate": False,
         },
         "django.server": {
-            "handlers": ["access_file_handler", "console_handler"],
+            "handlers": ["console_handler", "async_access_handler"],
+            "propagate": False,
+        },
+        "core.request_timing": {
+            "level": "INFO",
+            "handlers": ["async_timing_handler"],
             "propagate": False,
         },
+        # the async keycloak client logs every request at INFO
+        "httpx": {"level": "WARNING"},
     },
     "handlers": {
         "console_handler": {
@@ -64,8 +96,34 @@ LOGGING = {
             "formatter": "error_formatter",
             "stream": "ext://sys.stdout",
         },
+        # file writes and admin mail happen on a listener thread, the logging
+        # thread only puts the record on a bounded queue
+        "async_error_handler": {
+            "()": "core.log.AsyncQueueHandler",
+            "level": "WARNING",
+            "handlers": ["error_file_handler", "mail_admins"],
+            "maxsize": env.int("LOG_QUEUE_SIZE", default=10000),
+        },
+        "async_mail_handler": {
+            "()": "core.log.AsyncQueueHandler",
+            "level": "ERROR",
+            "handlers": ["mail_admins"],
+            "maxsize": env.int("LOG_QUEUE_SIZE", default=10000),
+        },
+        "async_access_handler": {
+            "()": "core.log.AsyncQueueHandler",
+            "level": "INFO",
+            "handlers": ["access_file_handler"],
+            "maxsize": env.int("LOG_QUEUE_SIZE", default=10000),
+        },
+        "async_timing_handler": {
+            "()": "core.log.AsyncQueueHandler",
+            "level": "INFO",
+            "handlers": ["timing_file_handler"],
+            "maxsize": env.int("LOG_QUEUE_SIZE", default=10000),
+        },
         "error_file_handler": {
-            "class": "logging.handlers.TimedRotatingFileHandler",
+            "class": "core.log.BatchedFileHandler",
             "formatter": "error_formatter",
             "level": "WARNING",
             "filename": f"{BASE_DIR}/error.log",
@@ -74,7 +132,7 @@ LOGGING = {
             "backupCount": 1,
         },
         "access_file_handler": {
-            "class": "logging.handlers.TimedRotatingFileHandler",
+            "class": "core.log.BatchedFileHandler",
             "formatter": "access_formatter",
             "level": "INFO",
             "filename": f"{BASE_DIR}/access.log",
@@ -82,10 +140,20 @@ LOGGING = {
             "interval": 30,
             "backupCount": 1,
         },
+        "timing_file_handler": {
+            "class": "core.log.BatchedFileHandler",
+            "formatter": "access_formatter",
+            "level": "INFO",
+            "filename": f"{BASE_DIR}/timing.log",
+            "when": "D",
+            "interval": 1,
+            "backupCount": 7,
+        },
         "mail_admins": {
             "level": "ERROR",
-            "class": "django.utils.log.AdminEmailHandler",
+            "class": "core.log.MailHandler",
             "include_html": True,
+            "interval": env.int("LOG_MAIL_DIGEST_INTERVAL", default=60),
         },
     },
     "formatters": {
@@ -103,6 +171,82 @@ LOGGING = {
     },
 }
 
+# share of requests whose timing breakdown is logged, and the total time (ms)
+# above which any request is logged with its total time
+REQUEST_TIMING_SAMPLE_RATE = env.float("REQUEST_TIMING_SAMPLE_RATE", default=0.05)
+REQUEST_TIMING_SLOW_MS = env.int("REQUEST_TIMING_SLOW_MS", default=None)
+
+# queries slower than SLOW_QUERY_THRESHOLD_MS are recorded in the cache with
+# their call site, a sample of the slow reads is explained (ANALYZE, BUFFERS)
+SLOW_QUERY_THRESHOLD_MS = env.int("SLOW_QUERY_THRESHOLD_MS", default=200)
+SLOW_QUERY_ASYNC = True
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = env.float(
+    "SLOW_QUERY_EXPLAIN_SAMPLE_RATE", default=0.1
+)
+SLOW_QUERY_EXPLAIN_INTERVAL = env.int("SLOW_QUERY_EXPLAIN_INTERVAL", default=3600)
+SLOW_QUERY_RETENTION = env.int("SLOW_QUERY_RETENTION", default=86400)
+SLOW_QUERY_MAX_ENTRIES = env.int("SLOW_QUERY_MAX_ENTRIES", default=200)
+
+# with METRICS_DIR set every worker process saves its metrics there so a
+# scrape of any worker reports the metrics of all of them
+METRICS_DIR = (
+    env("METRICS_DIR", default=os.path.join(tempfile.gettempdir(), "iam-metrics"))
+    or None
+)
+METRICS_FLUSH_INTERVAL = env.float("METRICS_FLUSH_INTERVAL", default=5.0)
+METRICS_RETENTION = env.int("METRICS_RETENTION", default=3600)
+# /metrics is only served when a token is set, scrapes send it as a bearer token
+METRICS_AUTH_TOKEN = env("METRICS_AUTH_TOKEN", default=None)
+
+# spans are exported to a file ("file"), an OTLP/HTTP collector ("otlp") or
+# not recorded at all ("none"), incoming trace ids are propagated regardless
+TRACING_EXPORTER = env("TRACING_EXPORTER", default="none")
+TRACING_SAMPLE_RATE = env.float("TRACING_SAMPLE_RATE", default=0.1)
+TRACING_SERVICE_NAME = env("TRACING_SERVICE_NAME", default="iam-service")
+TRACING_FILE_PATH = env("TRACING_FILE_PATH", default=str(BASE_DIR / "traces.jsonl"))
+TRACING_OTLP_ENDPOINT = env(
+    "TRACING_OTLP_ENDPOINT", default="http://localhost:4318/v1/traces"
+)
+
+# the OpenAPI schema is served from OPENAPI_SCHEMA_PATH, the artifact written by
+# `manage.py openapi_schema --write`, and generated once per process when the
+# file does not exist
+OPENAPI_SCHEMA_PATH = env(
+    "OPENAPI_SCHEMA_PATH", default=str(BASE_DIR / "api" / "openapi.yaml")
+)
+OPENAPI_SCHEMA_MAX_AGE = env.int("OPENAPI_SCHEMA_MAX_AGE", default=300)
+
+# textual responses of at least RESPONSE_COMPRESSION_MIN_BYTES are compressed
+# with brotli (when installed) or gzip, whichever the client accepts
+RESPONSE_COMPRESSION_MIN_BYTES = env.int("RESPONSE_COMPRESSION_MIN_BYTES", default=1024)
+RESPONSE_COMPRESSION_GZIP_LEVEL = env.int("RESPONSE_COMPRESSION_GZIP_LEVEL", default=6)
+RESPONSE_COMPRESSION_BROTLI_QUALITY = env.int(
+    "RESPONSE_COMPRESSION_BROTLI_QUALITY", default=4
+)
+# the responses of these views carry tokens or keys and are never compressed,
+# nor are api responses with any of RESPONSE_COMPRESSION_SECRET_FIELDS
+RESPONSE_COMPRESSION_EXCLUDED_VIEWS = [
+    "login_account",
+    "refresh_access_token",
+    "generate_api_key",
+    "confirm_one_time_password",
+    "change_password",
+]
+RESPONSE_COMPRESSION_SECRET_FIELDS = [
+    "access_token",
+    "refresh_token",
+    "apikey",
+    "sec_code",
+]
+
+# authenticated accounts are cached for ACCOUNT_CACHE_TIMEOUT seconds, changes
+# drop them right away
+ACCOUNT_CACHE_TIMEOUT = env.int("ACCOUNT_CACHE_TIMEOUT", default=300)
+
+# identical concurrent keycloak calls of the workers share one call, the lock
+# the first worker takes is held for at most SINGLE_FLIGHT_LOCK_TIMEOUT seconds
+SINGLE_FLIGHT_LOCK_TIMEOUT = env.int("SINGLE_FLIGHT_LOCK_TIMEOUT", default=10)
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -115,10 +259,15 @@ INSTALLED_APPS = [
     # third party libraries
     "rest_framework",
     "drf_spectacular",
+    "core.apps.CoreConfig",
     "app.account.apps.AccountConfig",
 ]
 
 MIDDLEWARE = [
+    "core.tracing.TracingMiddleware",
+    "core.metrics.MetricsMiddleware",
+    "core.instrumentation.RequestTimingMiddleware",
+    "core.http.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -131,6 +280,15 @@ MIDDLEWARE = [
 REST_FRAMEWORK = {
     "EXCEPTION_HANDLER": "core.exceptions.app_exception_handler.custom_exception_handler",
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.http.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.http.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 SPECTACULAR_SETTINGS = {
@@ -170,6 +328,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+# serve the account views as coroutines. only for an ASGI server, under WSGI
+# every request would run them on an event loop of its own
+ASYNC_VIEWS = env.bool("ASYNC_VIEWS", default=False)
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -191,6 +352,7 @@ CACHES = {
         "LOCATION": f"redis://:{env('REDIS_PASSWORD')}@{env('REDIS_SERVER')}:{env('REDIS_PORT')}/0",  # noqa
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "REDIS_CLIENT_CLASS": "core.instrumentation.TimedRedis",
         },
     }
 }
@@ -215,6 +377,14 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = "account.AccountModel"
 
+PASSWORD_HASHERS = [
+    "core.metrics.hashers.InstrumentedPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -254,6 +424,14 @@ KEYCLOAK_CLIENT_ID = env("KEYCLOAK_CLIENT_ID")
 KEYCLOAK_CLIENT_SECRET = env("KEYCLOAK_CLIENT_SECRET")
 KEYCLOAK_ADMIN_USERNAME = env("KEYCLOAK_ADMIN_USERNAME")
 KEYCLOAK_ADMIN_PASSWORD = env("KEYCLOAK_ADMIN_PASSWORD")
+# the realm public key tokens are verified with is kept for
+# KEYCLOAK_PUBLIC_KEY_TIMEOUT seconds. a token failing verification has it
+# refetched, in case the realm keys were rotated, at most every
+# KEYCLOAK_PUBLIC_KEY_REFRESH_INTERVAL seconds
+KEYCLOAK_PUBLIC_KEY_TIMEOUT = env.int("KEYCLOAK_PUBLIC_KEY_TIMEOUT", default=300)
+KEYCLOAK_PUBLIC_KEY_REFRESH_INTERVAL = env.int(
+    "KEYCLOAK_PUBLIC_KEY_REFRESH_INTERVAL", default=10
+)
 
 # KAFKA CONFIGURATION
 KAFKA_BOOTSTRAP_SERVERS = env("KAFKA_BOOTSTRAP_SERVERS")
@@ -261,3 +439,39 @@ KAFKA_SERVER_USERNAME = env("KAFKA_SERVER_USERNAME")
 KAFKA_SERVER_PASSWORD = env("KAFKA_SERVER_PASSWORD")
 KAFKA_SMS_TOPIC = env("KAFKA_SMS_TOPIC")
 KAFKA_EMAIL_TOPIC = env("KAFKA_EMAIL_TOPIC")
+KAFKA_ACCOUNT_EVENT_TOPIC = env("KAFKA_ACCOUNT_EVENT_TOPIC", default="account-events")
+KAFKA_VALUE_CODEC = env("KAFKA_VALUE_CODEC", default="json")
+KAFKA_COMPRESSION_TYPE = env("KAFKA_COMPRESSION_TYPE", default="gzip") or None
+KAFKA_PRODUCER_LINGER_MS = env.int("KAFKA_PRODUCER_LINGER_MS", default=10)
+KAFKA_PRODUCER_BATCH_SIZE = env.int("KAFKA_PRODUCER_BATCH_SIZE", default=65536)
+# how long a publish may block on metadata or a full buffer before it is spooled
+KAFKA_PRODUCER_MAX_BLOCK_MS = env.int("KAFKA_PRODUCER_MAX_BLOCK_MS", default=1000)
+KAFKA_SPOOL_ENABLED = env.bool("KAFKA_SPOOL_ENABLED", default=True)
+KAFKA_SPOOL_PATH = env(
+    "KAFKA_SPOOL_PATH", default=str(BASE_DIR / "spool" / "kafka.spool")
+)
+KAFKA_SPOOL_MAX_BYTES = env.int("KAFKA_SPOOL_MAX_BYTES", default=64 * 1024 * 1024)
+KAFKA_SPOOL_REPLAY_INTERVAL = env.float("KAFKA_SPOOL_REPLAY_INTERVAL", default=5.0)
+KAFKA_SPOOL_REPLAY_BATCH = env.int("KAFKA_SPOOL_REPLAY_BATCH", default=500)
+KAFKA_SPOOL_REPLAY_TIMEOUT = env.float("KAFKA_SPOOL_REPLAY_TIMEOUT", default=10.0)
+KAFKA_CONSUMER_GROUP = env("KAFKA_CONSUMER_GROUP", default="iam-service")
+KAFKA_CONSUMER_MAX_RECORDS = env.int("KAFKA_CONSUMER_MAX_RECORDS", default=500)
+KAFKA_CONSUMER_POLL_TIMEOUT_MS = env.int("KAFKA_CONSUMER_POLL_TIMEOUT_MS", default=1000)
+KAFKA_CONSUMER_WORKERS = env.int("KAFKA_CONSUMER_WORKERS", default=4)
+KAFKA_DEAD_LETTER_TOPIC = env("KAFKA_DEAD_LETTER_TOPIC", default="iam-dead-letter")
+KAFKA_DEAD_LETTER_TIMEOUT = env.float("KAFKA_DEAD_LETTER_TIMEOUT", default=10.0)
+# a partition whose records could not be dead lettered is paused for
+# KAFKA_CONSUMER_RETRY_BACKOFF seconds, doubled after every failure in a row
+# up to KAFKA_CONSUMER_RETRY_BACKOFF_MAX
+KAFKA_CONSUMER_RETRY_BACKOFF = env.float("KAFKA_CONSUMER_RETRY_BACKOFF", default=1.0)
+KAFKA_CONSUMER_RETRY_BACKOFF_MAX = env.float(
+    "KAFKA_CONSUMER_RETRY_BACKOFF_MAX", default=60.0
+)
+KAFKA_USER_DELETION_TOPIC = env("KAFKA_USER_DELETION_TOPIC", default="user-deletions")
+KAFKA_KEYCLOAK_EVENT_TOPIC = env(
+    "KAFKA_KEYCLOAK_EVENT_TOPIC", default="keycloak-events"
+)
+KAFKA_SUBSCRIPTIONS = {
+    KAFKA_USER_DELETION_TOPIC: "app.account.subscription.AccountDeletionSubscriptionHandler",  # noqa
+    KAFKA_KEYCLOAK_EVENT_TOPIC: "app.account.subscription.KeycloakEventSubscriptionHandler",  # noqa
+}
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from fakeredis import FakeConnection
 
 from config.settings.base import *  # noqa
@@ -24,3 +27,12 @@ CACHES = {
         "OPTIONS": {"connection_class": FakeConnection},
     }
 }
+
+# notifications are sent inline so tests can assert on them right away
+NOTIFICATION_DISPATCH_ASYNC = False
+KAFKA_SPOOL_PATH = os.path.join(tempfile.gettempdir(), "iam-test-spool", "kafka.spool")
+REQUEST_TIMING_SAMPLE_RATE = 0
+REQUEST_TIMING_SLOW_MS = None
+METRICS_DIR = None
+SLOW_QUERY_THRESHOLD_MS = None
+SLOW_QUERY_ASYNC = False
@@ -17,13 +17,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 from drf_spectacular.views import (
-    SpectacularAPIView,
     SpectacularRedocView,
     SpectacularSwaggerView,
 )
 
+from core.instrumentation.views import view_slow_queries
+from core.metrics import metrics_view
+from core.openapi import schema_view
+
 urlpatterns = [
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("api/schema/", schema_view, name="schema"),
     path(
         "api/docs/",
         SpectacularSwaggerView.as_view(url_name="schema"),
@@ -32,4 +35,10 @@ urlpatterns = [
     path("api/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
     path("admin/", admin.site.urls),
     path("api/v1/", include("api.v1.urls")),
+    path("metrics", metrics_view, name="metrics"),
+    path(
+        "api/v1/diagnostics/slow-queries/",
+        view_slow_queries,
+        name="view_slow_queries",
+    ),
 ]
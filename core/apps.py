@@ -0,0 +1,23 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = "core"
+
+    def ready(self):
+        from core import (  # noqa: F401 registers the system checks
+            checks,
+        )
+        from core.constants import EmailTemplateEnum, SmsTemplateEnum
+        from core.instrumentation import (  # noqa: F401 connects signals
+            slow_queries,
+        )
+        from core.notifications import (  # noqa: F401 connects signals
+            system_sender,
+        )
+        from core.notifications.template_engine import template_engine
+
+        template_engine.load(
+            [f"email/{template.value}" for template in EmailTemplateEnum]
+            + [f"sms/{template.value}" for template in SmsTemplateEnum]
+        )
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_optional_packages(app_configs, **kwargs):
+    """
+    orjson, brotli and msgpack are optional, the service falls back to the
+    standard json module and gzip without them. only a codec configured for
+    kafka must be installed, otherwise every publish would fail.
+    """
+    from core.codecs.msgpack_codec import msgpack
+
+    if settings.KAFKA_VALUE_CODEC == "msgpack" and msgpack is None:
+        return [
+            Error(
+                "KAFKA_VALUE_CODEC is msgpack but msgpack is not installed",
+                hint="pip install msgpack, or set KAFKA_VALUE_CODEC to json",
+                id="core.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,3 @@
+from .codec_registry import CODECS, get_codec, get_codec_for
+from .json_codec import JsonCodec
+from .msgpack_codec import MsgpackCodec
@@ -0,0 +1,40 @@
+from functools import lru_cache
+
+from django.conf import settings
+
+from core.exceptions import AppException
+from core.interfaces import CodecInterface
+
+from .json_codec import JsonCodec
+from .msgpack_codec import MsgpackCodec
+
+CODECS = {
+    "json": JsonCodec,
+    "msgpack": MsgpackCodec,
+}
+
+
+@lru_cache(maxsize=None)
+def get_codec(name: str = None) -> CodecInterface:
+    """
+    :param name: the codec name, defaults to settings.KAFKA_VALUE_CODEC
+    :return: the shared codec instance
+    """
+    name = name or settings.KAFKA_VALUE_CODEC
+    if name not in CODECS:
+        raise AppException.InternalServerException(
+            error_message=f"unknown codec {name}, expected one of {list(CODECS)}"
+        )
+    return CODECS[name]()
+
+
+def get_codec_for(content_type: str = None) -> CodecInterface:
+    """
+    :param content_type: the content-type header of a record, records without
+    one are json
+    :return: the codec able to decode the record
+    """
+    for name, codec in CODECS.items():
+        if codec.content_type == content_type:
+            return get_codec(name)
+    return get_codec("json")
@@ -0,0 +1,27 @@
+import json
+
+from core.interfaces import CodecInterface
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speed up
+    orjson = None
+
+
+class JsonCodec(CodecInterface):
+    """
+    json payloads, encoded with orjson when it is installed and with the
+    standard library otherwise. both produce the same compact json.
+    """
+
+    content_type = "application/json"
+
+    def encode(self, data) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, separators=(",", ":")).encode("UTF-8")
+
+    def decode(self, data: bytes):
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data.decode("UTF-8"))
@@ -0,0 +1,28 @@
+from core.exceptions import AppException
+from core.interfaces import CodecInterface
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is only needed when configured
+    msgpack = None
+
+
+class MsgpackCodec(CodecInterface):
+    """
+    binary msgpack payloads, smaller and faster to encode than json. consumers
+    must understand the application/msgpack content type.
+    """
+
+    content_type = "application/msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise AppException.InternalServerException(
+                error_message="msgpack codec configured but msgpack is not installed"
+            )
+
+    def encode(self, data) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, data: bytes):
+        return msgpack.unpackb(data, raw=False)
@@ -13,3 +13,37 @@ class GroupEnum(enum.Enum):
     user = "user"
     admin = "admin"
     super_admin = "super_admin"
+
+
+class AccountEventEnum(enum.Enum):
+    created = "account.created"
+    email_verified = "account.email_verified"
+    group_added = "account.group_added"
+    deactivated = "account.deactivated"
+
+
+class EmailTemplateEnum(enum.Enum):
+    otp_code = "account_otp_code.html"
+    email_verification = "email_verification.html"
+    password_reset = "account_password_reset.html"
+    password_change = "account_password_change.html"
+    deactivation = "account_deactivation.html"
+    temporal_password = "account_temporal_password.html"
+    new_super_admin = "new_super_admin.html"
+
+
+class SmsTemplateEnum(enum.Enum):
+    otp_code = "account_otp_code.txt"
+
+
+class NotificationPriorityEnum(enum.Enum):
+    urgent = "urgent"
+    high = "high"
+    low = "low"
+
+
+class DispatchPolicyEnum(enum.Enum):
+    block = "block"
+    drop = "drop"
+    spill = "spill"
+    wait = "wait"
@@ -0,0 +1,244 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import close_old_connections
+from kafka import ConsumerRebalanceListener, KafkaConsumer
+from kafka.structs import OffsetAndMetadata, TopicPartition
+from loguru import logger
+
+from core.codecs import get_codec_for
+from core.interfaces.event import EventHandlerInterface
+from core.producer import connection_config, publish_to_kafka
+from core.tracing import start_span
+
+
+def deserialize_record(record):
+    """
+    decode a record with the codec named by its content-type header
+    """
+    headers = dict(record.headers or [])
+    content_type = headers.get("content-type", b"").decode("UTF-8") or None
+    return get_codec_for(content_type).decode(record.value)
+
+
+class PartitionRebalanceListener(ConsumerRebalanceListener):
+    def __init__(self, event_consumer: "EventConsumer"):
+        self.event_consumer = event_consumer
+
+    def on_partitions_revoked(self, revoked):
+        """
+        commit whatever has been processed before the partitions move to
+        another member of the group so they are not processed twice
+        """
+        logger.info(f"partitions revoked {revoked}")
+        self.event_consumer.commit()
+        self.event_consumer.forget(revoked)
+
+    def on_partitions_assigned(self, assigned):
+        logger.info(f"partitions assigned {assigned}")
+
+
+class EventConsumer:
+    """
+    Consumes the subscribed topics as a member of a consumer group. Records are
+    polled in batches and each partition of a batch is handed to a worker
+    thread, so partitions are processed in parallel while the records of a
+    single partition keep their order. Offsets are committed manually once a
+    batch has been handled; records that cannot be handled are published to
+    the dead-letter topic. A partition whose batch could not be dead lettered
+    either is rewound and paused, for longer after every failure in a row, so
+    an unavailable dead-letter topic is not retried in a tight loop.
+    """
+
+    def __init__(
+        self,
+        subscriptions: Dict[str, EventHandlerInterface],
+        group_id: str = None,
+        max_poll_records: int = None,
+        poll_timeout_ms: int = None,
+        workers: int = None,
+        dead_letter_topic: str = None,
+    ):
+        self.subscriptions = subscriptions
+        self.group_id = group_id or settings.KAFKA_CONSUMER_GROUP
+        self.max_poll_records = max_poll_records or settings.KAFKA_CONSUMER_MAX_RECORDS
+        self.poll_timeout_ms = (
+            poll_timeout_ms or settings.KAFKA_CONSUMER_POLL_TIMEOUT_MS
+        )
+        self.workers = workers or settings.KAFKA_CONSUMER_WORKERS
+        self.dead_letter_topic = dead_letter_topic or settings.KAFKA_DEAD_LETTER_TOPIC
+        self.consumer = None
+        self.pending_offsets: Dict[TopicPartition, OffsetAndMetadata] = {}
+        # failures in a row of every partition and when paused ones resume
+        self.failures: Dict[TopicPartition, int] = {}
+        self.paused: Dict[TopicPartition, float] = {}
+        self._stopped = threading.Event()
+
+    def run(self):
+        self.consumer = KafkaConsumer(
+            group_id=self.group_id,
+            enable_auto_commit=False,
+            auto_offset_reset="earliest",
+            max_poll_records=self.max_poll_records,
+            **connection_config(),
+        )
+        self.consumer.subscribe(
+            topics=list(self.subscriptions),
+            listener=PartitionRebalanceListener(self),
+        )
+        logger.info(f"consuming {list(self.subscriptions)} as group {self.group_id}")
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="event-consumer"
+        ) as executor:
+            try:
+                while not self._stopped.is_set():
+                    self.resume_due()
+                    batch = self.consumer.poll(
+                        timeout_ms=self.poll_timeout_ms,
+                        max_records=self.max_poll_records,
+                    )
+                    if batch:
+                        self.process(batch, executor)
+                        self.commit()
+            finally:
+                self.commit()
+                self.consumer.close(autocommit=False)
+        return None
+
+    def stop(self, *args):
+        """
+        finish the batch in flight, commit it and leave the consumer group
+        """
+        self._stopped.set()
+
+    def process(self, batch: dict, executor: ThreadPoolExecutor):
+        futures = {
+            partition: executor.submit(self.process_partition, partition, records)
+            for partition, records in batch.items()
+        }
+        for partition, future in futures.items():
+            records = batch[partition]
+            if future.result():
+                self.pending_offsets[partition] = OffsetAndMetadata(
+                    records[-1].offset + 1, None
+                )
+                self.failures.pop(partition, None)
+            else:
+                # the batch could neither be handled nor dead lettered, rewind
+                # so the records are redelivered once the partition resumes
+                self.consumer.seek(partition, records[0].offset)
+                self.back_off(partition)
+        return None
+
+    def back_off(self, partition: TopicPartition):
+        failures = self.failures[partition] = self.failures.get(partition, 0) + 1
+        delay = min(
+            settings.KAFKA_CONSUMER_RETRY_BACKOFF * 2 ** (failures - 1),
+            settings.KAFKA_CONSUMER_RETRY_BACKOFF_MAX,
+        )
+        logger.warning(f"{partition} paused for {delay}s after {failures} failures")
+        self.consumer.pause(partition)
+        self.paused[partition] = time.monotonic() + delay
+        return None
+
+    def resume_due(self):
+        now = time.monotonic()
+        due = [partition for partition, at in self.paused.items() if at <= now]
+        if due:
+            self.consumer.resume(*due)
+            for partition in due:
+                del self.paused[partition]
+        return None
+
+    def forget(self, partitions):
+        """
+        drop the back off of partitions that moved to another member
+        """
+        for partition in partitions:
+            self.failures.pop(partition, None)
+            self.paused.pop(partition, None)
+        return None
+
+    def process_partition(self, partition: TopicPartition, records: List) -> bool:
+        headers = dict(records[0].headers or [])
+        traceparent = headers.get("traceparent", b"").decode("UTF-8") or None
+        # the batch continues the trace of its first record
+        with start_span(
+            f"consume {partition.topic}",
+            kind="consumer",
+            traceparent=traceparent,
+            attributes={"messaging.batch.size": len(records)},
+        ):
+            return self.handle_partition(partition, records)
+
+    def handle_partition(self, partition: TopicPartition, records: List) -> bool:
+        handler = self.subscriptions[partition.topic]
+        close_old_connections()
+        try:
+            events, failed = self.deserialize(records)
+            if events:
+                try:
+                    handler.handle_batch([event for _, event in events])
+                except Exception as exc:
+                    logger.error(
+                        f"batch of {partition} failed ({exc}), retrying singly"
+                    )
+                    failed.extend(self.handle_singly(handler, events))
+            return all(self.dead_letter(record, exc) for record, exc in failed)
+        finally:
+            close_old_connections()
+
+    def deserialize(self, records: List):
+        events, failed = [], []
+        for record in records:
+            try:
+                events.append((record, deserialize_record(record)))
+            except (ValueError, TypeError, AttributeError) as exc:
+                failed.append((record, exc))
+        return events, failed
+
+    # noinspection PyMethodMayBeStatic
+    def handle_singly(self, handler: EventHandlerInterface, events: List):
+        failed = []
+        for record, event in events:
+            try:
+                handler.handler(event)
+            except Exception as exc:
+                failed.append((record, exc))
+        return failed
+
+    def dead_letter(self, record, exc: Exception) -> bool:
+        logger.error(
+            f"{record.topic}[{record.partition}]@{record.offset} dead lettered: {exc}"
+        )
+        try:
+            # the source offset is committed once this returns True, so the
+            # record must have reached the dead-letter topic, not the spool
+            result = publish_to_kafka(
+                topic=self.dead_letter_topic,
+                value={
+                    "topic": record.topic,
+                    "partition": record.partition,
+                    "offset": record.offset,
+                    "error": repr(exc),
+                    "value": (record.value or b"").decode("UTF-8", "replace"),
+                },
+                key=record.key.decode("UTF-8", "replace") if record.key else None,
+                timeout=settings.KAFKA_DEAD_LETTER_TIMEOUT,
+            )
+            if result.spooled:
+                logger.error("dead letter publish failed: record spooled")
+            return not result.spooled
+        except Exception as dlq_exc:
+            logger.error(f"dead letter publish failed: {dlq_exc}")
+            return False
+
+    def commit(self):
+        if self.consumer is None or not self.pending_offsets:
+            return None
+        offsets, self.pending_offsets = self.pending_offsets, {}
+        self.consumer.commit(offsets=offsets)
+        return None
@@ -1,4 +1,10 @@
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+from core.constants import AccountEventEnum, NotificationPriorityEnum
 from core.interfaces.notifications import NotificationInterface
+from core.producer import publish_to_kafka
 
 
 class EventNotificationHandler(NotificationInterface):
@@ -7,5 +13,42 @@ class EventNotificationHandler(NotificationInterface):
     the message queue which is consumed by the rightful service.
     """
 
-    def send(self):
-        pass
+    schema_version = 1
+    # the high lane is drained by a single worker and makes publishers wait
+    # when it is full, which keeps the events of an account in the order they
+    # were published
+    priority = NotificationPriorityEnum.high
+
+    def __init__(
+        self,
+        event: AccountEventEnum,
+        account_id: str,
+        data: dict = None,
+        topic: str = None,
+    ):
+        self.event = event
+        self.account_id = str(account_id)
+        self.data = data or {}
+        self.topic = topic or settings.KAFKA_ACCOUNT_EVENT_TOPIC
+
+    def send(self) -> None:
+        """
+        Publish the event, keyed by account id so that all events of an account
+        land on the same partition and are consumed in order.
+        """
+        publish_to_kafka(
+            topic=self.topic,
+            value=self.payload(),
+            key=self.account_id,
+            schema_version=self.schema_version,
+        )
+        return None
+
+    def payload(self) -> dict:
+        return {
+            "v": self.schema_version,
+            "type": self.event.value,
+            "id": self.account_id,
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "data": self.data,
+        }
@@ -1,3 +1,5 @@
+from typing import List
+
 from core.interfaces.event import EventHandlerInterface
 
 
@@ -9,3 +11,16 @@ class EventSubscriptionHandler(EventHandlerInterface):
         :param data: the event data
         :return:
         """
+
+    def handle_batch(self, events: List[dict]):
+        """
+        process a batch of events polled from a single partition, in order.
+        override this to handle the whole batch at once (e.g a single set based
+        update) instead of one event at a time. handlers may see an event more
+        than once and must therefore be idempotent.
+        :param events: the event data of the batch
+        :return:
+        """
+        for event in events:
+            self.handler(event)
+        return None
@@ -0,0 +1,6 @@
+from .compression import CompressionMiddleware, negotiate_encoding
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+
+# the views are not re-exported, rest_framework imports this package while
+# loading its settings, before rest_framework.views can be imported
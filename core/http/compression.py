@@ -0,0 +1,152 @@
+import gzip
+import secrets
+import string
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, responses are then gzipped only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/vnd.oai.openapi",
+    "application/problem+json",
+)
+# the most random bytes a gzip header is padded with, as django's GZipMiddleware
+GZIP_MAX_RANDOM_BYTES = 100
+
+
+def accepted_encodings(header: str) -> dict:
+    """
+    the content codings of an Accept-Encoding header with their q-values
+    """
+    encodings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        encodings[coding.strip().lower()] = quality
+    return encodings
+
+
+def negotiate_encoding(header: str) -> Optional[str]:
+    """
+    brotli when the client takes it and it is installed, then gzip
+    """
+    encodings = accepted_encodings(header)
+    available = ("br", "gzip") if brotli is not None else ("gzip",)
+    candidates = [
+        (encodings.get(coding, encodings.get("*", 0.0)), -rank, coding)
+        for rank, coding in enumerate(available)
+    ]
+    quality, _, coding = max(candidates)
+    return coding if quality > 0 else None
+
+
+def compress(content: bytes, coding: str) -> bytes:
+    if coding == "br":
+        quality = settings.RESPONSE_COMPRESSION_BROTLI_QUALITY
+        return brotli.compress(content, quality=quality)
+    level = settings.RESPONSE_COMPRESSION_GZIP_LEVEL
+    return pad_gzip(gzip.compress(content, compresslevel=level, mtime=0))
+
+
+def pad_gzip(compressed: bytes) -> bytes:
+    """
+    give the gzip member a file name of random length, so the length of a
+    response no longer tells how well a guessed secret compressed (BREACH)
+    """
+    length = secrets.randbelow(GZIP_MAX_RANDOM_BYTES) + 1
+    filename = "".join(secrets.choice(string.ascii_letters) for _ in range(length))
+    header = bytearray(compressed[:10])
+    header[3] |= gzip.FNAME
+    return bytes(header) + filename.encode() + b"\x00" + compressed[10:]
+
+
+class CompressionMiddleware:
+    """
+    compress responses of at least RESPONSE_COMPRESSION_MIN_BYTES with the
+    coding negotiated from Accept-Encoding. responses that are streamed,
+    already encoded, not textual or that compress poorly are left untouched,
+    so are the responses carrying secrets: those setting cookies, those of
+    the views in RESPONSE_COMPRESSION_EXCLUDED_VIEWS and api responses with
+    any of RESPONSE_COMPRESSION_SECRET_FIELDS (tokens, api keys).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.compress_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress_response(request, await self.get_response(request))
+
+    # noinspection PyMethodMayBeStatic
+    def carries_secrets(self, request, response) -> bool:
+        resolver_match = getattr(request, "resolver_match", None)
+        data = getattr(response, "data", None)
+        return (
+            bool(response.cookies)
+            or (
+                resolver_match is not None
+                and resolver_match.url_name
+                in settings.RESPONSE_COMPRESSION_EXCLUDED_VIEWS
+            )
+            or (
+                isinstance(data, dict)
+                and any(
+                    field in data
+                    for field in settings.RESPONSE_COMPRESSION_SECRET_FIELDS
+                )
+            )
+        )
+
+    def compress_response(self, request, response):
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+            or self.carries_secrets(request, response)
+        ):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+        coding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+        if coding is None:
+            return response
+        compressed = compress(response.content, coding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = coding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            # the compressed body is not byte for byte the tagged one
+            response["ETag"] = f"W/{etag}"
+        return response
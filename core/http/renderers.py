@@ -0,0 +1,35 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speed up
+    orjson = None
+
+# datetimes in UTC end with Z as DRF renders them
+ORJSON_OPTIONS = 0 if orjson is None else orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    renders compact json with orjson when it is installed, which encodes
+    UUIDs, datetimes, dataclasses and the dict/list subclasses returned by
+    serializers natively. anything else goes through DRF's encoder, and
+    indented or ascii-only json falls back to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        content = orjson.dumps(
+            data, default=self.encoder_class().default, option=ORJSON_OPTIONS
+        )
+        if b"\xe2\x80\xa8" in content or b"\xe2\x80\xa9" in content:
+            # escaped like JSONRenderer so the json stays a javascript subset
+            content = content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return content
@@ -0,0 +1,80 @@
+import functools
+import inspect
+from typing import Callable, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.decorators import api_view
+from rest_framework.views import APIView
+
+
+# an APIView whose handlers are coroutines. authentication, permission and
+# throttle checks may query the database and run in a thread, the handler
+# itself runs on the event loop. no docstring, drf-spectacular would describe
+# every async view with it.
+class AsyncAPIView(APIView):
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def async_api_view(
+    http_method_names: Optional[List[str]] = None, sync_view: Optional[Callable] = None
+) -> Callable:
+    """
+    the api_view decorator for coroutine functions. the view it returns is a
+    coroutine function itself, so ASGI awaits it on the event loop instead of
+    running it in a thread. unless settings.ASYNC_VIEWS is set, sync_view is
+    served in its place, WSGI would run every request on a new event loop.
+    """
+
+    def decorator(func):
+        if sync_view is not None and not settings.ASYNC_VIEWS:
+            # named after func, the view class and its schema stay the same
+            @functools.wraps(func)
+            def view(*args, **kwargs):
+                return sync_view(*args, **kwargs)
+
+            return api_view(http_method_names)(view)
+        wrapped_view = api_view(http_method_names)(func)
+
+        async def handler(self, *args, **kwargs):
+            return await func(*args, **kwargs)
+
+        methods = [
+            method
+            for method in wrapped_view.cls.http_method_names
+            if method != "options"
+        ]
+        view_class = type(
+            wrapped_view.cls.__name__,
+            (AsyncAPIView, wrapped_view.cls),
+            {
+                "__doc__": func.__doc__,
+                "__module__": func.__module__,
+                **{method: handler for method in methods},
+            },
+        )
+        return view_class.as_view()
+
+    return decorator
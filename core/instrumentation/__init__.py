@@ -0,0 +1,10 @@
+from .middleware import RequestTimingMiddleware
+from .redis_client import TimedRedis
+from .slow_queries import SlowQueryLog, normalize_sql, slow_query_log
+from .timing import (
+    current_timings,
+    start_request_timing,
+    stop_request_timing,
+    timed,
+    timed_methods,
+)
@@ -0,0 +1,96 @@
+import json
+import logging
+import random
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .timing import start_request_timing, stop_request_timing
+
+logger = logging.getLogger("core.request_timing")
+
+CATEGORIES = ("db", "keycloak", "redis", "kafka", "serializer")
+
+
+class RequestTimingMiddleware:
+    """
+    Logs a JSON line per sampled request with the total time and the time (and
+    number of calls) spent on the database, Keycloak, Redis, Kafka enqueueing
+    and serialization. Only sampled requests are instrumented; the others are
+    logged with their total time only when slower than the slow threshold. The
+    lines go to the request_timing logger, whose handler writes them from a
+    listener thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled():
+            return self.get_response(request)
+        sampled, timings = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_request_timing()
+        self.log(request, response, timings, sampled)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled():
+            return await self.get_response(request)
+        sampled, timings = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_request_timing()
+        self.log(request, response, timings, sampled)
+        return response
+
+    # noinspection PyMethodMayBeStatic
+    def enabled(self) -> bool:
+        return (
+            settings.REQUEST_TIMING_SAMPLE_RATE > 0
+            or settings.REQUEST_TIMING_SLOW_MS is not None
+        )
+
+    # noinspection PyMethodMayBeStatic
+    def start(self):
+        sample_rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        sampled = sample_rate >= 1 or random.random() < sample_rate
+        timings = start_request_timing()
+        if not sampled:
+            # marked active so nothing inside the request is timed
+            timings.active.update(CATEGORIES)
+        return sampled, timings
+
+    def log(self, request, response, timings, sampled: bool):
+        total_ms = timings.elapsed() * 1000
+        slow_ms = settings.REQUEST_TIMING_SLOW_MS
+        if sampled or (slow_ms is not None and total_ms >= slow_ms):
+            logger.info(self.line(request, response, timings, total_ms, sampled))
+
+    # noinspection PyMethodMayBeStatic
+    def line(self, request, response, timings, total_ms: float, sampled: bool) -> str:
+        resolver_match = getattr(request, "resolver_match", None)
+        data = {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "method": request.method,
+            "path": request.path,
+            "route": resolver_match.route if resolver_match else None,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 3),
+            "sampled": sampled,
+        }
+        if sampled:
+            data.update(timings.as_dict(CATEGORIES))
+        return json.dumps(data, separators=(",", ":"))
@@ -0,0 +1,20 @@
+from redis import Redis
+
+from core.metrics import cache_requests
+
+from .timing import timed
+
+
+class TimedRedis(Redis):
+    """
+    a redis client adding the time of every command to the redis timing of the
+    current request and counting cache hits and misses of GET commands (set as
+    REDIS_CLIENT_CLASS of the django-redis cache)
+    """
+
+    def execute_command(self, *args, **options):
+        with timed("redis"):
+            result = super().execute_command(*args, **options)
+        if args and args[0] == "GET":
+            cache_requests.inc(result="miss" if result is None else "hit")
+        return result
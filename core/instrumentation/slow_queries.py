@@ -0,0 +1,301 @@
+import hashlib
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from loguru import logger
+
+slow_query_key = "slow_query_{fingerprint}"
+slow_query_index_key = "slow_queries"
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+VALUE_LIST = re.compile(r"\((?:\s*(?:\?|%s)\s*,)+\s*(?:\?|%s)\s*\)")
+WHITESPACE = re.compile(r"\s+")
+SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+# the conditions of a plan, where numbers are values rather than estimates
+PLAN_CONDITION = re.compile(r"^(\s*(?:->\s*)?[\w ]*(?:Cond|Filter): )(.*)$", re.M)
+# frames of these directories are wrappers, the call site is their caller
+SKIPPED_PATHS = tuple(
+    os.path.join(str(settings.BASE_DIR), path) + os.sep
+    for path in (
+        os.path.join("core", "instrumentation"),
+        os.path.join("core", "metrics"),
+        os.path.join("core", "tracing"),
+        os.path.join("core", "repository"),
+    )
+)
+_explaining = threading.local()
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    the sql with literals replaced by placeholders and value lists collapsed,
+    so executions differing only in their values share a fingerprint
+    """
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    sql = VALUE_LIST.sub("(...)", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+def redact_plan(plan: str) -> str:
+    """
+    the plan with the values the query ran with (emails, phone numbers,
+    ids) replaced by placeholders, since plans are kept and served
+    """
+    plan = STRING_LITERAL.sub("?", plan)
+    return PLAN_CONDITION.sub(
+        lambda match: match.group(1) + NUMBER_LITERAL.sub("?", match.group(2)), plan
+    )
+
+
+def fingerprint(normalized_sql: str) -> str:
+    return hashlib.sha1(normalized_sql.encode("UTF-8")).hexdigest()[:16]
+
+
+def call_site() -> Optional[str]:
+    """
+    the first frame of the project outside django, the libraries and the
+    instrumentation wrappers, e.g the controller method issuing the query
+    """
+    base_dir = os.path.join(str(settings.BASE_DIR), "")
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(base_dir)
+            and "site-packages" not in filename
+            and not filename.startswith(SKIPPED_PATHS)
+        ):
+            return (
+                f"{os.path.relpath(filename, base_dir)}:{frame.f_lineno}"
+                f" in {frame.f_code.co_name}"
+            )
+        frame = frame.f_back
+    return None
+
+
+def seq_scans(plan: str) -> List[str]:
+    return sorted(set(SEQ_SCAN.findall(plan)))
+
+
+def can_explain(sql: str, many: bool, vendor: str) -> bool:
+    # EXPLAIN ANALYZE runs the statement, only plain reads are explained
+    statement = sql.lstrip().upper()
+    return (
+        vendor == "postgresql"
+        and not many
+        and statement.startswith("SELECT")
+        and " FOR UPDATE" not in statement
+        and " FOR SHARE" not in statement
+    )
+
+
+@dataclass
+class SlowQuery:
+    sql: str
+    params: object
+    many: bool
+    alias: str
+    vendor: str
+    duration_ms: float
+    call_site: Optional[str]
+
+
+class SlowQueryLog:
+    """
+    A database execute wrapper, installed on every connection, flagging the
+    queries slower than SLOW_QUERY_THRESHOLD_MS. The wrapper only times the
+    query and queues it; a background thread aggregates the slow queries per
+    fingerprint in the cache and, for a sampled subset, runs EXPLAIN (ANALYZE,
+    BUFFERS) on a connection of its own. Each fingerprint is explained at most
+    once per SLOW_QUERY_EXPLAIN_INTERVAL. Slow queries are dropped (and
+    counted) when the queue is full.
+    """
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        threshold_ms = settings.SLOW_QUERY_THRESHOLD_MS
+        if threshold_ms is None or getattr(_explaining, "active", False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms >= threshold_ms:
+            db = context["connection"]
+            self.submit(
+                SlowQuery(
+                    sql=sql,
+                    params=params,
+                    many=many,
+                    alias=db.alias,
+                    vendor=db.vendor,
+                    duration_ms=duration_ms,
+                    call_site=call_site(),
+                )
+            )
+        return result
+
+    def submit(self, query: SlowQuery):
+        if not settings.SLOW_QUERY_ASYNC:
+            return self.record(query)
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            self._queue.put_nowait(query)
+        except queue.Full:
+            self.dropped += 1
+        return None
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return None
+            # the worker thread does not survive a fork
+            self._queue = queue.Queue(maxsize=self.maxsize)
+            threading.Thread(
+                target=self.run, name="slow-query-log", daemon=True
+            ).start()
+            self._pid = os.getpid()
+        return None
+
+    def run(self):
+        while True:
+            query = self._queue.get()
+            try:
+                self.record(query)
+            except Exception as exc:
+                logger.warning(f"slow query not recorded: {exc}")
+            finally:
+                for db in connections.all(initialized_only=True):
+                    db.close()
+
+    def record(self, query: SlowQuery):
+        normalized = normalize_sql(query.sql)
+        query_fingerprint = fingerprint(normalized)
+        key = slow_query_key.format(fingerprint=query_fingerprint)
+        entry = cache.get(key) or {
+            "fingerprint": query_fingerprint,
+            "sql": normalized,
+            "alias": query.alias,
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "call_sites": [],
+            "plan": None,
+            "seq_scans": [],
+            "explained_at": None,
+        }
+        # read-modify-write, concurrent workers may lose an increment which is
+        # fine for spotting the queries to look at
+        entry["count"] += 1
+        entry["total_ms"] = round(entry["total_ms"] + query.duration_ms, 3)
+        entry["max_ms"] = round(max(entry["max_ms"], query.duration_ms), 3)
+        entry["last_seen"] = time.time()
+        if query.call_site and query.call_site not in entry["call_sites"]:
+            entry["call_sites"] = (entry["call_sites"] + [query.call_site])[-5:]
+        if self.should_explain(query, query_fingerprint):
+            plan = self.explain(query)
+            if plan is not None:
+                entry["plan"] = plan
+                entry["seq_scans"] = seq_scans(plan)
+                entry["explained_at"] = time.time()
+        cache.set(key, entry, timeout=settings.SLOW_QUERY_RETENTION)
+        self.index(query_fingerprint)
+        return entry
+
+    # noinspection PyMethodMayBeStatic
+    def should_explain(self, query: SlowQuery, query_fingerprint: str) -> bool:
+        return (
+            can_explain(query.sql, query.many, query.vendor)
+            and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+            and cache.add(
+                f"{slow_query_key.format(fingerprint=query_fingerprint)}_explain",
+                1,
+                timeout=settings.SLOW_QUERY_EXPLAIN_INTERVAL,
+            )
+        )
+
+    # noinspection PyMethodMayBeStatic
+    def explain(self, query: SlowQuery) -> Optional[str]:
+        """
+        run the query under EXPLAIN (ANALYZE, BUFFERS) in a transaction that
+        is rolled back, the plan is stored without the query's values
+        """
+        _explaining.active = True
+        try:
+            db = connections[query.alias]
+            with transaction.atomic(using=query.alias):
+                with db.cursor() as cursor:
+                    cursor.execute(
+                        f"EXPLAIN (ANALYZE, BUFFERS) {query.sql}", query.params
+                    )
+                    plan = "\n".join(row[0] for row in cursor.fetchall())
+                transaction.set_rollback(True, using=query.alias)
+            return redact_plan(plan)
+        except Exception as exc:
+            logger.warning(f"explain of slow query failed: {exc}")
+            return None
+        finally:
+            _explaining.active = False
+
+    # noinspection PyMethodMayBeStatic
+    def index(self, query_fingerprint: str):
+        # read-modify-write, a fingerprint lost to a race is indexed again the
+        # next time the query is slow
+        fingerprints = cache.get(slow_query_index_key) or []
+        if query_fingerprint not in fingerprints:
+            fingerprints = fingerprints[-(settings.SLOW_QUERY_MAX_ENTRIES - 1) :]
+            cache.set(
+                slow_query_index_key,
+                fingerprints + [query_fingerprint],
+                timeout=settings.SLOW_QUERY_RETENTION,
+            )
+
+    # noinspection PyMethodMayBeStatic
+    def entries(self, order_by: str = "total_ms") -> List[dict]:
+        """
+        :return: the recorded slow queries, slowest first
+        """
+        fingerprints = cache.get(slow_query_index_key) or []
+        entries = cache.get_many(
+            [slow_query_key.format(fingerprint=value) for value in fingerprints]
+        )
+        return sorted(
+            entries.values(), key=lambda entry: entry.get(order_by, 0), reverse=True
+        )
+
+    # noinspection PyMethodMayBeStatic
+    def clear(self):
+        fingerprints = cache.get(slow_query_index_key) or []
+        cache.delete_many(
+            [slow_query_key.format(fingerprint=value) for value in fingerprints]
+            + [slow_query_index_key]
+        )
+
+
+slow_query_log = SlowQueryLog()
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    if slow_query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_log)
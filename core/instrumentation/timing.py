@@ -0,0 +1,131 @@
+import functools
+import inspect
+import time
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_request_timings: ContextVar[Optional["RequestTimings"]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+class RequestTimings:
+    """
+    the time spent and the number of calls per category (db, keycloak, redis,
+    kafka, serializer) during one request
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.active: set = set()
+
+    def add(self, category: str, duration: float):
+        self.durations[category] = self.durations.get(category, 0.0) + duration
+        self.calls[category] = self.calls.get(category, 0) + 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self, categories) -> dict:
+        data = {}
+        for category in categories:
+            data[f"{category}_ms"] = round(self.durations.get(category, 0.0) * 1000, 3)
+            data[f"{category}_calls"] = self.calls.get(category, 0)
+        return data
+
+
+def start_request_timing() -> RequestTimings:
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+def stop_request_timing():
+    _request_timings.set(None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _request_timings.get()
+
+
+class timed(ContextDecorator):
+    """
+    add the time spent in the block (or decorated function) to the category of
+    the request being timed. nested blocks of the same category are counted
+    once, and outside a timed request this does nothing.
+    """
+
+    def __init__(self, category: str):
+        self.category = category
+        self._starts = []
+
+    def __enter__(self):
+        timings = _request_timings.get()
+        if timings is None or self.category in timings.active:
+            self._starts.append(None)
+        else:
+            timings.active.add(self.category)
+            self._starts.append((timings, time.perf_counter()))
+        return self
+
+    def __exit__(self, *exc):
+        started = self._starts.pop()
+        if started is not None:
+            timings, start = started
+            timings.active.discard(self.category)
+            timings.add(self.category, time.perf_counter() - start)
+        return False
+
+    def __call__(self, func):
+        # a fresh context manager per call keeps concurrent calls apart
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def ainner(*args, **kwargs):
+                with timed(self.category):
+                    return await func(*args, **kwargs)
+
+            return ainner
+
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with timed(self.category):
+                return func(*args, **kwargs)
+
+        return inner
+
+
+def timed_methods(category: str):
+    """
+    class decorator timing every public method defined on the class
+    """
+
+    def decorate(cls):
+        for name, attribute in list(vars(cls).items()):
+            if not name.startswith("_") and callable(attribute):
+                setattr(cls, name, timed(category)(attribute))
+        return cls
+
+    return decorate
+
+
+def query_timer(execute, sql, params, many, context):
+    """
+    a database execute wrapper timing every query of the request. it is
+    installed on every connection, the request timings travel in a context
+    variable into the threads sync_to_async runs the queries of async views in
+    """
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
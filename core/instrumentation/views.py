@@ -0,0 +1,53 @@
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
+from rest_framework.response import Response
+
+from core.utils import (
+    IsSuperAdmin,
+    KeycloakAuthentication,
+    api_responses,
+)
+
+from .slow_queries import slow_query_log
+
+ORDERINGS = ("total_ms", "max_ms", "count", "last_seen")
+
+
+@extend_schema(
+    responses=api_responses(
+        status_codes=[200, 401, 403],
+        schema={"count": 0, "dropped": 0, "results": []},
+    ),
+    tags=["Diagnostics"],
+    parameters=[
+        OpenApiParameter("order_by", str, enum=ORDERINGS),
+        OpenApiParameter("limit", int),
+    ],
+)
+@api_view(http_method_names=["GET"])
+@authentication_classes([KeycloakAuthentication])
+@permission_classes([IsSuperAdmin])
+def view_slow_queries(request):
+    """
+    the slow queries recorded across the worker processes, with their call
+    sites and the last sampled query plan
+    """
+    order_by = request.query_params.get("order_by")
+    order_by = order_by if order_by in ORDERINGS else "total_ms"
+    try:
+        limit = max(int(request.query_params.get("limit", 50)), 1)
+    except ValueError:
+        limit = 50
+    entries = slow_query_log.entries(order_by=order_by)
+    return Response(
+        data={
+            "count": len(entries),
+            "dropped": slow_query_log.dropped,
+            "results": entries[:limit],
+        },
+        status=200,
+    )
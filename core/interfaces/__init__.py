@@ -1,3 +1,4 @@
 from .auth import AuthenticationInterface
+from .codec import CodecInterface
 from .notifications import NotificationInterface, Notifier
 from .repository import CrudRepositoryInterface
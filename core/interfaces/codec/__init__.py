@@ -0,0 +1 @@
+from .codec_interface import CodecInterface
@@ -0,0 +1,30 @@
+import abc
+
+
+class CodecInterface(metaclass=abc.ABCMeta):
+    @classmethod
+    def __subclasshook__(cls, subclass):
+        return (
+            hasattr(subclass, "encode")
+            and callable(subclass.encode)
+            and hasattr(subclass, "decode")
+            and callable(subclass.decode)
+        )
+
+    content_type: str
+
+    @abc.abstractmethod
+    def encode(self, data) -> bytes:
+        """
+        :param data: the message payload
+        :return: the payload serialized to bytes
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def decode(self, data: bytes):
+        """
+        :param data: a payload serialized by encode
+        :return: the message payload
+        """
+        raise NotImplementedError
@@ -1,2 +1,3 @@
+from .dispatcher import NotificationDispatcher, dispatcher
 from .notification_interface import NotificationInterface
 from .notifier import Notifier
@@ -0,0 +1,183 @@
+import atexit
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict
+
+from django.conf import settings
+from django.db import close_old_connections
+from loguru import logger
+
+from core.constants import DispatchPolicyEnum, NotificationPriorityEnum
+from core.metrics import notification_jobs, notification_queue_depth
+
+
+@dataclass
+class Lane:
+    """
+    a bounded queue of notifications of one priority and the workers draining
+    it. when the queue is full the policy decides what happens to a new job:
+    block waits up to the block timeout and then runs it inline, drop discards
+    it and spill runs it inline in the calling thread. wait blocks the caller
+    until the queue has room, the only policy that keeps the jobs of a lane in
+    the order they were submitted. the queue depth and the jobs of every
+    outcome are reported per lane on /metrics.
+    """
+
+    name: str
+    workers: int
+    maxsize: int
+    policy: DispatchPolicyEnum
+    jobs: queue.Queue = None
+    threads: list = field(default_factory=list)
+
+    def __post_init__(self):
+        self.jobs = queue.Queue(maxsize=self.maxsize)
+
+    def report_depth(self):
+        notification_queue_depth.set(self.jobs.qsize(), lane=self.name)
+
+
+class NotificationDispatcher:
+    """
+    Runs notification jobs on worker threads, one pool per priority lane, so
+    the request thread only enqueues and urgent notifications (OTP codes) never
+    wait behind informational mail. The workers are started on first use and
+    again after a fork, since threads do not survive it. With asynchronous
+    dispatch disabled (e.g in tests) jobs run inline.
+    """
+
+    _stop = object()
+
+    def __init__(self, lanes: dict = None, block_timeout: float = None):
+        self.lane_config = lanes
+        self.block_timeout = block_timeout
+        self.lanes: Dict[str, Lane] = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def is_async(self) -> bool:
+        return settings.NOTIFICATION_DISPATCH_ASYNC
+
+    def submit(self, job: Callable, priority: NotificationPriorityEnum = None) -> bool:
+        """
+        :return: False when the job was dropped
+        """
+        priority = priority or NotificationPriorityEnum.low
+        if not self.is_async:
+            self.run(job)
+            return True
+        lane = self.get_lane(priority.value)
+        if lane.policy == DispatchPolicyEnum.block:
+            timeout = (
+                settings.NOTIFICATION_BLOCK_TIMEOUT
+                if self.block_timeout is None
+                else self.block_timeout
+            )
+            enqueued = self.put(lane, job, timeout=timeout)
+        elif lane.policy == DispatchPolicyEnum.wait:
+            enqueued = self.put(lane, job, block=True)
+        else:
+            enqueued = self.put(lane, job)
+        if enqueued:
+            return True
+        if lane.policy == DispatchPolicyEnum.drop:
+            self.count(lane, "dropped")
+            logger.warning(f"notification lane {lane.name} is full, job dropped")
+            return False
+        self.count(lane, "spilled")
+        self.run(job, lane)
+        return True
+
+    def put(
+        self, lane: Lane, job: Callable, timeout: float = None, block: bool = False
+    ) -> bool:
+        try:
+            lane.jobs.put(job, block=block or bool(timeout), timeout=timeout or None)
+        except queue.Full:
+            return False
+        self.count(lane, "enqueued")
+        lane.report_depth()
+        return True
+
+    def run(self, job: Callable, lane: Lane = None):
+        try:
+            job()
+        except Exception as exc:
+            if lane is None:
+                raise
+            self.count(lane, "failed")
+            logger.error(f"notification failed on lane {lane.name}: {exc}")
+        else:
+            if lane is not None:
+                self.count(lane, "processed")
+        return None
+
+    def get_lane(self, name: str) -> Lane:
+        if self._pid != os.getpid() or name not in self.lanes:
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.lanes, self._pid = {}, os.getpid()
+                if name not in self.lanes:
+                    self.lanes[name] = self.start_lane(name)
+        return self.lanes[name]
+
+    def start_lane(self, name: str) -> Lane:
+        config = (self.lane_config or settings.NOTIFICATION_LANES)[name]
+        lane = Lane(
+            name=name,
+            workers=config.get("workers", 1),
+            maxsize=config.get("maxsize", 1000),
+            policy=DispatchPolicyEnum(config.get("policy", "spill")),
+        )
+        for index in range(lane.workers):
+            thread = threading.Thread(
+                target=self.work,
+                args=(lane,),
+                name=f"notification-{name}-{index}",
+                daemon=True,
+            )
+            thread.start()
+            lane.threads.append(thread)
+        return lane
+
+    def work(self, lane: Lane):
+        while True:
+            job = lane.jobs.get()
+            lane.report_depth()
+            try:
+                if job is self._stop:
+                    return None
+                close_old_connections()
+                self.run(job, lane)
+            finally:
+                lane.jobs.task_done()
+
+    # noinspection PyMethodMayBeStatic
+    def count(self, lane: Lane, outcome: str):
+        notification_jobs.inc(lane=lane.name, outcome=outcome)
+
+    def shutdown(self, timeout: float = 5.0):
+        """
+        let the workers finish the queued jobs and stop them
+        """
+        if self._pid != os.getpid():
+            return None
+        with self._lock:
+            lanes, self.lanes = self.lanes, {}
+        for lane in lanes.values():
+            for _ in lane.threads:
+                try:
+                    lane.jobs.put(self._stop, timeout=timeout)
+                except queue.Full:
+                    break
+        for lane in lanes.values():
+            for thread in lane.threads:
+                thread.join(timeout)
+        return None
+
+
+dispatcher = NotificationDispatcher()
+atexit.register(dispatcher.shutdown)
@@ -1,4 +1,5 @@
 import abc
+from typing import Optional
 
 
 class NotificationInterface(metaclass=abc.ABCMeta):
@@ -9,3 +10,11 @@ class NotificationInterface(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def send(self):
         raise NotImplementedError
+
+    # noinspection PyMethodMayBeStatic
+    def idempotency_key(self) -> Optional[str]:
+        """
+        notifications returning a key are sent once per dedupe window, repeats
+        within the window are suppressed by the notifier
+        """
+        return None
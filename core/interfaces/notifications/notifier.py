@@ -1,13 +1,84 @@
+import uuid
+from typing import Optional
+
+from django.core.cache import cache
 from django.dispatch import Signal, receiver
 
+from core.constants import NotificationPriorityEnum
+from core.instrumentation import timed
+from core.tracing import current_span, use_span
+
+from .dispatcher import dispatcher
 from .notification_interface import NotificationInterface
 
 
 class Notifier:
     notification_signal = Signal()
+    notification_key = "notification_{key}"
+
+    @timed("kafka")
+    def notify(self, notification_listener: NotificationInterface) -> Optional[str]:
+        """
+        hand the notification to the dispatcher lane of its priority, the
+        signal is sent from a dispatcher worker. a notification with an
+        idempotency key is only dispatched if no notification with the same key
+        was dispatched within its dedupe window (an atomic SET NX), otherwise
+        the id of the pending notification is returned. the key is released
+        when the notification is dropped or fails, so it can be sent again.
+        :return: the id of the dispatched (or pending) notification
+        """
+        notification_id = uuid.uuid4().hex
+        key = self.dedupe_key(notification_listener)
+        if key is not None and not cache.add(
+            key, notification_id, timeout=notification_listener.dedupe_window
+        ):
+            pending_id = cache.get(key)
+            if pending_id:
+                return pending_id
+        span = current_span()
+
+        def send():
+            # the worker continues the trace of the caller
+            with use_span(span):
+                try:
+                    self.notification_signal.send(sender=notification_listener)
+                except Exception:
+                    self.release(key, notification_id)
+                    raise
+
+        submitted = dispatcher.submit(
+            send,
+            priority=getattr(
+                notification_listener, "priority", NotificationPriorityEnum.low
+            ),
+        )
+        if submitted is False:
+            self.release(key, notification_id)
+        return notification_id
+
+    # noinspection PyMethodMayBeStatic
+    def release(self, key: Optional[str], notification_id: str):
+        """
+        drop the dedupe key of a notification that was not sent
+        """
+        if key is not None and cache.get(key) == notification_id:
+            cache.delete(key)
+
+    def pending_notification(self, idempotency_key: str) -> Optional[str]:
+        """
+        :return: the id of the notification sent with the key within its
+        dedupe window, if any
+        """
+        return cache.get(self.notification_key.format(key=idempotency_key))
 
-    def notify(self, notification_listener: NotificationInterface):
-        self.notification_signal.send(sender=notification_listener)
+    def dedupe_key(self, notification_listener: NotificationInterface):
+        idempotency_key = getattr(notification_listener, "idempotency_key", None)
+        if not getattr(notification_listener, "dedupe_window", None) or not callable(
+            idempotency_key
+        ):
+            return None
+        key = idempotency_key()
+        return self.notification_key.format(key=key) if key else None
 
     # noinspection PyMethodMayBeStatic
     @staticmethod
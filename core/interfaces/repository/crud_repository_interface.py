@@ -13,6 +13,8 @@ class CrudRepositoryInterface(metaclass=abc.ABCMeta):
             and callable(subclass.update_by_id)
             and hasattr(subclass, "update")
             and callable(subclass.update)
+            and hasattr(subclass, "update_all")
+            and callable(subclass.update_all)
             and hasattr(subclass, "find_by_id")
             and callable(subclass.find_by_id)
             and hasattr(subclass, "find")
@@ -66,6 +68,18 @@ class CrudRepositoryInterface(metaclass=abc.ABCMeta):
 
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def update_all(self, filter_param, obj_data):
+        """
+        when inherited, updates every record matching filter_param with obj_data
+        in a single statement
+        :param filter_param:
+        :param obj_data:
+        :return: the number of updated records
+        """
+
+        raise NotImplementedError
+
     @abc.abstractmethod
     def find_by_id(self, obj_id):
         """
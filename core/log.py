@@ -1,6 +1,18 @@
+import atexit
+import copy
 import logging
-from logging.handlers import SMTPHandler
-from threading import Thread
+import os
+import queue
+import threading
+import time
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    TimedRotatingFileHandler,
+)
+from typing import List
+
+from django.utils.log import AdminEmailHandler
 
 
 def get_full_class_name(obj):
@@ -23,17 +35,206 @@ def get_error_context(
     }
 
 
-class MailHandler(SMTPHandler):
+class MailHandler(AdminEmailHandler):
+    """
+    Mails the admins a digest of the records logged in the last interval
+    instead of one mail per record. Records are collected by emit and sent by
+    flush, which the queue listener calls after every batch and whenever the
+    queue is idle, so mail is never sent from the logging thread.
+    """
+
+    def __init__(self, interval: int = 60, max_records: int = 20, **kwargs):
+        super().__init__(**kwargs)
+        self.interval = interval
+        self.max_records = max_records
+        self.records: List[logging.LogRecord] = []
+        self.count = 0
+        # the monotonic clock starts near 0 at boot, so never mailed is -inf
+        self.last_sent = float("-inf")
+
     def emit(self, record):
+        self.count += 1
+        if len(self.records) < self.max_records:
+            self.records.append(record)
+
+    def flush(self):
+        with self.lock:
+            if not self.count or time.monotonic() - self.last_sent < self.interval:
+                return None
+            records, count = self.records, self.count
+            self.records, self.count, self.last_sent = [], 0, time.monotonic()
+        try:
+            self.send_digest(records, count)
+        except Exception:
+            self.handleError(records[0])
+        return None
+
+    def close(self):
+        self.last_sent = float("-inf")
+        self.flush()
+        super().close()
+
+    def send_digest(self, records: List[logging.LogRecord], count: int):
+        first = records[0]
+        subject = self.format_subject(
+            f"{count} record(s) logged, first: {first.levelname} {first.getMessage()}"
+        )
+        message = "\n\n".join(self.format(record) for record in records)
+        if count > len(records):
+            message += f"\n\n... and {count - len(records)} more"
+        html_message = None
+        if self.include_html and first.exc_info:
+            html_message = self.reporter_class(
+                getattr(first, "request", None), *first.exc_info, is_email=True
+            ).get_traceback_html()
+        self.send_mail(subject, message, fail_silently=True, html_message=html_message)
+
+
+class BatchedFileHandler(TimedRotatingFileHandler):
+    """
+    a rotating file handler that leaves flushing to the queue listener, which
+    flushes once per batch instead of once per record
+    """
+
+    def flush(self):
+        return None
+
+    def flush_batch(self):
+        super().flush()
+
+    def close(self):
+        self.flush_batch()
+        super().close()
+
+
+class BatchingQueueListener(QueueListener):
+    """
+    drains the queue in batches, flushing the handlers after every batch and
+    whenever the queue has been idle for flush_interval seconds
+    """
+
+    def __init__(self, queue_, *handlers, batch_size=100, flush_interval=1.0):
+        super().__init__(queue_, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    def _monitor(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                self.flush()
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is self._sentinel:
+                    self.flush()
+                    return None
+                self.handle(record)
+            self.flush()
+
+    def flush(self):
+        for handler in self.handlers:
+            try:
+                getattr(handler, "flush_batch", handler.flush)()
+            except Exception:
+                pass
+
+    def enqueue_sentinel(self):
+        # the queue may be full, wait for the listener to make room
+        self.queue.put(self._sentinel)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Hands records to a bounded in-memory queue drained by a listener thread,
+    so the logging thread never waits on disk or SMTP. The target handlers are
+    the handlers of the LOGGING config named in handlers; they are looked up
+    and the listener is started on first use (and again after a fork). When the
+    queue is full records are dropped and counted rather than blocking.
+    """
+
+    def __init__(
+        self,
+        handlers: List[str],
+        maxsize: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+    ):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.handler_names = handlers
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._pid == os.getpid():
+            return None
+        with self._lock:
+            if self._pid == os.getpid():
+                return None
+            if self._pid is not None:
+                # the listener thread did not survive the fork
+                self.queue = queue.Queue(maxsize=self.maxsize)
+            self.listener = BatchingQueueListener(
+                self.queue,
+                *self.target_handlers(),
+                batch_size=self.batch_size,
+                flush_interval=self.flush_interval,
+            )
+            self.listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+        return None
+
+    def stop(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self._pid = None
+        return None
+
+    def target_handlers(self) -> List[logging.Handler]:
+        # logging.getHandlerByName is only available from python 3.12
+        handlers = [logging._handlers.get(name) for name in self.handler_names]
+        missing = [
+            name for name, handler in zip(self.handler_names, handlers) if not handler
+        ]
+        if missing:
+            raise ValueError(f"unknown logging handlers {missing}")
+        return handlers
+
+    def emit(self, record):
+        self.start()
+        super().emit(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
         """
-        Emit a record.
-        Format the record and send it to the specified addressees.
+        resolve the message arguments so later changes to them do not leak into
+        the log, but leave formatting (and the exception info and request the
+        mail handler needs) to the target handlers so records are formatted once
         """
-        Thread(target=self.send_mail, kwargs={"record": record}).start()
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
 
-    def send_mail(self, record):
-        self.timeout = 30
-        super().emit(record)
+    def close(self):
+        self.stop()
+        super().close()
 
 
 class RequestFormatter(logging.Formatter):
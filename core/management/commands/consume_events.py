@@ -0,0 +1,40 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from core.consumer import EventConsumer
+
+
+class Command(BaseCommand):
+    help = "consume the subscribed kafka topics and dispatch them to their handlers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--topic",
+            action="append",
+            dest="topics",
+            help="topic to consume, may be repeated (default: all subscriptions)",
+        )
+        parser.add_argument("--group", help="consumer group id")
+        parser.add_argument("--max-records", type=int, help="records per poll")
+        parser.add_argument("--workers", type=int, help="partition worker threads")
+
+    def handle(self, *args, **options):
+        topics = options.get("topics") or list(settings.KAFKA_SUBSCRIPTIONS)
+        unknown = set(topics) - set(settings.KAFKA_SUBSCRIPTIONS)
+        if unknown:
+            raise CommandError(f"no subscription handler for topics {unknown}")
+        consumer = EventConsumer(
+            subscriptions={
+                topic: import_string(settings.KAFKA_SUBSCRIPTIONS[topic])()
+                for topic in topics
+            },
+            group_id=options.get("group"),
+            max_poll_records=options.get("max_records"),
+            workers=options.get("workers"),
+        )
+        signal.signal(signal.SIGTERM, consumer.stop)
+        signal.signal(signal.SIGINT, consumer.stop)
+        consumer.run()
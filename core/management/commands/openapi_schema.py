@@ -0,0 +1,52 @@
+import difflib
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.openapi import generate_schema, render_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "generate the OpenAPI schema and print how it differs from the "
+        "pre-generated artifact served at api/schema/"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", help="defaults to OPENAPI_SCHEMA_PATH")
+        parser.add_argument("--write", action="store_true", help="replace the artifact")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="fail when the artifact is out of date, for CI",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or settings.OPENAPI_SCHEMA_PATH
+        generated = render_schema(generate_schema(), "yaml").decode()
+        current = ""
+        if os.path.exists(path):
+            with open(path) as artifact:
+                current = artifact.read()
+        diff = list(
+            difflib.unified_diff(
+                current.splitlines(keepends=True),
+                generated.splitlines(keepends=True),
+                fromfile=f"{path} (artifact)",
+                tofile=f"{path} (generated)",
+            )
+        )
+        if not diff:
+            self.stdout.write(f"{path} is up to date")
+            return None
+        self.stdout.write("".join(diff))
+        if options["write"]:
+            with open(path, "w") as artifact:
+                artifact.write(generated)
+            self.stdout.write(self.style.SUCCESS(f"{path} written"))
+        elif options["check"]:
+            raise CommandError(
+                f"{path} is out of date, run `manage.py openapi_schema --write`"
+            )
+        return None
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.producer import close_producer, replayer, spool
+
+
+class Command(BaseCommand):
+    help = "replay the records spooled while kafka was unavailable"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stats", action="store_true", help="only report the spool backlog"
+        )
+        parser.add_argument("--batch-size", type=int, help="records per batch")
+
+    def handle(self, *args, **options):
+        if not options.get("stats"):
+            try:
+                replayed = replayer.replay(batch_size=options.get("batch_size"))
+            finally:
+                close_producer()
+            self.stdout.write(f"replayed {replayed} records")
+        for name, value in spool.stats().items():
+            self.stdout.write(f"{name}: {value}")
@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.instrumentation import slow_query_log
+
+
+class Command(BaseCommand):
+    help = "list the slow queries recorded by the slow query log"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--order-by",
+            default="total_ms",
+            choices=("total_ms", "max_ms", "count", "last_seen"),
+        )
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument(
+            "--plans", action="store_true", help="print the sampled query plans"
+        )
+        parser.add_argument("--json", action="store_true", help="print json")
+        parser.add_argument(
+            "--clear", action="store_true", help="forget the recorded queries"
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            slow_query_log.clear()
+            self.stdout.write("slow queries cleared")
+            return None
+        entries = slow_query_log.entries(order_by=options["order_by"])
+        entries = entries[: options["limit"]]
+        if options["json"]:
+            self.stdout.write(json.dumps(entries, indent=2))
+            return None
+        if not entries:
+            self.stdout.write("no slow queries recorded")
+        for entry in entries:
+            self.stdout.write(
+                f"{entry['fingerprint']} count={entry['count']}"
+                f" total={entry['total_ms']}ms max={entry['max_ms']}ms"
+                f" seq_scans={','.join(entry['seq_scans']) or '-'}"
+            )
+            self.stdout.write(f"  {entry['sql']}")
+            for site in entry["call_sites"]:
+                self.stdout.write(f"  at {site}")
+            if options["plans"] and entry["plan"]:
+                self.stdout.write("  " + entry["plan"].replace("\n", "\n  "))
+        return None
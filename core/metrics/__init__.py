@@ -0,0 +1,18 @@
+from .collectors import (
+    cache_requests,
+    http_request_duration,
+    kafka_publish_duration,
+    kafka_publish_failures,
+    kafka_spool_pending_bytes,
+    kafka_spool_replays,
+    keycloak_call_duration,
+    keycloak_call_errors,
+    notification_jobs,
+    notification_queue_depth,
+    observe_methods,
+    password_hash_duration,
+    repository_operation_duration,
+)
+from .middleware import MetricsMiddleware
+from .registry import Counter, Gauge, Histogram, registry
+from .views import metrics_view
@@ -0,0 +1,148 @@
+import functools
+import inspect
+import time
+
+from .registry import Counter, Gauge, Histogram, registry
+
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "time spent handling a request, by route",
+        labels=("method", "route", "status"),
+    )
+)
+keycloak_call_duration = registry.register(
+    Histogram(
+        "keycloak_call_duration_seconds",
+        "time spent on keycloak calls, by method",
+        labels=("method",),
+    )
+)
+keycloak_call_errors = registry.register(
+    Counter(
+        "keycloak_call_errors",
+        "keycloak calls that raised, by method",
+        labels=("method", "exception"),
+    )
+)
+repository_operation_duration = registry.register(
+    Histogram(
+        "repository_operation_duration_seconds",
+        "time spent in repository operations",
+        labels=("repository", "operation"),
+    )
+)
+cache_requests = registry.register(
+    Counter(
+        "cache_requests",
+        "cache reads, by result (hit or miss)",
+        labels=("result",),
+    )
+)
+kafka_publish_duration = registry.register(
+    Histogram(
+        "kafka_publish_duration_seconds",
+        "time spent handing a record to the kafka producer, by topic",
+        labels=("topic",),
+    )
+)
+kafka_publish_failures = registry.register(
+    Counter(
+        "kafka_publish_failures",
+        "records kafka did not take, by topic and outcome (spooled or lost)",
+        labels=("topic", "outcome"),
+    )
+)
+kafka_spool_pending_bytes = registry.register(
+    Gauge(
+        "kafka_spool_pending_bytes",
+        "bytes of records spooled while kafka was unavailable, not yet replayed",
+    )
+)
+kafka_spool_replays = registry.register(
+    Counter(
+        "kafka_spool_replays",
+        "spooled records sent back to kafka, by outcome (replayed or failed)",
+        labels=("outcome",),
+    )
+)
+notification_queue_depth = registry.register(
+    Gauge(
+        "notification_queue_depth",
+        "notification jobs waiting in the queue of a lane",
+        labels=("lane",),
+    )
+)
+notification_jobs = registry.register(
+    Counter(
+        "notification_jobs",
+        "notification jobs, by lane and outcome (enqueued, processed, failed, "
+        "dropped or spilled)",
+        labels=("lane", "outcome"),
+    )
+)
+password_hash_duration = registry.register(
+    Histogram(
+        "password_hash_duration_seconds",
+        "time spent hashing and verifying passwords",
+        labels=("operation",),
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    )
+)
+
+
+def observe_methods(histogram: Histogram, errors: Counter = None, owner: str = None):
+    """
+    class decorator observing the duration (and, with errors, the exceptions)
+    of every public method defined on the class, labelled by method name and,
+    with owner, by the name of the instance's class
+    """
+
+    def labels(self, name):
+        labels = {"method" if owner is None else "operation": name}
+        if owner is not None:
+            labels[owner] = type(self).__name__
+        return labels
+
+    def failed(name, exc):
+        if errors is not None:
+            errors.inc(method=name, exception=type(exc).__name__)
+
+    def wrap(name, method):
+        if inspect.iscoroutinefunction(method):
+
+            @functools.wraps(method)
+            async def aobserved(self, *args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await method(self, *args, **kwargs)
+                except Exception as exc:
+                    failed(name, exc)
+                    raise
+                finally:
+                    histogram.observe(
+                        time.perf_counter() - started, **labels(self, name)
+                    )
+
+            return aobserved
+
+        @functools.wraps(method)
+        def observed(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            except Exception as exc:
+                failed(name, exc)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, **labels(self, name))
+
+        return observed
+
+    def decorate(cls):
+        for name, attribute in list(vars(cls).items()):
+            if not name.startswith("_") and callable(attribute):
+                setattr(cls, name, wrap(name, attribute))
+        return cls
+
+    return decorate
@@ -0,0 +1,37 @@
+import threading
+import time
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from .collectors import password_hash_duration
+
+_verifying = threading.local()
+
+
+class InstrumentedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    the default password hasher, observing how long hashing and verifying take
+    (it keeps the pbkdf2_sha256 algorithm so stored hashes stay valid)
+    """
+
+    def encode(self, password, salt, iterations=None):
+        if getattr(_verifying, "active", False):
+            # verify hashes the candidate password with encode
+            return super().encode(password, salt, iterations)
+        started = time.perf_counter()
+        try:
+            return super().encode(password, salt, iterations)
+        finally:
+            password_hash_duration.observe(
+                time.perf_counter() - started, operation="encode"
+            )
+
+    def verify(self, password, encoded):
+        started, _verifying.active = time.perf_counter(), True
+        try:
+            return super().verify(password, encoded)
+        finally:
+            _verifying.active = False
+            password_hash_duration.observe(
+                time.perf_counter() - started, operation="verify"
+            )
@@ -0,0 +1,45 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .collectors import http_request_duration
+
+
+class MetricsMiddleware:
+    """
+    observes the latency of every request, labelled by the route pattern so
+    the number of series stays bounded
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    # noinspection PyMethodMayBeStatic
+    def observe(self, request, response, started: float):
+        resolver_match = getattr(request, "resolver_match", None)
+        http_request_duration.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=resolver_match.route if resolver_match else "unmatched",
+            status=response.status_code,
+        )
@@ -0,0 +1,317 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from loguru import logger
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def label_values(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                json.dumps(key): self.copy_value(value)
+                for key, value in self._values.items()
+            }
+
+    # noinspection PyMethodMayBeStatic
+    def copy_value(self, value):
+        return value
+
+    def merge(self, samples: dict, other: dict) -> dict:
+        raise NotImplementedError
+
+    def expose(self, samples: dict) -> List[str]:
+        raise NotImplementedError
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Tuple[str, ...], values: Iterable[str], **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self.label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        registry.ensure_writer()
+
+    def merge(self, samples: dict, other: dict) -> dict:
+        for key, value in other.items():
+            samples[key] = samples.get(key, 0.0) + value
+        return samples
+
+    def expose(self, samples: dict) -> List[str]:
+        return [
+            f"{self.name}_total{format_labels(self.label_names, json.loads(key))} "
+            f"{value}"
+            for key, value in sorted(samples.items())
+        ]
+
+
+class Gauge(Metric):
+    """
+    a value that goes up and down, the values of the processes are summed. a
+    gauge with a function is read when it is collected instead, it reports
+    what every process of the host sees alike (e.g a file) and is left out of
+    the snapshots, so the value is not counted once per process.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.function: Optional[Callable[[], float]] = None
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def snapshot(self) -> dict:
+        if self.function is not None:
+            return {json.dumps(self.label_values({})): float(self.function())}
+        return super().snapshot()
+
+    def set(self, value: float, **labels):
+        key = self.label_values(labels)
+        with self._lock:
+            self._values[key] = float(value)
+        registry.ensure_writer()
+
+    def merge(self, samples: dict, other: dict) -> dict:
+        for key, value in other.items():
+            samples[key] = samples.get(key, 0.0) + value
+        return samples
+
+    def expose(self, samples: dict) -> List[str]:
+        return [
+            f"{self.name}{format_labels(self.label_names, json.loads(key))} {value}"
+            for key, value in sorted(samples.items())
+        ]
+
+
+class Histogram(Metric):
+    """
+    a histogram, every sample is the count per bucket followed by the sum and
+    the count of the observations
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self.label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+        registry.ensure_writer()
+
+    def copy_value(self, value):
+        return list(value)
+
+    def merge(self, samples: dict, other: dict) -> dict:
+        for key, value in other.items():
+            current = samples.get(key)
+            samples[key] = (
+                list(value)
+                if current is None
+                else [left + right for left, right in zip(current, value)]
+            )
+        return samples
+
+    def expose(self, samples: dict) -> List[str]:
+        lines = []
+        for key, counts in sorted(samples.items()):
+            values = json.loads(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{format_labels(self.label_names, values, le=le)} {cumulative}"
+                )
+            labels = format_labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {counts[-2]}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+
+class Registry:
+    """
+    Holds the metrics of the process. With METRICS_DIR set, a writer thread
+    saves a snapshot of the process' metrics to its own file every
+    METRICS_FLUSH_INTERVAL seconds, and the exposition merges the snapshots
+    of every worker process, so any worker can answer a scrape. Snapshots
+    not updated within METRICS_RETENTION seconds are dropped.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self._writer: Optional[threading.Thread] = None
+        self._writer_started = False
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    @property
+    def directory(self) -> Optional[str]:
+        return settings.METRICS_DIR
+
+    def snapshot(self, shared: bool = True) -> dict:
+        """
+        :param shared: whether to take the gauges read by a function as well
+        """
+        return {
+            name: metric.snapshot()
+            for name, metric in self.metrics.items()
+            if shared or getattr(metric, "function", None) is None
+        }
+
+    def ensure_writer(self):
+        if self._writer_started or not self.directory:
+            return None
+        with self._lock:
+            if not self._writer_started:
+                self._writer = threading.Thread(
+                    target=self.write_periodically, name="metrics-writer", daemon=True
+                )
+                self._writer.start()
+                self._writer_started = True
+        return None
+
+    def write_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.write()
+
+    def snapshot_path(self, pid: int = None) -> str:
+        return os.path.join(self.directory, f"metrics-{pid or os.getpid()}.json")
+
+    def write(self):
+        if not self.directory:
+            return None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.snapshot_path()
+            with open(f"{path}.tmp", "w") as snapshot_file:
+                json.dump(
+                    self.snapshot(shared=False), snapshot_file, separators=(",", ":")
+                )
+            os.replace(f"{path}.tmp", path)
+        except OSError as exc:
+            logger.warning(f"metrics snapshot not written: {exc}")
+        return None
+
+    def collect(self) -> dict:
+        """
+        :return: the samples of every metric, merged across processes
+        """
+        merged = {name: {} for name in self.metrics}
+        for snapshot in [self.snapshot()] + self.read_snapshots():
+            for name, samples in snapshot.items():
+                if name in self.metrics:
+                    self.metrics[name].merge(merged[name], samples)
+        return merged
+
+    def read_snapshots(self) -> List[dict]:
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        snapshots, own = [], os.path.basename(self.snapshot_path())
+        expired = time.time() - settings.METRICS_RETENTION
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json") or entry.name == own:
+                continue
+            try:
+                if entry.stat().st_mtime < expired:
+                    os.remove(entry.path)
+                    continue
+                with open(entry.path) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def expose(self) -> str:
+        """
+        the metrics in the prometheus text exposition format
+        """
+        lines = []
+        for name, samples in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            lines.extend(metric.expose(samples))
+        return "\n".join(lines) + "\n"
+
+    def reset_after_fork(self):
+        # the writer thread does not survive a fork and the child must not
+        # report the parent's observations as its own
+        self._writer, self._writer_started = None, False
+        self._lock = threading.Lock()
+        for metric in self.metrics.values():
+            metric._lock = threading.Lock()
+            metric._values = {}
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset_after_fork)
+atexit.register(registry.write)
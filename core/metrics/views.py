@@ -0,0 +1,28 @@
+import hmac
+
+from django.conf import settings
+from django.http import (
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotFound,
+)
+
+from .registry import registry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics_view(request):
+    """
+    the metrics of every worker process in the prometheus text format. scrapes
+    must send METRICS_AUTH_TOKEN as a bearer token, without a token configured
+    the endpoint does not exist.
+    """
+    token = settings.METRICS_AUTH_TOKEN
+    if not token:
+        return HttpResponseNotFound()
+    if not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.expose(), content_type=CONTENT_TYPE)
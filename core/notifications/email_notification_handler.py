@@ -1,14 +1,24 @@
+import hashlib
 from typing import List, Union
 
 from django.conf import settings
-from django.contrib.auth import get_user_model
-from django.template.exceptions import TemplateDoesNotExist
-from django.template.loader import render_to_string
 
-from core.exceptions import AppException
+from core.constants import EmailTemplateEnum, NotificationPriorityEnum
 from core.interfaces.notifications import NotificationInterface
 from core.producer import publish_to_kafka
 
+from .system_sender import get_system_sender_id
+from .template_engine import template_engine
+
+# security codes go out first, verification links next and everything else
+# (notices of changes already made) is informational
+TEMPLATE_PRIORITIES = {
+    EmailTemplateEnum.otp_code.value: NotificationPriorityEnum.urgent,
+    EmailTemplateEnum.password_reset.value: NotificationPriorityEnum.urgent,
+    EmailTemplateEnum.temporal_password.value: NotificationPriorityEnum.urgent,
+    EmailTemplateEnum.email_verification.value: NotificationPriorityEnum.high,
+}
+
 
 class EmailNotificationHandler(NotificationInterface):
     def __init__(
@@ -17,38 +27,79 @@ class EmailNotificationHandler(NotificationInterface):
         template_name: Union[str, None],
         metadata: dict = None,
         plain_text: str = None,
+        key: str = None,
+        dedupe_window: int = None,
+        dedupe_payload: str = None,
+        priority: NotificationPriorityEnum = None,
     ):
         self.recipients = recipients
         self.template = template_name
         self.plain_text = plain_text
         self.metadata = metadata or {}
+        self.key = key
+        self.dedupe_window = dedupe_window
+        self.dedupe_payload = dedupe_payload
+        self.priority = priority or TEMPLATE_PRIORITIES.get(
+            template_name, NotificationPriorityEnum.low
+        )
 
     def send(self) -> None:
         """
         Send the email notification.
         """
         data = {
-            "user_id": str(get_user_model().objects.filter(is_superuser=True).get().id),
+            "user_id": get_system_sender_id(),
             "sender": settings.SERVER_EMAIL,
             "subject": self.metadata.get("subject"),
             "recipients": self._recipients(),
             "html_body": self.html_text(),
             "text_body": self.plain_text,
         }
-        publish_to_kafka(topic=settings.KAFKA_EMAIL_TOPIC, value=data)
+        publish_to_kafka(topic=settings.KAFKA_EMAIL_TOPIC, value=data, key=self._key())
         return None
 
     def html_text(self):
-        try:
-            if self.template:
-                return render_to_string(f"email/{self.template}", self.metadata)
-            return None
-        except TemplateDoesNotExist as exc:
-            raise AppException.InternalServerException(
-                error_message=f"template{self.template, exc}"
-            )
+        if self.template:
+            return template_engine.render(f"email/{self.template}", self.metadata)
+        return None
 
     def _recipients(self):
         if not isinstance(self.recipients, list):
             return [self.recipients]
         return self.recipients
+
+    def idempotency_key(self):
+        return self.template_key(
+            recipients=self.recipients,
+            template_name=self.template,
+            payload=self.dedupe_payload,
+        )
+
+    @staticmethod
+    def template_key(
+        recipients: Union[str, List[str]], template_name: str, payload: str = None
+    ):
+        """
+        the idempotency key of the mail sent with a template to the recipients.
+        a payload (e.g the otp code) sets apart the mails whose content differs.
+        """
+        if not template_name:
+            return None
+        if not isinstance(recipients, list):
+            recipients = [recipients]
+        key = f"email:{template_name}:{','.join(sorted(map(str, recipients)))}"
+        if payload:
+            key = f"{key}:{hashlib.sha256(payload.encode()).hexdigest()[:16]}"
+        return key
+
+    def _key(self):
+        """
+        the message key, used to route all notifications of one account (or
+        recipient) to the same partition so they are delivered in order
+        """
+        return (
+            self.key
+            or self.metadata.get("user_id")
+            or self.metadata.get("account_id")
+            or self._recipients()[0]
+        )
@@ -1,13 +1,15 @@
+import hashlib
 from typing import List, Union
 
 from django.conf import settings
-from django.template.exceptions import TemplateDoesNotExist
-from django.template.loader import render_to_string
 
-from core.exceptions import AppException
+from core.constants import NotificationPriorityEnum
 from core.interfaces import NotificationInterface
 from core.producer import publish_to_kafka
 
+from .system_sender import get_system_sender_id
+from .template_engine import template_engine
+
 
 class SMSNotificationHandler(NotificationInterface):
     def __init__(
@@ -16,11 +18,19 @@ class SMSNotificationHandler(NotificationInterface):
         template_name: str = None,
         metadata: dict = None,
         plain_text: str = None,
+        key: str = None,
+        dedupe_window: int = None,
+        dedupe_payload: str = None,
+        priority: NotificationPriorityEnum = NotificationPriorityEnum.urgent,
     ):
         self.recipients: list = recipients
         self.template = template_name
         self.plain_text = plain_text
         self.metadata = metadata or {}
+        self.key = key
+        self.dedupe_window = dedupe_window
+        self.dedupe_payload = dedupe_payload
+        self.priority = priority
         # self.jinja2_environment = Jinja2Environment(
         #     loader=FileSystemLoader(
         #         searchpath=create_directory(
@@ -34,26 +44,57 @@ class SMSNotificationHandler(NotificationInterface):
         Send SMS notification.
         """
         data = {
-            "user_id": "salkjfda",
+            "user_id": get_system_sender_id(),
             "recipients": self._recipients(),
             "sender": settings.SMS_SENDER,
             "message": self.plain_text or self.message(),
         }
-        publish_to_kafka(topic=settings.KAFKA_SMS_TOPIC, value=data)
+        publish_to_kafka(topic=settings.KAFKA_SMS_TOPIC, value=data, key=self._key())
         return None
 
     def message(self):
-        try:
-            if self.template:
-                return render_to_string(f"sms/{self.template}", self.metadata)
-            return None
-            # return template.render(**self.metadata)
-        except TemplateDoesNotExist as exc:
-            raise AppException.InternalServerException(
-                error_message=f"template{self.template, exc}"
-            ) from exc
+        if self.template:
+            return template_engine.render(f"sms/{self.template}", self.metadata)
+        return None
 
     def _recipients(self):
         if not isinstance(self.recipients, list):
             return [self.recipients]
         return self.recipients
+
+    def idempotency_key(self):
+        return self.template_key(
+            recipients=self.recipients,
+            template_name=self.template,
+            payload=self.dedupe_payload,
+        )
+
+    @staticmethod
+    def template_key(
+        recipients: Union[str, List[str]], template_name: str, payload: str = None
+    ):
+        """
+        the idempotency key of the sms sent with a template to the recipients.
+        a payload (e.g the otp code) sets apart the messages whose content
+        differs.
+        """
+        if not template_name:
+            return None
+        if not isinstance(recipients, list):
+            recipients = [recipients]
+        key = f"sms:{template_name}:{','.join(sorted(map(str, recipients)))}"
+        if payload:
+            key = f"{key}:{hashlib.sha256(payload.encode()).hexdigest()[:16]}"
+        return key
+
+    def _key(self):
+        """
+        the message key, used to route all notifications of one account (or
+        recipient) to the same partition so they are delivered in order
+        """
+        return (
+            self.key
+            or self.metadata.get("user_id")
+            or self.metadata.get("account_id")
+            or self._recipients()[0]
+        )
@@ -0,0 +1,47 @@
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+SYSTEM_SENDER_KEY = "notification:system_sender_id"
+
+
+def get_system_sender_id() -> Optional[str]:
+    """
+    the id notifications are sent on behalf of. it is taken from
+    settings.NOTIFICATION_SENDER_ID when set, otherwise it is the oldest
+    superuser, resolved once and kept in the shared cache until a superuser
+    changes, so every worker drops it together.
+    """
+    if settings.NOTIFICATION_SENDER_ID:
+        return settings.NOTIFICATION_SENDER_ID
+    sender_id = cache.get(SYSTEM_SENDER_KEY)
+    if sender_id is None:
+        sender_id = (
+            get_user_model()
+            .objects.filter(is_superuser=True)
+            .order_by("created_at")
+            .values_list("id", flat=True)
+            .first()
+        )
+        # "" records that there is no superuser yet
+        sender_id = str(sender_id) if sender_id else ""
+        cache.set(SYSTEM_SENDER_KEY, sender_id, timeout=None)
+    return sender_id or None
+
+
+def reset_system_sender_id():
+    cache.delete(SYSTEM_SENDER_KEY)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_system_sender_id(sender, instance, **kwargs):
+    if instance.is_superuser or str(instance.pk) == cache.get(SYSTEM_SENDER_KEY):
+        reset_system_sender_id()
+        # a worker that read the old rows before the commit may have cached them
+        transaction.on_commit(reset_system_sender_id)
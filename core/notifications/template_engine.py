@@ -0,0 +1,157 @@
+import re
+import threading
+from typing import Dict, Iterable, List
+
+from django.core.exceptions import ImproperlyConfigured
+from django.template import Context, TemplateDoesNotExist
+from django.template.base import (
+    TextNode,
+    VariableNode,
+    render_value_in_context,
+)
+from django.template.defaulttags import CommentNode, LoadNode
+from django.template.loader import get_template
+from django.template.loader_tags import BlockNode, ExtendsNode
+from loguru import logger
+
+from core.exceptions import AppException
+
+# django never leaves "{{name}}" in its output, so it cannot clash with the text
+# of a template
+SENTINEL = "{{{{{name}}}}}"
+SENTINEL_PATTERN = re.compile(r"\{\{([A-Za-z_][A-Za-z0-9_]*)\}\}")
+STATIC_NODES = (TextNode, BlockNode, ExtendsNode, LoadNode, CommentNode)
+_context = Context(autoescape=True)
+
+
+def minify_html(html: str) -> str:
+    """
+    drop comments and the whitespace between tags and collapse whitespace runs,
+    e.g the indentation inside multi line style attributes
+    """
+    if "<pre" in html or "<textarea" in html:
+        return html
+    html = re.sub(r"<!--(?!\[if).*?-->", "", html, flags=re.DOTALL)
+    html = re.sub(r">\s+<", "><", html)
+    html = re.sub(r"\s+", " ", html)
+    return html.strip()
+
+
+class CompiledTemplate:
+    """
+    A notification template whose layout is rendered once. Templates made only
+    of text and plain variables (inheritance included) are rendered with a
+    sentinel in place of every variable, minified and split into
+    static chunks, so rendering a message is a join of the chunks with the
+    escaped variables. Templates with any other tag or with filters are
+    rendered by django on every call.
+    """
+
+    def __init__(self, name: str, minify: bool = True):
+        self.name = name
+        self.template = get_template(name)
+        self.variables = self.static_variables(self.template.template)
+        self.chunks: List[str] = []
+        self.names: List[str] = []
+        if self.variables is not None:
+            self.compile(minify=minify and name.endswith(".html"))
+
+    @property
+    def is_precompiled(self) -> bool:
+        return self.variables is not None
+
+    def static_variables(self, template, seen: set = None):
+        """
+        :return: the names of the variables of the template (and its parents)
+        or None when the output depends on anything other than their values
+        """
+        seen = seen or set()
+        if template.origin.name in seen:
+            return None
+        seen.add(template.origin.name)
+        variables = set()
+        for node in template.nodelist.get_nodes_by_type(object):
+            if isinstance(node, VariableNode):
+                expression = node.filter_expression
+                lookups = getattr(expression.var, "lookups", None)
+                if expression.filters or (lookups and len(lookups) != 1):
+                    return None
+                if lookups:
+                    variables.add(lookups[0])
+            elif isinstance(node, ExtendsNode):
+                parent_name = node.parent_name.var
+                if not isinstance(parent_name, str):
+                    return None
+                parent = get_template(parent_name.strip("\"'")).template
+                parent_variables = self.static_variables(parent, seen)
+                if parent_variables is None:
+                    return None
+                variables |= parent_variables
+            elif not isinstance(node, STATIC_NODES):
+                return None
+        return variables
+
+    def compile(self, minify: bool):
+        html = self.template.render(
+            {name: SENTINEL.format(name=name) for name in self.variables}
+        )
+        if minify:
+            html = minify_html(html)
+        parts = SENTINEL_PATTERN.split(html)
+        self.chunks = parts[0::2]
+        self.names = parts[1::2]
+
+    def render(self, context: dict) -> str:
+        if not self.is_precompiled:
+            return self.template.render(context)
+        output = [self.chunks[0]]
+        for name, chunk in zip(self.names, self.chunks[1:]):
+            if name in context:
+                output.append(render_value_in_context(context[name], _context))
+            output.append(chunk)
+        return "".join(output)
+
+
+class NotificationTemplateEngine:
+    """
+    keeps the compiled notification templates of the process in memory
+    """
+
+    def __init__(self, minify: bool = True):
+        self.minify = minify
+        self.templates: Dict[str, CompiledTemplate] = {}
+        self._lock = threading.Lock()
+
+    def load(self, names: Iterable[str]):
+        """
+        compile the templates up front, raising if any of them does not exist
+        """
+        for name in names:
+            try:
+                template = self.get(name)
+            except AppException.InternalServerException as exc:
+                raise ImproperlyConfigured(exc.error_message) from exc
+            if not template.is_precompiled:
+                logger.warning(f"template {name} is rendered by django per message")
+        return None
+
+    def get(self, name: str) -> CompiledTemplate:
+        template = self.templates.get(name)
+        if template is None:
+            with self._lock:
+                template = self.templates.get(name)
+                if template is None:
+                    try:
+                        template = CompiledTemplate(name, minify=self.minify)
+                    except TemplateDoesNotExist as exc:
+                        raise AppException.InternalServerException(
+                            error_message=f"template{name, exc}"
+                        ) from exc
+                    self.templates[name] = template
+        return template
+
+    def render(self, name: str, context: dict) -> str:
+        return self.get(name).render(context)
+
+
+template_engine = NotificationTemplateEngine()
@@ -0,0 +1,8 @@
+from .schema import (
+    CachedSchema,
+    SchemaDocument,
+    cached_schema,
+    generate_schema,
+    render_schema,
+)
+from .views import schema_view
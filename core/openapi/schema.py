@@ -0,0 +1,100 @@
+import gzip
+import hashlib
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import yaml
+from django.conf import settings
+from drf_spectacular.renderers import (
+    OpenApiJsonRenderer,
+    OpenApiYamlRenderer,
+)
+from drf_spectacular.settings import spectacular_settings
+
+from core.provider import ProcessSingleton
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, the schema is then served gzipped
+    brotli = None
+
+RENDERERS = {"yaml": OpenApiYamlRenderer, "json": OpenApiJsonRenderer}
+
+
+def generate_schema() -> dict:
+    """
+    introspect every view, the work SpectacularAPIView did on each request
+    """
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+def render_schema(schema: dict, schema_format: str = "yaml") -> bytes:
+    return RENDERERS[schema_format]().render(schema, renderer_context={})
+
+
+@dataclass
+class SchemaDocument:
+    """
+    a rendered schema with its etag and pre-compressed encodings
+    """
+
+    content: bytes
+    media_type: str
+    etag: str
+    encodings: Dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, content: bytes, schema_format: str) -> "SchemaDocument":
+        # weak, the gzip and brotli encodings are the same document
+        etag = f'W/"{hashlib.sha256(content).hexdigest()[:32]}"'
+        encodings = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            encodings["br"] = brotli.compress(content, quality=11)
+        return cls(
+            content=content,
+            media_type=RENDERERS[schema_format].media_type,
+            etag=etag,
+            encodings=encodings,
+        )
+
+
+class CachedSchema:
+    """
+    the schema documents served by schema_view, every format rendered and
+    compressed once per process. they come from the artifact at
+    OPENAPI_SCHEMA_PATH when it exists and are generated otherwise.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._documents = ProcessSingleton(self.load)
+
+    @property
+    def artifact_path(self) -> Optional[str]:
+        return self.path or settings.OPENAPI_SCHEMA_PATH
+
+    def load(self) -> Dict[str, SchemaDocument]:
+        path = self.artifact_path
+        if path and os.path.exists(path):
+            with open(path, "rb") as artifact:
+                content = artifact.read()
+            loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+            schema = yaml.load(content, Loader=loader)
+        else:
+            schema = generate_schema()
+            content = render_schema(schema, "yaml")
+        return {
+            "yaml": SchemaDocument.build(content, "yaml"),
+            "json": SchemaDocument.build(render_schema(schema, "json"), "json"),
+        }
+
+    def get(self, schema_format: str = "yaml") -> SchemaDocument:
+        return self._documents.get()[schema_format]
+
+    def reset(self):
+        self._documents.reset()
+
+
+cached_schema = CachedSchema()
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition, require_safe
+
+from .schema import cached_schema
+
+
+def schema_format(request) -> str:
+    """
+    json when asked for with ?format=json or the Accept header, yaml otherwise
+    as SpectacularAPIView did
+    """
+    requested = request.GET.get("format")
+    if requested in ("json", "yaml"):
+        return requested
+    return "json" if "json" in request.headers.get("Accept", "") else "yaml"
+
+
+def accepted_encoding(request, encodings: dict):
+    accepted = request.headers.get("Accept-Encoding", "")
+    for encoding in ("br", "gzip"):
+        if encoding in encodings and encoding in accepted:
+            return encoding
+    return None
+
+
+@require_safe
+@condition(etag_func=lambda request: cached_schema.get(schema_format(request)).etag)
+def schema_view(request):
+    """
+    the pre-generated OpenAPI schema, from memory and pre-compressed
+    """
+    document = cached_schema.get(schema_format(request))
+    encoding = accepted_encoding(request, document.encodings)
+    response = HttpResponse(
+        document.encodings[encoding] if encoding else document.content,
+        content_type=document.media_type,
+    )
+    if encoding:
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+    patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+    return response
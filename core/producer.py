@@ -1,45 +1,230 @@
-import json
+import atexit
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
 
 from django.conf import settings
 from kafka import KafkaProducer
 from kafka.errors import KafkaError
+from kafka.partitioner.default import murmur2
 from loguru import logger
 
+from core.codecs import get_codec
 from core.exceptions import AppException
+from core.instrumentation import timed
+from core.metrics import (
+    kafka_publish_duration,
+    kafka_publish_failures,
+    kafka_spool_pending_bytes,
+)
+from core.spool import KafkaSpool, SpooledRecord, SpoolReplayer
+from core.tracing import current_span, current_traceparent, traced
 
+_producer = None
+_producer_lock = threading.Lock()
 
-def json_serializer(data):
-    return json.dumps(data).encode("UTF-8")
 
+@dataclass(frozen=True)
+class PublishResult:
+    topic: str
+    partition: Optional[int]
+    key: Optional[str]
+    spooled: bool = False
 
-def get_partition(key, all, available):
-    return 0
+
+def key_serializer(key):
+    if key is None:
+        return None
+    return str(key).encode("UTF-8")
+
+
+def get_partition(key: Optional[bytes], all: List[int], available: List[int]) -> int:
+    """
+    hash the key onto one of the partitions (murmur2, like the java client) so
+    every record with the same key lands on the same partition and keeps its
+    order. records without a key are spread randomly.
+    """
+    if key is None:
+        return random.choice(available or all)
+    return all[(murmur2(key) & 0x7FFFFFFF) % len(all)]
 
 
 def on_success(value):
     logger.info(f"{value} successfully published to topic {value.topic}")
 
 
-def on_error(exc):
+def on_error(exc, record: SpooledRecord = None):
     logger.error(f"{exc} occurred while publishing to kafka")
+    if record is None:
+        return None
+    if settings.KAFKA_SPOOL_ENABLED:
+        try:
+            replayer.spool_record(record)
+            kafka_publish_failures.inc(topic=record.topic, outcome="spooled")
+            return None
+        except Exception as spool_exc:
+            logger.error(f"{record.topic} record lost, spooling failed: {spool_exc}")
+    kafka_publish_failures.inc(topic=record.topic, outcome="lost")
+
+
+def connection_config() -> dict:
+    """
+    connection settings shared by every kafka client of the application
+    """
+    return {
+        "bootstrap_servers": settings.KAFKA_BOOTSTRAP_SERVERS.split("|"),
+        "security_protocol": "SASL_PLAINTEXT",
+        "sasl_mechanism": "SCRAM-SHA-256",
+        "sasl_plain_username": settings.KAFKA_SERVER_USERNAME,
+        "sasl_plain_password": settings.KAFKA_SERVER_PASSWORD,
+    }
+
+
+def get_producer() -> KafkaProducer:
+    """
+    return the process wide kafka producer, creating it on first use. a single
+    producer is shared by every publisher so records are batched together
+    (linger_ms/batch_size) instead of opening a new connection per message.
+    """
+    global _producer
+    if _producer is None:
+        with _producer_lock:
+            if _producer is None:
+                _producer = KafkaProducer(
+                    key_serializer=key_serializer,
+                    partitioner=get_partition,
+                    compression_type=settings.KAFKA_COMPRESSION_TYPE,
+                    linger_ms=settings.KAFKA_PRODUCER_LINGER_MS,
+                    batch_size=settings.KAFKA_PRODUCER_BATCH_SIZE,
+                    max_block_ms=settings.KAFKA_PRODUCER_MAX_BLOCK_MS,
+                    **connection_config(),
+                )
+                if settings.KAFKA_SPOOL_ENABLED and os.path.exists(spool.path):
+                    # drain what an earlier process left behind
+                    replayer.start()
+    return _producer
+
+
+def close_producer():
+    """
+    flush pending records and close the process wide producer
+    """
+    global _producer
+    with _producer_lock:
+        if _producer is not None:
+            _producer.close()
+            _producer = None
+
+
+def _reset_producer():
+    # the producer's sockets and sender thread do not survive a fork, so the
+    # child process must build its own producer on first use
+    global _producer, _producer_lock
+    _producer = None
+    _producer_lock = threading.Lock()
+    replayer.reset()
+
+
+def send_spooled(record: SpooledRecord):
+    return get_producer().send(
+        topic=record.topic, value=record.value, key=record.key, headers=record.headers
+    )
+
+
+def flush_producer():
+    get_producer().flush(timeout=settings.KAFKA_SPOOL_REPLAY_TIMEOUT)
+
+
+def spool_backlog() -> int:
+    """
+    the bytes waiting in the spool, read from the file every process shares
+    """
+    if not settings.KAFKA_SPOOL_ENABLED or not os.path.exists(spool.path):
+        return 0
+    try:
+        return spool.pending_bytes()
+    except OSError as exc:
+        logger.warning(f"kafka spool backlog not read: {exc}")
+        return 0
+
+
+spool = KafkaSpool()
+replayer = SpoolReplayer(spool=spool, send=send_spooled, flush=flush_producer)
+kafka_spool_pending_bytes.set_function(spool_backlog)
+
+
+atexit.register(close_producer)
+os.register_at_fork(after_in_child=_reset_producer)
+
+
+def message_headers(codec, schema_version: int) -> List[tuple]:
+    headers = [
+        ("content-type", codec.content_type.encode("UTF-8")),
+        ("schema-version", str(schema_version).encode("UTF-8")),
+    ]
+    traceparent = current_traceparent()
+    if traceparent:
+        headers.append(("traceparent", traceparent.encode("UTF-8")))
+    return headers
 
 
-def publish_to_kafka(topic, value):
+@timed("kafka")
+@traced("kafka.publish", kind="producer")
+def publish_to_kafka(
+    topic, value, key=None, schema_version=1, timeout: Optional[float] = None
+) -> PublishResult:
+    """
+    publish value to topic, encoded with the configured codec. the codec and
+    the schema version of value travel in the record headers so consumers can
+    decode any record. the partition is chosen from the key up front so it can
+    be reported back to the caller. when the broker is unreachable or the
+    producer buffer is full the record is spooled to disk and replayed later.
+    with a timeout the call waits up to timeout seconds for the broker to
+    acknowledge the record instead of returning once it is buffered.
+    """
+    span = current_span()
+    if span is not None:
+        span.set_attribute("messaging.destination", topic)
+    codec = get_codec()
+    record = SpooledRecord(
+        topic=topic,
+        value=codec.encode(value),
+        key=None if key is None else str(key),
+        headers=message_headers(codec, schema_version),
+    )
+    started = time.perf_counter()
     try:
-        producer = KafkaProducer(
-            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS.split("|"),
-            value_serializer=json_serializer,
-            partitioner=get_partition,
-            security_protocol="SASL_PLAINTEXT",
-            sasl_mechanism="SCRAM-SHA-256",
-            sasl_plain_username=settings.KAFKA_SERVER_USERNAME,
-            sasl_plain_password=settings.KAFKA_SERVER_PASSWORD,
-        )
-        producer.send(topic=topic, value=value).add_callback(on_success).add_errback(
-            on_error
-        )
-        return True
+        producer = get_producer()
+        partitions = sorted(producer.partitions_for(topic))
+        partition = get_partition(key_serializer(key), partitions, partitions)
+        future = producer.send(
+            topic=topic,
+            value=record.value,
+            key=key,
+            headers=record.headers,
+            partition=partition,
+        ).add_callback(on_success)
+        if timeout is None:
+            future.add_errback(on_error, record=record)
+        else:
+            # a failed delivery raises here and is spooled below
+            future.get(timeout=timeout)
+        return PublishResult(topic=topic, partition=partition, key=key)
     except KafkaError as exc:
+        if settings.KAFKA_SPOOL_ENABLED:
+            try:
+                replayer.spool_record(record)
+                logger.warning(f"kafka unavailable ({exc}), {topic} record spooled")
+                kafka_publish_failures.inc(topic=topic, outcome="spooled")
+                return PublishResult(topic=topic, partition=None, key=key, spooled=True)
+            except (AppException.InternalServerException, OSError) as spool_exc:
+                logger.error(f"spooling {topic} record failed: {spool_exc}")
+        kafka_publish_failures.inc(topic=topic, outcome="lost")
         raise AppException.InternalServerException(
             error_message=f"KafkaError({exc})"
         ) from exc
+    finally:
+        kafka_publish_duration.observe(time.perf_counter() - started, topic=topic)
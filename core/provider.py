@@ -0,0 +1,146 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import (
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    Optional,
+    Type,
+    TypeVar,
+)
+
+import pinject
+
+T = TypeVar("T")
+
+
+class ProcessSingleton(Generic[T]):
+    """
+    an object built by factory on first use and shared by the threads of the
+    process. a forked child builds its own, the sockets and threads held by
+    the parent's object do not survive the fork.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self._value: Optional[T] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        if self._pid == os.getpid():
+            return self._value
+        with self._lock:
+            if self._pid != os.getpid():
+                self._value = self.factory()
+                self._pid = os.getpid()
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._value = self._pid = None
+
+
+class LoopSingleton(Generic[T]):
+    """
+    an object built by factory for each running event loop. async clients
+    hold connections bound to the loop that opened them, so the event loop of
+    an ASGI worker keeps one for its lifetime. under WSGI the views are served
+    sync (settings.ASYNC_VIEWS), a loop of async_to_sync would build its own.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self._values: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, T]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        loop = asyncio.get_running_loop()
+        value = self._values.get(loop)
+        if value is None:
+            value = self.factory()
+            with self._lock:
+                value = self._values.setdefault(loop, value)
+        return value
+
+
+class LoopLocal:
+    """
+    stands in for the object a LoopSingleton holds for the running event loop
+    """
+
+    def __init__(self, singleton: LoopSingleton):
+        object.__setattr__(self, "_singleton", singleton)
+
+    def __getattr__(self, name: str):
+        return getattr(self._singleton.get(), name)
+
+    def __setattr__(self, name: str, value):
+        setattr(self._singleton.get(), name, value)
+
+    def __delattr__(self, name: str):
+        delattr(self._singleton.get(), name)
+
+    def __repr__(self):
+        return f"<loop local {self._singleton.factory!r}>"
+
+
+class LazyInstance:
+    """
+    stands in for the object provided for cls, resolving it on every attribute
+    access so a fork never leaves it pointing at the parent's object. it
+    reports cls as its class, so isinstance checks see through it.
+    """
+
+    def __init__(self, graph: "LazyObjectGraph", cls: Type):
+        object.__setattr__(self, "_graph", graph)
+        object.__setattr__(self, "_cls", cls)
+
+    def __getattr__(self, name: str):
+        return getattr(self._graph.provide(self._cls), name)
+
+    def __setattr__(self, name: str, value):
+        setattr(self._graph.provide(self._cls), name, value)
+
+    def __delattr__(self, name: str):
+        # mock.patch.object deletes the attribute it set when it exits
+        delattr(self._graph.provide(self._cls), name)
+
+    @property
+    def __class__(self):
+        return self._cls
+
+    def __repr__(self):
+        return f"<lazy {self._cls.__name__}>"
+
+
+class LazyObjectGraph:
+    """
+    a pinject object graph built on first use, providing one instance of each
+    class per process
+    """
+
+    def __init__(self, classes: Iterable[Type], modules=None):
+        self.classes = list(classes)
+        self._graph = ProcessSingleton(
+            lambda: pinject.new_object_graph(modules=modules, classes=self.classes)
+        )
+        self._instances: Dict[Type, ProcessSingleton] = {}
+        self._lock = threading.Lock()
+
+    def provide(self, cls: Type[T]) -> T:
+        instance = self._instances.get(cls)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.setdefault(
+                    cls, ProcessSingleton(lambda: self._graph.get().provide(cls))
+                )
+        return instance.get()
+
+    def lazy(self, cls: Type[T]) -> T:
+        return LazyInstance(self, cls)
@@ -3,9 +3,13 @@ from django.db import models
 
 from core.exceptions import AppException
 from core.interfaces import CrudRepositoryInterface
+from core.metrics import observe_methods, repository_operation_duration
+from core.tracing import traced_methods
 from core.utils import CustomPageNumberPagination
 
 
+@traced_methods(kind="client")
+@observe_methods(repository_operation_duration, owner="repository")
 class SqlBaseRepository(CrudRepositoryInterface):
     model: models.Model
     object_name: str
@@ -58,6 +62,30 @@ class SqlBaseRepository(CrudRepositoryInterface):
         db_obj.save()
         return db_obj
 
+    async def acreate(self, obj_data: dict) -> models.Model:
+        """
+        the async variant of create, for async views
+        """
+
+        model_obj = self.model(**obj_data)  # noqa
+        await model_obj.asave()
+        return model_obj
+
+    async def aupdate_by_id(self, obj_id: str, obj_data: dict) -> models.Model:
+        """
+        the async variant of update_by_id, for async views
+        """
+        assert obj_id, "update_by_id missing  obj_id of object to update"
+        assert obj_data, "update_by_id missing update data of object"
+        assert isinstance(obj_data, dict), "update_by_id parameters not a dict"
+
+        db_obj = await self.afind_by_id(obj_id)
+        for field in obj_data:
+            if hasattr(db_obj, field):
+                setattr(db_obj, field, obj_data[field])
+        await db_obj.asave()
+        return db_obj
+
     def update(self, filter_param: dict, obj_data: dict) -> models.Model:
         """
         :param filter_param {dict}. Parameters to be filtered by model object passed
@@ -72,6 +100,19 @@ class SqlBaseRepository(CrudRepositoryInterface):
             db_obj.save()
         return db_obj
 
+    def update_all(self, filter_param: dict, obj_data: dict) -> int:
+        """
+        updates every object matching filter_param in a single set based query.
+        model save() and signals are bypassed.
+        :param filter_param {dict}. Parameters to be filtered by model object passed
+        :param obj_data: {dict} update data applied to all matching objects
+        :return: {int} the number of updated objects
+        """
+        assert filter_param, "update_all missing filter parameters"
+        assert obj_data, "update_all missing update data of objects"
+
+        return self.model.objects.filter(**filter_param).update(**obj_data)  # noqa
+
     def find_by_id(self, obj_id: str) -> models.Model:
         """
         returns an object matching the specified id if it exists in the database
@@ -85,6 +126,18 @@ class SqlBaseRepository(CrudRepositoryInterface):
                 error_message=f"{self.object_name}({obj_id}) does not exist"
             )
 
+    async def afind_by_id(self, obj_id: str) -> models.Model:
+        """
+        the async variant of find_by_id, for async views
+        """
+
+        try:
+            return await self.model.objects.aget(pk=obj_id)  # noqa
+        except ObjectDoesNotExist:
+            raise AppException.NotFoundException(
+                error_message=f"{self.object_name}({obj_id}) does not exist"
+            )
+
     def find(self, filter_param: dict) -> models.Model:
         """
         This method returns the first object that matches the query parameters specified
@@ -100,6 +153,20 @@ class SqlBaseRepository(CrudRepositoryInterface):
                 error_message=f"{self.object_name}({filter_param}) does not exist"
             )
 
+    async def afind(self, filter_param: dict) -> models.Model:
+        """
+        the async variant of find, for async views
+        """
+        assert filter_param, "find missing filter parameters"
+        assert isinstance(filter_param, dict), "find filter parameters not a dict"
+
+        try:
+            return await self.model.objects.filter(**filter_param).aget()  # noqa
+        except ObjectDoesNotExist:
+            raise AppException.NotFoundException(
+                error_message=f"{self.object_name}({filter_param}) does not exist"
+            )
+
     def find_all(self, filter_param: dict) -> [models.Model]:
         """
         This method returns all objects that matches the query
@@ -1 +1,5 @@
-from .base_serializer import EnumFieldSerializer, PaginatedSerializer
+from .base_serializer import (
+    EnumFieldSerializer,
+    PaginatedSerializer,
+    TimedSerializerMixin,
+)
@@ -1,5 +1,22 @@
 from rest_framework import serializers
 
+from core.instrumentation import timed
+
+
+class TimedSerializerMixin:
+    """
+    adds the time spent validating and representing data to the serializer
+    timing of the current request
+    """
+
+    def run_validation(self, *args, **kwargs):
+        with timed("serializer"):
+            return super().run_validation(*args, **kwargs)
+
+    def to_representation(self, *args, **kwargs):
+        with timed("serializer"):
+            return super().to_representation(*args, **kwargs)
+
 
 class PaginatedSerializer(serializers.Serializer):
     count = serializers.IntegerField()
@@ -1,7 +1,13 @@
+import hashlib
+import ssl
+import time
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
+import certifi
+import httpx
 from django.conf import settings
+from django.core.cache import cache
 from keycloak import (
     KeycloakAdmin,
     KeycloakOpenID,
@@ -10,9 +16,169 @@ from keycloak import (
 from keycloak.exceptions import KeycloakError
 
 from core.exceptions import AppException
+from core.instrumentation import timed_methods
 from core.interfaces import AuthenticationInterface
+from core.metrics import (
+    keycloak_call_duration,
+    keycloak_call_errors,
+    observe_methods,
+)
+from core.provider import LoopLocal, LoopSingleton, ProcessSingleton
+from core.singleflight import SingleFlight
+from core.tracing import traced_methods
+
+
+class CachedKeyKeycloakOpenID(KeycloakOpenID):
+    """
+    a KeycloakOpenID keeping the realm public key decode_token and
+    a_decode_token verify tokens with, instead of fetching it for every
+    token. the workers share the key through the cache and one of them
+    fetches it when it expires.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the key, when it expires and when it was loaded
+        self._public_key = (None, 0.0, 0.0)
+
+    @property
+    def public_key_cache_key(self) -> str:
+        return f"keycloak:{self.realm_name}:public_key"
+
+    def public_key(self) -> str:
+        key, expires_at, _ = self._public_key
+        if key is None or time.monotonic() >= expires_at:
+            key = self.load_public_key()
+        return key
+
+    async def a_public_key(self) -> str:
+        key, expires_at, _ = self._public_key
+        if key is None or time.monotonic() >= expires_at:
+            key = await self.aload_public_key()
+        return key
+
+    def load_public_key(self, stale: Optional[str] = None) -> str:
+        """
+        the key in the cache, unless it is missing or stale, in which case it
+        is fetched from keycloak
+        """
+        return public_key_flight.do(
+            self.realm_name, lambda: self._load_public_key(stale)
+        )
+
+    async def aload_public_key(self, stale: Optional[str] = None) -> str:
+        """
+        the async variant of load_public_key
+        """
+        return await public_key_flight.ado(
+            self.realm_name, lambda: self._aload_public_key(stale)
+        )
+
+    def rotate_public_key(self) -> bool:
+        """
+        refetch the key after a token failed verification with it, the realm
+        keys may have been rotated. tokens with a forged signature make it
+        refetched at most every KEYCLOAK_PUBLIC_KEY_REFRESH_INTERVAL seconds.
+        :return: whether the key changed
+        """
+        key, _, loaded_at = self._public_key
+        if (
+            key is None
+            or time.monotonic() - loaded_at
+            < settings.KEYCLOAK_PUBLIC_KEY_REFRESH_INTERVAL
+        ):
+            return False
+        return self.load_public_key(stale=key) != key
+
+    def _load_public_key(self, stale: Optional[str]) -> str:
+        key = cache.get(self.public_key_cache_key)
+        if key is None or key == stale:
+            key = super().public_key()
+            cache.set(
+                self.public_key_cache_key,
+                key,
+                timeout=settings.KEYCLOAK_PUBLIC_KEY_TIMEOUT,
+            )
+        return self._keep_public_key(key)
+
+    async def _aload_public_key(self, stale: Optional[str]) -> str:
+        key = await cache.aget(self.public_key_cache_key)
+        if key is None or key == stale:
+            key = await super().a_public_key()
+            await cache.aset(
+                self.public_key_cache_key,
+                key,
+                timeout=settings.KEYCLOAK_PUBLIC_KEY_TIMEOUT,
+            )
+        return self._keep_public_key(key)
+
+    def _keep_public_key(self, key: str) -> str:
+        loaded_at = time.monotonic()
+        self._public_key = (
+            key,
+            loaded_at + settings.KEYCLOAK_PUBLIC_KEY_TIMEOUT,
+            loaded_at,
+        )
+        return key
+
+
+def build_async_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(verify=keycloak_ssl_context.get(), retries=1)
+    )
+
 
+def build_keycloak_openid() -> CachedKeyKeycloakOpenID:
+    keycloak = CachedKeyKeycloakOpenID(
+        server_url=settings.KEYCLOAK_SERVER_URL,
+        realm_name=settings.KEYCLOAK_REALM,
+        client_id=settings.KEYCLOAK_CLIENT_ID,
+        client_secret_key=settings.KEYCLOAK_CLIENT_SECRET,
+    )
+    keycloak.connection.async_s = LoopLocal(keycloak_async_client)
+    return keycloak
 
+
+def build_keycloak_admin() -> KeycloakAdmin:
+    keycloak_connection = KeycloakOpenIDConnection(
+        server_url=settings.KEYCLOAK_SERVER_URL,
+        username=settings.KEYCLOAK_ADMIN_USERNAME,
+        password=settings.KEYCLOAK_ADMIN_PASSWORD,
+        realm_name=settings.KEYCLOAK_REALM,
+        client_id=settings.KEYCLOAK_CLIENT_ID,
+        client_secret_key=settings.KEYCLOAK_CLIENT_SECRET,
+    )
+    keycloak_connection.async_s = LoopLocal(keycloak_async_client)
+    # the client that fetches the admin token
+    keycloak_connection.keycloak_openid.connection.async_s = LoopLocal(
+        keycloak_async_client
+    )
+    return KeycloakAdmin(connection=keycloak_connection)
+
+
+# every http client of python-keycloak loads the CA bundle when it is created
+# (~25ms each), the clients are built once per process and shared by every
+# KeycloakAuthService, including the KeycloakAuthentication of each request
+keycloak_openid = ProcessSingleton(build_keycloak_openid)
+keycloak_admin = ProcessSingleton(build_keycloak_admin)
+# the a_* methods of both share an httpx client per event loop, its pooled
+# connections cannot be used from another loop. the clients share the CA
+# bundle loaded once per process.
+keycloak_ssl_context = ProcessSingleton(
+    lambda: ssl.create_default_context(cafile=certifi.where())
+)
+keycloak_async_client = LoopSingleton(build_async_client)
+# identical concurrent calls share one keycloak call, the other workers wait
+# for the first one and find its result in the cache
+public_key_flight = SingleFlight("keycloak_public_key", distributed=True)
+# concurrent refreshes of a token in this process share one keycloak call.
+# the issued tokens are credentials, they are not shared through the cache
+refresh_flight = SingleFlight("keycloak_refresh")
+
+
+@traced_methods(kind="client")
+@observe_methods(keycloak_call_duration, errors=keycloak_call_errors)
+@timed_methods("keycloak")
 @dataclass
 class KeycloakAuthService(AuthenticationInterface):
     """
@@ -21,22 +187,13 @@ class KeycloakAuthService(AuthenticationInterface):
     behalf of the application. Use this class when authenticating an entity.
     """
 
-    def __init__(self):
-        self.keycloak_openid = KeycloakOpenID(
-            server_url=settings.KEYCLOAK_SERVER_URL,
-            realm_name=settings.KEYCLOAK_REALM,
-            client_id=settings.KEYCLOAK_CLIENT_ID,
-            client_secret_key=settings.KEYCLOAK_CLIENT_SECRET,
-        )
-        keycloak_connection = KeycloakOpenIDConnection(
-            server_url=settings.KEYCLOAK_SERVER_URL,
-            username=settings.KEYCLOAK_ADMIN_USERNAME,
-            password=settings.KEYCLOAK_ADMIN_PASSWORD,
-            realm_name=settings.KEYCLOAK_REALM,
-            client_id=settings.KEYCLOAK_CLIENT_ID,
-            client_secret_key=settings.KEYCLOAK_CLIENT_SECRET,
-        )
-        self.keycloak_admin = KeycloakAdmin(connection=keycloak_connection)
+    @property
+    def keycloak_openid(self) -> CachedKeyKeycloakOpenID:
+        return keycloak_openid.get()
+
+    @property
+    def keycloak_admin(self) -> KeycloakAdmin:
+        return keycloak_admin.get()
 
     def get_token(self, obj_data: Dict[str, str]) -> Dict[str, str]:
         """
@@ -52,10 +209,22 @@ class KeycloakAuthService(AuthenticationInterface):
             token_data = self.keycloak_openid.token(
                 username=obj_data.get("username"), password=obj_data.get("password")
             )
-            return {
-                "access_token": token_data.get("access_token"),
-                "refresh_token": token_data.get("refresh_token"),
-            }
+            return self._tokens(token_data)
+        except KeycloakError as exc:
+            raise AppException.InternalServerException(
+                f"{self.exc_message(exc)}"
+            ) from exc
+
+    async def aget_token(self, obj_data: Dict[str, str]) -> Dict[str, str]:
+        """
+        Login to Keycloak and return token, without blocking the event loop.
+        See get_token.
+        """
+        try:
+            token_data = await self.keycloak_openid.a_token(
+                username=obj_data.get("username"), password=obj_data.get("password")
+            )
+            return self._tokens(token_data)
         except KeycloakError as exc:
             raise AppException.InternalServerException(
                 f"{self.exc_message(exc)}"
@@ -71,21 +240,20 @@ class KeycloakAuthService(AuthenticationInterface):
         :rtype: dict[str, str]
         :raises AssertionError: If the refresh token is missing.
         """
-        try:
-            introspection = self.keycloak_openid.introspect(refresh_token)
-            if not introspection.get("active"):
-                raise AppException.BadRequestException(
-                    error_message="refresh token is not active"
-                )
-            token_data = self.keycloak_openid.refresh_token(refresh_token)
-            return {
-                "access_token": token_data.get("access_token"),
-                "refresh_token": token_data.get("refresh_token"),
-            }
-        except KeycloakError as exc:
-            raise AppException.InternalServerException(
-                f"{self.exc_message(exc)}"
-            ) from exc
+        return refresh_flight.do(
+            self._refresh_key(refresh_token),
+            lambda: self._refresh_token(refresh_token),
+        )
+
+    async def arefresh_token(self, refresh_token: str) -> Dict[str, str]:
+        """
+        Refresh the access token using a refresh token, without blocking the
+        event loop. See refresh_token.
+        """
+        return await refresh_flight.ado(
+            self._refresh_key(refresh_token),
+            lambda: self._arefresh_token(refresh_token),
+        )
 
     def create_user(self, obj_data: dict) -> str:
         """
@@ -98,27 +266,19 @@ class KeycloakAuthService(AuthenticationInterface):
         :raises AssertionError: If the request data is missing or not a dict.
         """
         try:
-            data: Dict[str, Any] = {
-                "email": obj_data.get("email"),
-                "username": obj_data.get("username"),
-                "credentials": [
-                    {
-                        "value": obj_data.get("password"),
-                        "type": "password",
-                        "temporary": False,
-                    }
-                ],
-                "enabled": True,
-                "emailVerified": False,
-                "access": {
-                    "manageGroupMembership": True,
-                    "view": True,
-                    "mapRoles": True,
-                    "impersonate": True,
-                    "manage": True,
-                },
-            }
-            return self.keycloak_admin.create_user(data)
+            return self.keycloak_admin.create_user(self._user_payload(obj_data))
+        except KeycloakError as exc:
+            raise AppException.InternalServerException(
+                f"{self.exc_message(exc)}"
+            ) from exc
+
+    async def acreate_user(self, obj_data: dict) -> str:
+        """
+        Create a user in Keycloak without blocking the event loop. See
+        create_user.
+        """
+        try:
+            return await self.keycloak_admin.a_create_user(self._user_payload(obj_data))
         except KeycloakError as exc:
             raise AppException.InternalServerException(
                 f"{self.exc_message(exc)}"
@@ -151,5 +311,101 @@ class KeycloakAuthService(AuthenticationInterface):
                 f"{self.exc_message(exc)}"
             ) from exc
 
+    def get_user_events(self, query: dict = None) -> List[dict]:
+        """
+        Retrieve the user events (e.g VERIFY_EMAIL) recorded by Keycloak.
+
+        :param query: Query parameters such as type, dateFrom, first and max.
+        :type query: dict
+        :return: A list of events, newest first.
+        :rtype: list[dict]
+        """
+        try:
+            return self.keycloak_admin.get_events(query=query)
+        except KeycloakError as exc:
+            raise AppException.InternalServerException(
+                f"{self.exc_message(exc)}"
+            ) from exc
+
+    def get_admin_events(self, query: dict = None) -> List[dict]:
+        """
+        Retrieve the admin events (e.g a user updated from the admin console)
+        recorded by Keycloak.
+
+        :param query: Query parameters such as resourceTypes, dateFrom, first and max.
+        :type query: dict
+        :return: A list of admin events, newest first.
+        :rtype: list[dict]
+        """
+        try:
+            return self.keycloak_admin.get_admin_events(query=query)
+        except KeycloakError as exc:
+            raise AppException.InternalServerException(
+                f"{self.exc_message(exc)}"
+            ) from exc
+
     def exc_message(self, exc):
         return exc.error_message or exc.response_body
+
+    def _refresh_token(self, refresh_token: str) -> Dict[str, str]:
+        try:
+            introspection = self.keycloak_openid.introspect(refresh_token)
+            if not introspection.get("active"):
+                raise AppException.BadRequestException(
+                    error_message="refresh token is not active"
+                )
+            return self._tokens(self.keycloak_openid.refresh_token(refresh_token))
+        except KeycloakError as exc:
+            raise AppException.InternalServerException(
+                f"{self.exc_message(exc)}"
+            ) from exc
+
+    async def _arefresh_token(self, refresh_token: str) -> Dict[str, str]:
+        try:
+            introspection = await self.keycloak_openid.a_introspect(refresh_token)
+            if not introspection.get("active"):
+                raise AppException.BadRequestException(
+                    error_message="refresh token is not active"
+                )
+            return self._tokens(
+                await self.keycloak_openid.a_refresh_token(refresh_token)
+            )
+        except KeycloakError as exc:
+            raise AppException.InternalServerException(
+                f"{self.exc_message(exc)}"
+            ) from exc
+
+    @staticmethod
+    def _refresh_key(refresh_token: str) -> str:
+        # the token itself is a credential, the flight does not hold on to it
+        return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+    @staticmethod
+    def _tokens(token_data: dict) -> Dict[str, str]:
+        return {
+            "access_token": token_data.get("access_token"),
+            "refresh_token": token_data.get("refresh_token"),
+        }
+
+    @staticmethod
+    def _user_payload(obj_data: dict) -> Dict[str, Any]:
+        return {
+            "email": obj_data.get("email"),
+            "username": obj_data.get("username"),
+            "credentials": [
+                {
+                    "value": obj_data.get("password"),
+                    "type": "password",
+                    "temporary": False,
+                }
+            ],
+            "enabled": True,
+            "emailVerified": False,
+            "access": {
+                "manageGroupMembership": True,
+                "view": True,
+                "mapRoles": True,
+                "impersonate": True,
+                "manage": True,
+            },
+        }
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Iterator, Tuple, TypeVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    concurrent calls made with the same key share one call: the first caller
+    makes it and the others wait for its result, or its exception. a
+    distributed flight also holds a lock in the cache while the call is made,
+    the callers of other workers wait for the lock to be released and then
+    make the call themselves, which should find what the first worker cached.
+    """
+
+    poll_interval = 0.005
+    max_poll_interval = 0.1
+
+    def __init__(self, name: str, distributed: bool = False):
+        self.name = name
+        self.distributed = distributed
+        self._calls: Dict[str, Future] = {}
+        self._tasks: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def lock_key(self, key: str) -> str:
+        return f"singleflight:{self.name}:{key}"
+
+    def do(self, key: str, func: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+        try:
+            result = self._call_locked(key, func) if self.distributed else func()
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ado(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        the async variant of do, the calls are shared by the coroutines of
+        the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        flight = (loop, key)
+        task = self._tasks.get(flight)
+        if task is None:
+            call = self._acall_locked(key, func) if self.distributed else func()
+            task = self._tasks[flight] = loop.create_task(call)
+            task.add_done_callback(lambda _: self._tasks.pop(flight, None))
+        # a cancelled caller does not cancel the call the others wait for
+        return await asyncio.shield(task)
+
+    def _call_locked(self, key: str, func: Callable[[], T]) -> T:
+        lock_key, token = self.lock_key(key), uuid.uuid4().hex
+        timeout = settings.SINGLE_FLIGHT_LOCK_TIMEOUT
+        if not cache.add(lock_key, token, timeout=timeout):
+            for interval in self.intervals(timeout):
+                time.sleep(interval)
+                if cache.get(lock_key) is None:
+                    break
+            return func()
+        try:
+            return func()
+        finally:
+            # the lock expired while func ran when it holds another token
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    async def _acall_locked(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        lock_key, token = self.lock_key(key), uuid.uuid4().hex
+        timeout = settings.SINGLE_FLIGHT_LOCK_TIMEOUT
+        if not await cache.aadd(lock_key, token, timeout=timeout):
+            for interval in self.intervals(timeout):
+                await asyncio.sleep(interval)
+                if await cache.aget(lock_key) is None:
+                    break
+            return await func()
+        try:
+            return await func()
+        finally:
+            if await cache.aget(lock_key) == token:
+                await cache.adelete(lock_key)
+
+    def intervals(self, timeout: float) -> Iterator[float]:
+        """
+        the waits between polls of another worker's lock, doubling up to
+        max_poll_interval, for at most timeout seconds. the call is made
+        regardless once the lock outlived them.
+        """
+        deadline = time.monotonic() + timeout
+        interval = self.poll_interval
+        while time.monotonic() < deadline:
+            yield interval
+            interval = min(interval * 2, self.max_poll_interval)
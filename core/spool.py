@@ -0,0 +1,362 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from django.conf import settings
+from kafka.future import Future
+from loguru import logger
+
+from core.exceptions import AppException
+from core.metrics import kafka_spool_replays
+
+MAGIC = b"IAMSPOOL"
+# magic and the offset the next record is written at
+HEADER = struct.Struct(">8sQ")
+# length and crc32 of the record body
+RECORD = struct.Struct(">II")
+CHECKPOINT = struct.Struct(">QI")
+
+
+@dataclass(frozen=True)
+class SpooledRecord:
+    topic: str
+    value: bytes
+    key: Optional[str]
+    headers: List[tuple]
+
+
+def encode_record(record: SpooledRecord) -> bytes:
+    meta = json.dumps(
+        {
+            "t": record.topic,
+            "k": record.key,
+            "h": [[name, value.decode("latin-1")] for name, value in record.headers],
+        },
+        separators=(",", ":"),
+    ).encode("UTF-8")
+    body = struct.pack(">I", len(meta)) + meta + record.value
+    return RECORD.pack(len(body), zlib.crc32(body)) + body
+
+
+def decode_record(body: bytes) -> SpooledRecord:
+    (meta_length,) = struct.unpack_from(">I", body)
+    meta = json.loads(body[4 : 4 + meta_length])
+    return SpooledRecord(
+        topic=meta["t"],
+        value=bytes(body[4 + meta_length :]),
+        key=meta["k"],
+        headers=[(name, value.encode("latin-1")) for name, value in meta["h"]],
+    )
+
+
+class KafkaSpool:
+    """
+    An append-only, memory-mapped file holding the records that could not be
+    handed to Kafka. Records are length prefixed and crc checked, the write
+    offset lives in the file header and is only moved once a record is fully
+    written, so a crash never exposes a torn record. The read offset is kept
+    in a separate checkpoint file that is replaced atomically. The file is
+    shared by every process of the host and guarded by an advisory lock; once
+    everything has been replayed it is rewound to the start. Replays hold a
+    second lock from read to commit, so only the replayer that read the records
+    moves the checkpoint, while appends go on.
+    """
+
+    def __init__(self, path: str = None, capacity: int = None):
+        self._path = path
+        self._capacity = capacity
+        self._map: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path or settings.KAFKA_SPOOL_PATH
+
+    @property
+    def checkpoint_path(self) -> str:
+        return f"{self.path}.checkpoint"
+
+    @property
+    def replay_lock_path(self) -> str:
+        return f"{self.path}.replay"
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity or settings.KAFKA_SPOOL_MAX_BYTES
+
+    def open(self):
+        if self._pid == os.getpid() and self._map is not None:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < self.capacity:
+                os.ftruncate(fd, self.capacity)
+            spool_map = mmap.mmap(fd, os.fstat(fd).st_size)
+            if spool_map[: len(MAGIC)] != MAGIC:
+                spool_map[: HEADER.size] = HEADER.pack(MAGIC, HEADER.size)
+                spool_map.flush()
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd, self._map, self._pid = fd, spool_map, os.getpid()
+        return None
+
+    def close(self):
+        if self._map is not None and self._pid == os.getpid():
+            self._map.close()
+            os.close(self._fd)
+        self._map = self._fd = self._pid = None
+
+    @contextmanager
+    def locked(self):
+        with self._lock:
+            self.open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield self._map
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def replaying(self):
+        """
+        hold the replay lock of the spool, waiting for another process
+        replaying it to finish
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.replay_lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield None
+        finally:
+            os.close(fd)
+
+    def append(self, record: SpooledRecord):
+        data = encode_record(record)
+        with self.locked() as spool_map:
+            tail = self.tail(spool_map)
+            if tail + len(data) > len(spool_map):
+                raise AppException.InternalServerException(
+                    error_message=f"kafka spool {self.path} is full"
+                )
+            spool_map[tail : tail + len(data)] = data
+            spool_map.flush()
+            self.set_tail(spool_map, tail + len(data))
+        return None
+
+    def read(self, limit: int) -> Tuple[List[SpooledRecord], int]:
+        """
+        :return: up to limit records after the checkpoint and the offset to
+        checkpoint once they have been delivered
+        """
+        entries, offset = self.read_entries(limit)
+        return [record for record, _ in entries], offset
+
+    def read_entries(self, limit: int) -> Tuple[List[Tuple[SpooledRecord, int]], int]:
+        """
+        :return: up to limit records after the checkpoint, each with the offset
+        to checkpoint once it has been delivered, and the offset to checkpoint
+        once all of them have been
+        """
+        records = []
+        with self.locked() as spool_map:
+            offset, tail = self.read_checkpoint(), self.tail(spool_map)
+            while offset < tail and len(records) < limit:
+                length, crc = RECORD.unpack_from(spool_map, offset)
+                start, end = offset + RECORD.size, offset + RECORD.size + length
+                body = spool_map[start:end]
+                if end > tail or zlib.crc32(body) != crc:
+                    logger.error(f"corrupt kafka spool record at {offset}, skipped")
+                    offset = tail
+                    break
+                records.append((decode_record(body), end))
+                offset = end
+        return records, offset
+
+    def commit(self, offset: int):
+        """
+        move the checkpoint past the delivered records, rewinding the spool
+        when nothing is left to replay
+        """
+        with self.locked() as spool_map:
+            if offset >= self.tail(spool_map):
+                # the checkpoint is reset before the tail, a crash in between
+                # replays the records again rather than skipping new ones
+                self.write_checkpoint(HEADER.size)
+                self.set_tail(spool_map, HEADER.size)
+            else:
+                self.write_checkpoint(offset)
+        return None
+
+    def pending_bytes(self) -> int:
+        with self.locked() as spool_map:
+            return self.tail(spool_map) - self.read_checkpoint()
+
+    def stats(self) -> dict:
+        """
+        the backlog as the spool file holds it, whichever process wrote it
+        """
+        with self.locked() as spool_map:
+            offset, tail = self.read_checkpoint(), self.tail(spool_map)
+            pending_bytes, pending_records = tail - offset, 0
+            while offset < tail:
+                length, _ = RECORD.unpack_from(spool_map, offset)
+                offset += RECORD.size + length
+                pending_records += 1
+        return {
+            "pending_bytes": pending_bytes,
+            "pending_records": pending_records,
+            "capacity_bytes": self.capacity,
+        }
+
+    # noinspection PyMethodMayBeStatic
+    def tail(self, spool_map: mmap.mmap) -> int:
+        return HEADER.unpack_from(spool_map)[1]
+
+    # noinspection PyMethodMayBeStatic
+    def set_tail(self, spool_map: mmap.mmap, tail: int):
+        spool_map[: HEADER.size] = HEADER.pack(MAGIC, tail)
+        spool_map.flush()
+
+    def read_checkpoint(self) -> int:
+        try:
+            with open(self.checkpoint_path, "rb") as checkpoint_file:
+                data = checkpoint_file.read(CHECKPOINT.size)
+            offset, crc = CHECKPOINT.unpack(data)
+        except (FileNotFoundError, struct.error):
+            return HEADER.size
+        if zlib.crc32(struct.pack(">Q", offset)) != crc:
+            return HEADER.size
+        return offset
+
+    def write_checkpoint(self, offset: int):
+        temporary_path = f"{self.checkpoint_path}.tmp"
+        with open(temporary_path, "wb") as checkpoint_file:
+            checkpoint_file.write(
+                CHECKPOINT.pack(offset, zlib.crc32(struct.pack(">Q", offset)))
+            )
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, self.checkpoint_path)
+        return None
+
+
+class SpoolReplayer:
+    """
+    Drains the spool back to Kafka from a background thread. Every round sends
+    a batch, waits for the producer to flush it and only then moves the
+    checkpoint past the records the broker acknowledged, so records are
+    delivered at least once. While the broker is unavailable the round fails
+    and is retried after the replay interval. The replayed and failed records
+    are counted on /metrics.
+    """
+
+    def __init__(
+        self,
+        spool: KafkaSpool,
+        send: Callable[[SpooledRecord], Future],
+        flush: Callable[[], None],
+    ):
+        self.spool = spool
+        self.send = send
+        self.flush = flush
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def spool_record(self, record: SpooledRecord):
+        self.spool.append(record)
+        self.start()
+        return None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return None
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.run, name="kafka-spool-replayer", daemon=True
+                )
+                self._thread.start()
+        return None
+
+    def run(self):
+        while True:
+            self._wakeup.wait(settings.KAFKA_SPOOL_REPLAY_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self.replay()
+            except Exception as exc:
+                logger.warning(f"kafka spool replay failed, retrying: {exc}")
+
+    def wakeup(self):
+        """
+        replay right away instead of waiting for the end of the interval
+        """
+        self._wakeup.set()
+
+    def replay(self, batch_size: int = None) -> int:
+        """
+        send the spooled records in batches until the spool is empty
+        :return: the number of replayed records
+        """
+        batch_size = batch_size or settings.KAFKA_SPOOL_REPLAY_BATCH
+        replayed = 0
+        with self.spool.replaying():
+            while True:
+                entries, offset = self.spool.read_entries(limit=batch_size)
+                try:
+                    delivered = self.deliver(entries)
+                except Exception:
+                    kafka_spool_replays.inc(len(entries), outcome="failed")
+                    raise
+                if delivered:
+                    kafka_spool_replays.inc(delivered, outcome="replayed")
+                if delivered < len(entries):
+                    kafka_spool_replays.inc(len(entries) - delivered, outcome="failed")
+                    if delivered:
+                        self.spool.commit(entries[delivered - 1][1])
+                    raise AppException.InternalServerException(
+                        error_message="kafka did not acknowledge a spooled record"
+                    )
+                self.spool.commit(offset)
+                replayed += len(entries)
+                if len(entries) < batch_size:
+                    break
+        if replayed:
+            logger.info(f"replayed {replayed} spooled kafka records")
+        return replayed
+
+    def deliver(self, entries: List[Tuple[SpooledRecord, int]]) -> int:
+        """
+        send the records and wait for the broker to acknowledge them
+        :return: how many records, from the first, were delivered
+        """
+        if not entries:
+            return 0
+        futures = [self.send(record) for record, _ in entries]
+        self.flush()
+        for delivered, future in enumerate(futures):
+            try:
+                future.get(timeout=settings.KAFKA_SPOOL_REPLAY_TIMEOUT)
+            except Exception as exc:
+                logger.warning(f"spooled {entries[delivered][0].topic} record: {exc}")
+                return delivered
+        return len(entries)
+
+    def reset(self):
+        # the replayer thread and the spool mapping do not survive a fork
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self.spool.close()
@@ -0,0 +1,60 @@
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase, override_settings, tag
+
+from core.checks import check_optional_packages
+from core.codecs import (
+    JsonCodec,
+    MsgpackCodec,
+    get_codec,
+    get_codec_for,
+)
+from core.codecs.msgpack_codec import msgpack
+from core.exceptions import AppException
+
+
+@tag("core.codecs")
+class TestCodecs(SimpleTestCase):
+    def setUp(self):
+        self.payload = {
+            "user_id": "8b0f4c6e-52a4-4bd1-9b8e-0c2a1e4d5f6a",
+            "recipients": ["test@example.com"],
+            "html_body": "<p>Dear test@example.com</p>",
+            "text_body": None,
+        }
+
+    def test_json_codec(self):
+        codec = JsonCodec()
+        data = codec.encode(self.payload)
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(codec.decode(data), self.payload)
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack_codec(self):
+        codec = MsgpackCodec()
+        data = codec.encode(self.payload)
+        self.assertLess(len(data), len(JsonCodec().encode(self.payload)))
+        self.assertEqual(codec.decode(data), self.payload)
+
+    def test_get_codec(self):
+        self.assertIsInstance(get_codec("json"), JsonCodec)
+        self.assertIs(get_codec("json"), get_codec("json"))
+
+    def test_get_codec_unknown_exc(self):
+        with self.assertRaises(AppException.InternalServerException):
+            get_codec("xml")
+
+    def test_get_codec_for(self):
+        self.assertIsInstance(get_codec_for("application/json"), JsonCodec)
+        self.assertIsInstance(get_codec_for(None), JsonCodec)
+
+    @override_settings(KAFKA_VALUE_CODEC="msgpack")
+    def test_missing_msgpack_fails_the_system_check(self):
+        with mock.patch("core.codecs.msgpack_codec.msgpack", None):
+            errors = check_optional_packages(None)
+        self.assertEqual([error.id for error in errors], ["core.E001"])
+
+    @override_settings(KAFKA_VALUE_CODEC="json")
+    def test_json_codec_needs_no_optional_package(self):
+        with mock.patch("core.codecs.msgpack_codec.msgpack", None):
+            self.assertEqual(check_optional_packages(None), [])
@@ -0,0 +1,129 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings, tag
+from kafka.consumer.fetcher import ConsumerRecord
+from kafka.structs import TopicPartition
+
+from core.consumer import EventConsumer
+from core.event import EventSubscriptionHandler
+from core.producer import PublishResult
+
+
+class RecordingSubscriptionHandler(EventSubscriptionHandler):
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.handled = []
+
+    def handler(self, data: dict):
+        if data.get("id") == self.fail_on:
+            raise ValueError("cannot handle event")
+        self.handled.append(data)
+
+    def handle_batch(self, events):
+        if any(event.get("id") == self.fail_on for event in events):
+            raise ValueError("cannot handle batch")
+        self.handled.extend(events)
+
+
+@tag("core.consumer")
+class TestEventConsumer(SimpleTestCase):
+    def setUp(self):
+        self.partition = TopicPartition("user-deletions", 0)
+        dead_letter_ = mock.patch("core.consumer.publish_to_kafka")
+        self.addCleanup(dead_letter_.stop)
+        self.dead_letter = dead_letter_.start()
+        self.dead_letter.return_value = PublishResult(
+            topic="dead-letter", partition=0, key="key"
+        )
+
+    def record(self, offset, value):
+        return ConsumerRecord(
+            topic=self.partition.topic,
+            partition=self.partition.partition,
+            offset=offset,
+            timestamp=0,
+            timestamp_type=0,
+            key=b"key",
+            value=value,
+            headers=[],
+            checksum=None,
+            serialized_key_size=3,
+            serialized_value_size=len(value),
+            serialized_header_size=0,
+        )
+
+    def consumer(self, handler):
+        return EventConsumer(
+            subscriptions={self.partition.topic: handler},
+            group_id="test",
+            max_poll_records=10,
+            poll_timeout_ms=10,
+            workers=1,
+            dead_letter_topic="dead-letter",
+        )
+
+    def test_process_partition(self):
+        handler = RecordingSubscriptionHandler()
+        records = [self.record(i, json.dumps({"id": i}).encode()) for i in range(3)]
+        result = self.consumer(handler).process_partition(self.partition, records)
+        self.assertTrue(result)
+        self.assertEqual([event.get("id") for event in handler.handled], [0, 1, 2])
+        self.dead_letter.assert_not_called()
+
+    def test_process_partition_dead_letters_failed_records(self):
+        handler = RecordingSubscriptionHandler(fail_on=1)
+        records = [self.record(i, json.dumps({"id": i}).encode()) for i in range(3)]
+        records.append(self.record(3, b"not json"))
+        result = self.consumer(handler).process_partition(self.partition, records)
+        self.assertTrue(result)
+        self.assertEqual([event.get("id") for event in handler.handled], [0, 2])
+        self.assertEqual(self.dead_letter.call_count, 2)
+        dead_lettered = [
+            call.kwargs.get("value").get("offset")
+            for call in self.dead_letter.call_args_list
+        ]
+        self.assertCountEqual(dead_lettered, [1, 3])
+
+    def test_process_partition_dead_letter_failure(self):
+        self.dead_letter.side_effect = Exception("broker unavailable")
+        handler = RecordingSubscriptionHandler(fail_on=0)
+        records = [self.record(0, json.dumps({"id": 0}).encode())]
+        result = self.consumer(handler).process_partition(self.partition, records)
+        self.assertFalse(result)
+
+    def test_process_partition_dead_letter_spooled(self):
+        self.dead_letter.return_value = PublishResult(
+            topic="dead-letter", partition=None, key="key", spooled=True
+        )
+        handler = RecordingSubscriptionHandler(fail_on=0)
+        records = [self.record(0, json.dumps({"id": 0}).encode())]
+        result = self.consumer(handler).process_partition(self.partition, records)
+        self.assertFalse(result)
+        self.assertIsNotNone(self.dead_letter.call_args.kwargs.get("timeout"))
+
+    @override_settings(
+        KAFKA_CONSUMER_RETRY_BACKOFF=1.0, KAFKA_CONSUMER_RETRY_BACKOFF_MAX=3.0
+    )
+    def test_failed_partition_is_rewound_after_a_back_off(self):
+        self.dead_letter.side_effect = Exception("broker unavailable")
+        consumer = self.consumer(RecordingSubscriptionHandler(fail_on=0))
+        consumer.consumer = mock.Mock()
+        batch = {self.partition: [self.record(5, json.dumps({"id": 0}).encode())]}
+        delays = []
+        with mock.patch("core.consumer.time.monotonic", return_value=100.0):
+            for _ in range(3):
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    consumer.process(batch, executor)
+                delays.append(consumer.paused[self.partition] - 100.0)
+            consumer.consumer.seek.assert_called_with(self.partition, 5)
+            consumer.consumer.pause.assert_called_with(self.partition)
+            consumer.resume_due()
+            consumer.consumer.resume.assert_not_called()
+        self.assertEqual(delays, [1.0, 2.0, 3.0])
+        with mock.patch("core.consumer.time.monotonic", return_value=103.0):
+            consumer.resume_due()
+        consumer.consumer.resume.assert_called_once_with(self.partition)
+        self.assertEqual(consumer.paused, {})
+        self.assertEqual(consumer.pending_offsets, {})
@@ -0,0 +1,172 @@
+import json
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings, tag
+
+from core.constants import EmailTemplateEnum, NotificationPriorityEnum
+from core.interfaces.notifications import (
+    NotificationDispatcher,
+    Notifier,
+)
+from core.metrics import notification_jobs, notification_queue_depth
+from core.notifications import (
+    EmailNotificationHandler,
+    SMSNotificationHandler,
+)
+
+
+@tag("core.dispatcher")
+@override_settings(NOTIFICATION_DISPATCH_ASYNC=True)
+class TestNotificationDispatcher(SimpleTestCase):
+    def setUp(self):
+        self.dispatcher = NotificationDispatcher(
+            lanes={
+                "urgent": {"workers": 1, "maxsize": 1, "policy": "block"},
+                "high": {"workers": 1, "maxsize": 1, "policy": "spill"},
+                "low": {"workers": 1, "maxsize": 1, "policy": "drop"},
+            },
+            block_timeout=0.01,
+        )
+        self.addCleanup(self.dispatcher.shutdown)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.jobs_before = notification_jobs.snapshot()
+
+    def jobs(self, lane: str, outcome: str) -> float:
+        """
+        the jobs of the lane with the outcome since the test started
+        """
+        key = json.dumps([lane, outcome])
+        return notification_jobs.snapshot().get(key, 0) - self.jobs_before.get(key, 0)
+
+    def occupy(self, priority: NotificationPriorityEnum):
+        """
+        keep the only worker of a lane busy and fill up its queue
+        """
+        started = threading.Event()
+
+        def blocking_job():
+            started.set()
+            self.release.wait(5)
+
+        self.dispatcher.submit(blocking_job, priority=priority)
+        started.wait(5)
+        self.dispatcher.submit(lambda: None, priority=priority)
+
+    def test_submit_runs_inline_when_not_async(self):
+        done = []
+        with override_settings(NOTIFICATION_DISPATCH_ASYNC=False):
+            self.dispatcher.submit(lambda: done.append(threading.current_thread()))
+        self.assertEqual(done, [threading.current_thread()])
+        self.assertEqual(self.dispatcher.lanes, {})
+        self.assertEqual(notification_jobs.snapshot(), self.jobs_before)
+
+    def test_submit_runs_on_worker(self):
+        done = threading.Event()
+        threads = []
+
+        def job():
+            threads.append(threading.current_thread())
+            done.set()
+
+        self.dispatcher.submit(job, priority=NotificationPriorityEnum.high)
+        self.assertTrue(done.wait(5))
+        self.assertNotEqual(threads, [threading.current_thread()])
+        self.assertEqual(self.jobs("high", "enqueued"), 1)
+
+    def test_urgent_lane_does_not_wait_for_low_lane(self):
+        self.occupy(NotificationPriorityEnum.low)
+        done = threading.Event()
+        self.dispatcher.submit(done.set, priority=NotificationPriorityEnum.urgent)
+        self.assertTrue(done.wait(5))
+        self.assertEqual(notification_queue_depth.snapshot()['["low"]'], 1)
+
+    def test_full_drop_lane_drops(self):
+        self.occupy(NotificationPriorityEnum.low)
+        job = mock.Mock()
+        self.assertFalse(
+            self.dispatcher.submit(job, priority=NotificationPriorityEnum.low)
+        )
+        job.assert_not_called()
+        self.assertEqual(self.jobs("low", "dropped"), 1)
+
+    def test_full_spill_lane_runs_inline(self):
+        self.occupy(NotificationPriorityEnum.high)
+        job = mock.Mock()
+        self.dispatcher.submit(job, priority=NotificationPriorityEnum.high)
+        job.assert_called_once()
+        self.assertEqual(self.jobs("high", "spilled"), 1)
+
+    def test_full_wait_lane_keeps_order(self):
+        dispatcher = NotificationDispatcher(
+            lanes={"high": {"workers": 1, "maxsize": 1, "policy": "wait"}}
+        )
+        self.addCleanup(dispatcher.shutdown)
+        self.dispatcher = dispatcher
+        self.occupy(NotificationPriorityEnum.high)
+        order = []
+        submitted = threading.Thread(
+            target=dispatcher.submit,
+            args=(lambda: order.append("last"),),
+            kwargs={"priority": NotificationPriorityEnum.high},
+        )
+        submitted.start()
+        submitted.join(0.05)
+        self.assertTrue(submitted.is_alive())
+        self.assertEqual(order, [])
+        self.release.set()
+        submitted.join(5)
+        dispatcher.shutdown()
+        self.assertEqual(order, ["last"])
+
+    def test_full_block_lane_runs_inline_after_timeout(self):
+        self.occupy(NotificationPriorityEnum.urgent)
+        job = mock.Mock()
+        self.dispatcher.submit(job, priority=NotificationPriorityEnum.urgent)
+        job.assert_called_once()
+        self.assertEqual(self.jobs("urgent", "spilled"), 1)
+
+    def test_shutdown_drains_lanes(self):
+        lane = self.dispatcher.get_lane(NotificationPriorityEnum.low.value)
+        self.dispatcher.submit(
+            mock.Mock(side_effect=ValueError), priority=NotificationPriorityEnum.low
+        )
+        self.dispatcher.shutdown()
+        self.assertEqual(self.dispatcher.lanes, {})
+        self.assertEqual(self.jobs("low", "failed"), 1)
+        self.assertFalse(any(thread.is_alive() for thread in lane.threads))
+
+    def test_notifier_uses_notification_priority(self):
+        notification = SMSNotificationHandler(recipients="0244000000")
+        with mock.patch(
+            "core.interfaces.notifications.notifier.dispatcher"
+        ) as dispatcher:
+            Notifier().notify(notification)
+        self.assertEqual(
+            dispatcher.submit.call_args.kwargs.get("priority"),
+            NotificationPriorityEnum.urgent,
+        )
+
+    def test_email_priority_follows_template(self):
+        self.assertEqual(
+            EmailNotificationHandler(
+                recipients="user@example.com",
+                template_name=EmailTemplateEnum.otp_code.value,
+            ).priority,
+            NotificationPriorityEnum.urgent,
+        )
+        self.assertEqual(
+            EmailNotificationHandler(
+                recipients="user@example.com",
+                template_name=EmailTemplateEnum.email_verification.value,
+            ).priority,
+            NotificationPriorityEnum.high,
+        )
+        self.assertEqual(
+            EmailNotificationHandler(
+                recipients="user@example.com",
+                template_name=EmailTemplateEnum.password_change.value,
+            ).priority,
+            NotificationPriorityEnum.low,
+        )
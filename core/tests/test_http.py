@@ -0,0 +1,238 @@
+import gzip
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    override_settings,
+    tag,
+)
+from django.urls import resolve, reverse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import BasePermission
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core.http import (
+    CompressionMiddleware,
+    FastJSONParser,
+    FastJSONRenderer,
+    compression,
+    negotiate_encoding,
+)
+from core.http.views import async_api_view
+
+DATA = {
+    "id": uuid.UUID("c7d4f2a8-9e3b-4a41-8d1f-5b6c7e8f9a0b"),
+    "created_at": datetime(2024, 5, 1, 12, 30, 15, 120000, tzinfo=timezone.utc),
+    "balance": Decimal("10.50"),
+    "roles": ["admin", "user"],
+    "bio": "line separator é",
+    "missing": None,
+}
+
+
+@tag("core.http")
+class TestFastJSON(SimpleTestCase):
+    def test_renders_like_drf(self):
+        content = FastJSONRenderer().render(DATA)
+        self.assertEqual(json.loads(content), json.loads(JSONRenderer().render(DATA)))
+        self.assertIn(b'"2024-05-01T12:30:15.120000Z"', content)
+        self.assertIn(b"\\u2028", content)
+
+    def test_falls_back_without_orjson(self):
+        with mock.patch("core.http.renderers.orjson", None):
+            content = FastJSONRenderer().render(DATA)
+        self.assertEqual(content, JSONRenderer().render(DATA))
+
+    def test_indented_json_falls_back(self):
+        content = FastJSONRenderer().render(
+            DATA, "application/json; indent=2", renderer_context={}
+        )
+        self.assertEqual(
+            content,
+            JSONRenderer().render(DATA, "application/json; indent=2", {}),
+        )
+
+    def test_renders_none_as_empty_body(self):
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_parses_like_drf(self):
+        body = json.dumps({"email": "user@example.com", "tags": [1, 2]}).encode()
+        self.assertEqual(
+            FastJSONParser().parse(BytesIO(body)),
+            JSONParser().parse(BytesIO(body)),
+        )
+
+    def test_invalid_json_raises_parse_error(self):
+        with self.assertRaisesMessage(ParseError, "JSON parse error"):
+            FastJSONParser().parse(BytesIO(b'{"email": '))
+
+
+@tag("core.http")
+@override_settings(RESPONSE_COMPRESSION_MIN_BYTES=64)
+class TestCompressionMiddleware(SimpleTestCase):
+    body = json.dumps([{"email": f"user{i}@example.com"} for i in range(20)])
+
+    def respond(self, response=None, **headers):
+        middleware = CompressionMiddleware(
+            lambda request: response
+            or HttpResponse(self.body, content_type="application/json")
+        )
+        return middleware(RequestFactory().get("/", headers=headers))
+
+    def test_gzip(self):
+        response = self.respond(**{"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(gzip.decompress(response.content).decode(), self.body)
+
+    def test_brotli_is_preferred(self):
+        brotli = mock.Mock(compress=lambda content, quality: content[:10])
+        with mock.patch.object(compression, "brotli", brotli):
+            response = self.respond(**{"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response["Content-Encoding"], "br")
+
+    def test_negotiates_quality_values(self):
+        with mock.patch.object(compression, "brotli", mock.Mock()):
+            self.assertEqual(negotiate_encoding("br;q=0.5, gzip"), "gzip")
+            self.assertEqual(negotiate_encoding("*"), "br")
+            self.assertIsNone(negotiate_encoding("identity"))
+            self.assertIsNone(negotiate_encoding("gzip;q=0, br;q=0"))
+        with mock.patch.object(compression, "brotli", None):
+            self.assertEqual(negotiate_encoding("br, gzip;q=0.1"), "gzip")
+            self.assertIsNone(negotiate_encoding("br"))
+
+    def test_small_responses_are_not_compressed(self):
+        with override_settings(RESPONSE_COMPRESSION_MIN_BYTES=len(self.body) + 1):
+            response = self.respond(**{"Accept-Encoding": "gzip"})
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_strong_etag_is_weakened(self):
+        response = HttpResponse(self.body, content_type="application/json")
+        response["ETag"] = '"abc"'
+        response = self.respond(response, **{"Accept-Encoding": "gzip"})
+        self.assertEqual(response["ETag"], 'W/"abc"')
+
+    def test_skipped_responses(self):
+        encoded = HttpResponse(self.body, content_type="application/json")
+        encoded["Content-Encoding"] = "identity"
+        for response in (
+            encoded,
+            HttpResponse(self.body.encode(), content_type="image/png"),
+            StreamingHttpResponse(iter([self.body]), content_type="text/plain"),
+        ):
+            with self.subTest(response=response):
+                compressed = self.respond(response, **{"Accept-Encoding": "gzip"})
+                self.assertNotEqual(compressed.get("Content-Encoding"), "gzip")
+
+    def test_gzip_is_padded(self):
+        lengths = {
+            len(self.respond(**{"Accept-Encoding": "gzip"}).content) for _ in range(5)
+        }
+        self.assertGreater(len(lengths), 1)
+
+    def test_responses_carrying_secrets_are_not_compressed(self):
+        with_cookie = HttpResponse(self.body, content_type="application/json")
+        with_cookie.set_cookie("sessionid", "secret")
+        response = self.respond(with_cookie, **{"Accept-Encoding": "gzip"})
+        self.assertFalse(response.has_header("Content-Encoding"))
+        request = RequestFactory().get("/", headers={"Accept-Encoding": "gzip"})
+        request.resolver_match = resolve(reverse("login_account"))
+        response = CompressionMiddleware(
+            lambda request: HttpResponse(self.body, content_type="application/json")
+        )(request)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_responses_with_tokens_are_not_compressed(self):
+        tokens = {"access_token": "a" * 64, "refresh_token": "r" * 64}
+        response = Response(tokens)
+        response.accepted_renderer = JSONRenderer()
+        response.accepted_media_type = "application/json"
+        response.renderer_context = {}
+        response.render()
+        response = self.respond(response, **{"Accept-Encoding": "gzip"})
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_async_response(self):
+        async def get_response(request):
+            return HttpResponse(self.body, content_type="application/json")
+
+        middleware = CompressionMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(
+            RequestFactory().get("/", headers={"Accept-Encoding": "gzip"})
+        )
+        self.assertEqual(gzip.decompress(response.content).decode(), self.body)
+
+
+class DenyAll(BasePermission):
+    def has_permission(self, request, view):
+        return False
+
+
+@tag("core.http")
+class TestAsyncApiView(SimpleTestCase):
+    def setUp(self):
+        @async_api_view(http_method_names=["POST"])
+        async def echo(request):
+            return Response(data=request.data, status=201)
+
+        self.view = echo
+
+    def call(self, request):
+        return async_to_sync(self.view)(request)
+
+    def test_view_is_a_coroutine_function(self):
+        self.assertTrue(iscoroutinefunction(self.view))
+        self.assertEqual(self.view.cls.__name__, "echo")
+
+    def test_handler_is_awaited(self):
+        response = self.call(
+            RequestFactory().post(
+                "/", data={"name": "iam"}, content_type="application/json"
+            )
+        )
+        response.render()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content), {"name": "iam"})
+
+    def test_method_not_allowed(self):
+        response = self.call(RequestFactory().get("/"))
+        self.assertEqual(response.status_code, 405)
+
+    def test_permissions_are_checked(self):
+        self.view.cls.permission_classes = [DenyAll]
+        response = self.call(
+            RequestFactory().post("/", data={}, content_type="application/json")
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_sync_view_is_served_unless_async_views(self):
+        def sync_echo(request):
+            return Response(data={"sync": True}, status=201)
+
+        async def echo(request):
+            return Response(data={"sync": False}, status=201)
+
+        request = RequestFactory().post("/", data={}, content_type="application/json")
+        with override_settings(ASYNC_VIEWS=False):
+            view = async_api_view(["POST"], sync_view=sync_echo)(echo)
+        self.assertFalse(iscoroutinefunction(view))
+        self.assertEqual(view.cls.__name__, "echo")
+        self.assertEqual(view(request).data, {"sync": True})
+
+        with override_settings(ASYNC_VIEWS=True):
+            view = async_api_view(["POST"], sync_view=sync_echo)(echo)
+        self.assertTrue(iscoroutinefunction(view))
+        self.assertEqual(async_to_sync(view)(request).data, {"sync": False})
@@ -0,0 +1,117 @@
+import json
+
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+    tag,
+)
+from fakeredis import FakeConnection
+from redis import ConnectionPool
+
+from core.instrumentation import (
+    RequestTimingMiddleware,
+    TimedRedis,
+    current_timings,
+    start_request_timing,
+    stop_request_timing,
+    timed,
+    timed_methods,
+)
+from core.instrumentation.timing import query_timer
+
+
+@timed_methods("keycloak")
+class Service:
+    def call(self):
+        return self.nested()
+
+    def nested(self):
+        return "called"
+
+
+@tag("core.instrumentation")
+class TestTiming(SimpleTestCase):
+    def setUp(self):
+        self.timings = start_request_timing()
+        self.addCleanup(stop_request_timing)
+
+    def test_timed_block(self):
+        with timed("redis"):
+            pass
+        with timed("redis"):
+            pass
+        self.assertEqual(self.timings.calls["redis"], 2)
+        self.assertGreaterEqual(self.timings.durations["redis"], 0)
+
+    def test_nested_blocks_are_counted_once(self):
+        self.assertEqual(Service().call(), "called")
+        self.assertEqual(self.timings.calls, {"keycloak": 1})
+
+    def test_timed_outside_request(self):
+        stop_request_timing()
+        with timed("redis"):
+            pass
+        self.assertIsNone(current_timings())
+        self.assertEqual(self.timings.calls, {})
+
+    def test_timed_redis(self):
+        client = TimedRedis(
+            connection_pool=ConnectionPool(connection_class=FakeConnection)
+        )
+        client.set("key", "value")
+        self.assertEqual(client.get("key"), b"value")
+        self.assertEqual(self.timings.calls["redis"], 2)
+
+
+@tag("core.instrumentation")
+class TestRequestTimingMiddleware(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/api/v1/accounts")
+
+    def view(self, request):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        with timed("keycloak"):
+            pass
+        return HttpResponse(status=200)
+
+    def line(self, logs) -> dict:
+        self.assertEqual(len(logs.records), 1)
+        return json.loads(logs.records[0].getMessage())
+
+    def test_connections_opened_in_a_request_are_timed(self):
+        opened = connections.create_connection("default")
+        self.addCleanup(opened.close)
+        opened.ensure_connection()
+        self.assertIn(query_timer, opened.execute_wrappers)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request_is_broken_down(self):
+        with self.assertLogs("core.request_timing") as logs:
+            RequestTimingMiddleware(self.view)(self.request)
+        line = self.line(logs)
+        self.assertEqual(line["path"], "/api/v1/accounts")
+        self.assertEqual(line["status"], 200)
+        self.assertTrue(line["sampled"])
+        self.assertEqual(line["db_calls"], 1)
+        self.assertEqual(line["keycloak_calls"], 1)
+        self.assertEqual(line["kafka_calls"], 0)
+        self.assertGreaterEqual(line["total_ms"], line["db_ms"])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0, REQUEST_TIMING_SLOW_MS=0)
+    def test_slow_request_is_logged_without_breakdown(self):
+        with self.assertLogs("core.request_timing") as logs:
+            RequestTimingMiddleware(self.view)(self.request)
+        line = self.line(logs)
+        self.assertFalse(line["sampled"])
+        self.assertNotIn("db_ms", line)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0, REQUEST_TIMING_SLOW_MS=None)
+    def test_unsampled_request_is_not_logged(self):
+        with self.assertNoLogs("core.request_timing"):
+            RequestTimingMiddleware(self.view)(self.request)
+        self.assertIsNone(current_timings())
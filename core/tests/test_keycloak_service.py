@@ -0,0 +1,115 @@
+import base64
+import threading
+from unittest import mock
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings, tag
+from jwcrypto.jws import InvalidJWSSignature
+
+from core.services import KeycloakAuthService
+from core.services.keycloak_service import build_keycloak_openid
+from core.utils import KeycloakAuthentication
+from tests.query_budget import KeycloakStub
+
+
+@tag("core.keycloak")
+class TestKeycloakService(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.keycloak = KeycloakStub()
+        installed = self.keycloak.installed()
+        installed.__enter__()
+        self.addCleanup(installed.__exit__, None, None, None)
+        self.keycloak_openid = build_keycloak_openid()
+        keycloak_openid = mock.patch.object(
+            KeycloakAuthService,
+            "keycloak_openid",
+            new_callable=mock.PropertyMock,
+            return_value=self.keycloak_openid,
+        )
+        keycloak_openid.start()
+        self.addCleanup(keycloak_openid.stop)
+
+    def key_fetches(self) -> int:
+        return sum(call.startswith("GET ") for call in self.keycloak.calls)
+
+    def rotate_realm_key(self):
+        self.keycloak.private_key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        )
+        self.keycloak.public_key = base64.b64encode(
+            self.keycloak.private_key.public_key().public_bytes(
+                serialization.Encoding.DER,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+        ).decode()
+
+    def test_public_key_is_fetched_once(self):
+        token = self.keycloak.issue_tokens("account")["access_token"]
+        for _ in range(3):
+            self.assertEqual(
+                KeycloakAuthentication().verify_token(token)["sub"], "account"
+            )
+        # another worker finds it in the cache
+        build_keycloak_openid().public_key()
+        self.assertEqual(self.key_fetches(), 1)
+
+    async def test_async_public_key_is_fetched_once(self):
+        token = self.keycloak.issue_tokens("account")["access_token"]
+        for _ in range(3):
+            decoded = await self.keycloak_openid.a_decode_token(token)
+            self.assertEqual(decoded["sub"], "account")
+        # another worker finds it in the cache
+        await build_keycloak_openid().a_public_key()
+        self.assertEqual(self.key_fetches(), 1)
+
+    @override_settings(KEYCLOAK_PUBLIC_KEY_REFRESH_INTERVAL=0)
+    def test_public_key_is_refetched_after_a_rotation(self):
+        self.keycloak_openid.public_key()
+        self.rotate_realm_key()
+        token = self.keycloak.issue_tokens("account")["access_token"]
+        self.assertEqual(KeycloakAuthentication().verify_token(token)["sub"], "account")
+        self.assertEqual(self.key_fetches(), 2)
+
+    def test_public_key_refetches_are_rate_limited(self):
+        self.keycloak_openid.public_key()
+        self.rotate_realm_key()
+        token = self.keycloak.issue_tokens("account")["access_token"]
+        with self.assertRaises(InvalidJWSSignature):
+            KeycloakAuthentication().verify_token(token)
+        self.assertEqual(self.key_fetches(), 1)
+
+    def test_concurrent_refreshes_share_one_call(self):
+        refresh_token = self.keycloak.issue_tokens("account")["refresh_token"]
+        release = threading.Event()
+        introspect = self.keycloak.introspect
+
+        def slow_introspect(*args):
+            release.wait(5)
+            return introspect(*args)
+
+        self.keycloak.routes = [
+            (method, pattern, slow_introspect if view == introspect else view)
+            for method, pattern, view in self.keycloak.routes
+        ]
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    KeycloakAuthService().refresh_token(refresh_token)
+                )
+            )
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        threading.Timer(0.1, release.set).start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.keycloak.calls), 2)
+        self.assertTrue(all(result == results[0] for result in results))
+        # the issued tokens are not kept, a retry refreshes again
+        KeycloakAuthService().refresh_token(refresh_token)
+        self.assertEqual(len(self.keycloak.calls), 4)
@@ -0,0 +1,117 @@
+import logging
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from django.core import mail
+from django.test import SimpleTestCase, override_settings, tag
+
+from core.log import AsyncQueueHandler, BatchedFileHandler, MailHandler
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.records.append(record)
+        self.threads.add(threading.current_thread())
+
+
+@tag("core.log")
+class TestAsyncQueueHandler(SimpleTestCase):
+    def setUp(self):
+        self.target = RecordingHandler()
+        self.target.set_name("test_recording_handler")
+        self.addCleanup(self.target.close)
+        self.logger = logging.getLogger("core.tests.test_log")
+        self.logger.propagate = False
+        self.addCleanup(setattr, self.logger, "propagate", True)
+
+    def handler(self, **kwargs) -> AsyncQueueHandler:
+        handler = AsyncQueueHandler(handlers=["test_recording_handler"], **kwargs)
+        self.addCleanup(handler.close)
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+        return handler
+
+    def test_records_are_handled_on_listener_thread(self):
+        handler = self.handler()
+        arguments = ["a"]
+        self.logger.warning("record %s", arguments)
+        arguments.append("b")
+        handler.stop()
+        self.assertEqual(
+            [record.getMessage() for record in self.target.records],
+            ["record ['a']"],
+        )
+        self.assertNotIn(threading.current_thread(), self.target.threads)
+
+    def test_full_queue_drops_records(self):
+        handler = self.handler(maxsize=2)
+        with mock.patch.object(handler, "start"):
+            for index in range(5):
+                self.logger.warning("record %s", index)
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual(handler.queue.qsize(), 2)
+
+    def test_unknown_target_handler(self):
+        handler = AsyncQueueHandler(handlers=["missing_handler"])
+        with self.assertRaises(ValueError):
+            handler.start()
+
+
+@tag("core.log")
+class TestBatchedFileHandler(SimpleTestCase):
+    def test_writes_are_flushed_per_batch(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = Path(directory) / "access.log"
+        handler = BatchedFileHandler(filename=str(path), when="D")
+        self.addCleanup(handler.close)
+        handler.emit(logging.makeLogRecord({"msg": "access"}))
+        handler.flush()
+        self.assertEqual(path.read_text(), "")
+        handler.flush_batch()
+        self.assertEqual(path.read_text(), "access\n")
+
+
+@tag("core.log")
+@override_settings(ADMINS=[("admin", "admin@example.com")])
+class TestMailHandler(SimpleTestCase):
+    def record(self, message: str) -> logging.LogRecord:
+        return logging.makeLogRecord(
+            {"msg": message, "levelname": "ERROR", "levelno": logging.ERROR}
+        )
+
+    def test_records_are_mailed_as_digest(self):
+        handler = MailHandler(interval=60, max_records=2)
+        for index in range(3):
+            handler.handle(self.record(f"error {index}"))
+        self.assertEqual(len(mail.outbox), 0)
+        handler.flush()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("3 record(s) logged", mail.outbox[0].subject)
+        self.assertIn("error 1", mail.outbox[0].body)
+        self.assertIn("and 1 more", mail.outbox[0].body)
+
+    def test_digest_is_sent_once_per_interval(self):
+        handler = MailHandler(interval=60)
+        handler.handle(self.record("error"))
+        handler.flush()
+        handler.handle(self.record("error"))
+        handler.flush()
+        self.assertEqual(len(mail.outbox), 1)
+        handler.close()
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_first_digest_is_sent_right_after_boot(self):
+        handler = MailHandler(interval=60)
+        handler.handle(self.record("error"))
+        with mock.patch("core.log.time.monotonic", return_value=5.0):
+            handler.flush()
+        self.assertEqual(len(mail.outbox), 1)
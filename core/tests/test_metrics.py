@@ -0,0 +1,163 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    override_settings,
+    tag,
+)
+
+from core.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsMiddleware,
+    http_request_duration,
+    metrics_view,
+    observe_methods,
+    password_hash_duration,
+)
+from core.metrics.registry import Registry
+
+
+@tag("core.metrics")
+class TestRegistry(SimpleTestCase):
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = self.registry.register(
+            Counter("requests", "requests handled", labels=("route",))
+        )
+        self.histogram = self.registry.register(
+            Histogram("latency_seconds", "latency", buckets=(0.1, 1.0))
+        )
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_exposition(self):
+        self.counter.inc(route="accounts/")
+        self.counter.inc(2, route="accounts/")
+        self.histogram.observe(0.05)
+        self.histogram.observe(0.5)
+        self.histogram.observe(5)
+        exposition = self.registry.expose()
+        self.assertIn("# TYPE requests counter", exposition)
+        self.assertIn('requests_total{route="accounts/"} 3.0', exposition)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', exposition)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 2', exposition)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', exposition)
+        self.assertIn("latency_seconds_count 3", exposition)
+        self.assertIn("latency_seconds_sum 5.55", exposition)
+
+    def test_gauge_exposition(self):
+        gauge = self.registry.register(Gauge("depth", "queue depth", labels=("lane",)))
+        gauge.set(3, lane="low")
+        gauge.set(1, lane="low")
+        exposition = self.registry.expose()
+        self.assertIn("# TYPE depth gauge", exposition)
+        self.assertIn('depth{lane="low"} 1.0', exposition)
+
+    def test_gauge_function_is_read_on_collect_only(self):
+        gauge = self.registry.register(Gauge("backlog", "spooled bytes"))
+        gauge.set_function(lambda: 42)
+        self.assertIn("backlog 42.0", self.registry.expose())
+        with override_settings(METRICS_DIR=self.directory):
+            self.registry.write()
+            with open(self.registry.snapshot_path()) as snapshot_file:
+                self.assertNotIn("backlog", json.load(snapshot_file))
+
+    def test_label_values_are_escaped(self):
+        self.counter.inc(route='say "hi"\n')
+        self.assertIn('requests_total{route="say \\"hi\\"\\n"}', self.registry.expose())
+
+    def test_snapshots_of_other_processes_are_merged(self):
+        self.counter.inc(route="accounts/")
+        with override_settings(METRICS_DIR=self.directory):
+            other = Registry()
+            other.register(Counter("requests", "requests", labels=("route",)))
+            other.metrics["requests"].inc(route="accounts/")
+            other.metrics["requests"].inc(route="login/")
+            with open(os.path.join(self.directory, "metrics-1.json"), "w") as file:
+                json.dump(other.snapshot(), file)
+            samples = self.registry.collect()["requests"]
+        self.assertEqual(samples, {'["accounts/"]': 2.0, '["login/"]': 1.0})
+
+    def test_own_snapshot_is_not_counted_twice(self):
+        self.counter.inc(route="accounts/")
+        with override_settings(METRICS_DIR=self.directory):
+            self.registry.write()
+            samples = self.registry.collect()["requests"]
+        self.assertEqual(samples, {'["accounts/"]': 1.0})
+
+    def test_expired_snapshots_are_dropped(self):
+        path = os.path.join(self.directory, "metrics-1.json")
+        with open(path, "w") as file:
+            json.dump({"requests": {'["accounts/"]': 1.0}}, file)
+        os.utime(path, (time.time() - 7200, time.time() - 7200))
+        with override_settings(METRICS_DIR=self.directory, METRICS_RETENTION=3600):
+            self.assertEqual(self.registry.collect()["requests"], {})
+        self.assertFalse(os.path.exists(path))
+
+    def test_observe_methods(self):
+        errors = Counter("errors", "errors", labels=("method", "exception"))
+
+        @observe_methods(self.histogram, errors=errors)
+        class Service:
+            def call(self):
+                raise ValueError
+
+        with self.assertRaises(ValueError):
+            Service().call()
+        self.assertEqual(errors.snapshot(), {'["call", "ValueError"]': 1.0})
+        self.assertEqual(list(self.histogram.snapshot().values())[0][-1], 1)
+
+
+@tag("core.metrics")
+class TestMetricsEndpoint(SimpleTestCase):
+    def test_middleware_observes_route(self):
+        request = RequestFactory().get("/unknown")
+        MetricsMiddleware(lambda request: HttpResponse(status=404))(request)
+        self.assertIn(
+            '["GET", "unmatched", "404"]', http_request_duration.snapshot().keys()
+        )
+
+    @override_settings(METRICS_AUTH_TOKEN="secret")
+    def test_metrics_view(self):
+        response = metrics_view(
+            RequestFactory().get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            b"# TYPE http_request_duration_seconds histogram", response.content
+        )
+
+    @override_settings(METRICS_AUTH_TOKEN="secret")
+    def test_metrics_view_requires_token(self):
+        self.assertEqual(
+            metrics_view(RequestFactory().get("/metrics")).status_code, 403
+        )
+        response = metrics_view(
+            RequestFactory().get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_view_is_disabled_without_token(self):
+        self.assertEqual(
+            metrics_view(RequestFactory().get("/metrics")).status_code, 404
+        )
+
+    def test_password_hashing_is_observed(self):
+        before = password_hash_duration.snapshot()
+        encoded = make_password("password")
+        self.assertTrue(check_password("password", encoded))
+        after = password_hash_duration.snapshot()
+        for operation in ("encode", "verify"):
+            key = json.dumps([operation])
+            self.assertEqual(
+                after[key][-1] - before.get(key, [0] * 15)[-1], 1, operation
+            )
@@ -0,0 +1,112 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, tag
+
+from core.interfaces.notifications import Notifier
+from core.notifications import (
+    EmailNotificationHandler,
+    SMSNotificationHandler,
+)
+
+
+@tag("core.notifier")
+class TestNotifier(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        send_ = mock.patch.object(Notifier, "send_notification")
+        self.addCleanup(send_.stop)
+        dispatcher_ = mock.patch("core.interfaces.notifications.notifier.dispatcher")
+        self.addCleanup(dispatcher_.stop)
+        self.dispatcher = dispatcher_.start()
+        self.notifier = Notifier()
+
+    def email(self, recipients="user@example.com", template_name="otp.html"):
+        return EmailNotificationHandler(
+            recipients=recipients, template_name=template_name, dedupe_window=60
+        )
+
+    def test_duplicate_is_suppressed(self):
+        notification_id = self.notifier.notify(self.email())
+        self.assertEqual(self.notifier.notify(self.email()), notification_id)
+        self.dispatcher.submit.assert_called_once()
+
+    def test_pending_notification(self):
+        notification_id = self.notifier.notify(self.email())
+        self.assertEqual(
+            self.notifier.pending_notification(
+                EmailNotificationHandler.template_key(
+                    recipients="user@example.com", template_name="otp.html"
+                )
+            ),
+            notification_id,
+        )
+
+    def test_distinct_notifications_are_sent(self):
+        self.notifier.notify(self.email())
+        self.notifier.notify(self.email(recipients="other@example.com"))
+        self.notifier.notify(self.email(template_name="verification.html"))
+        self.notifier.notify(
+            SMSNotificationHandler(
+                recipients="user@example.com",
+                template_name="otp.html",
+                dedupe_window=60,
+            )
+        )
+        self.assertEqual(self.dispatcher.submit.call_count, 4)
+
+    def test_notifications_without_window_are_not_deduplicated(self):
+        for _ in range(2):
+            self.notifier.notify(
+                EmailNotificationHandler(
+                    recipients="user@example.com", template_name="otp.html"
+                )
+            )
+        self.assertEqual(self.dispatcher.submit.call_count, 2)
+
+    def test_expired_window_sends_again(self):
+        self.notifier.notify(self.email())
+        cache.clear()
+        self.notifier.notify(self.email())
+        self.assertEqual(self.dispatcher.submit.call_count, 2)
+
+    def test_otp_codes_are_not_deduplicated(self):
+        for code in ("123456", "654321"):
+            self.notifier.notify(
+                EmailNotificationHandler(
+                    recipients="user@example.com",
+                    template_name="otp.html",
+                    dedupe_window=60,
+                    dedupe_payload=code,
+                )
+            )
+        self.assertEqual(self.dispatcher.submit.call_count, 2)
+
+    def test_sms_otp_codes_are_not_deduplicated(self):
+        for code in ("123456", "654321", "654321"):
+            self.notifier.notify(
+                SMSNotificationHandler(
+                    recipients="0244000000",
+                    template_name="otp.txt",
+                    dedupe_window=60,
+                    dedupe_payload=code,
+                )
+            )
+        self.assertEqual(self.dispatcher.submit.call_count, 2)
+
+    def test_dropped_notification_is_not_deduplicated(self):
+        self.dispatcher.submit.return_value = False
+        self.notifier.notify(self.email())
+        self.notifier.notify(self.email())
+        self.assertEqual(self.dispatcher.submit.call_count, 2)
+
+    def test_failed_notification_is_not_deduplicated(self):
+        self.notifier.notify(self.email())
+        job = self.dispatcher.submit.call_args.args[0]
+        with mock.patch.object(
+            EmailNotificationHandler, "send", side_effect=ValueError("unavailable")
+        ):
+            with self.assertRaises(ValueError):
+                job()
+        self.notifier.notify(self.email())
+        self.assertEqual(self.dispatcher.submit.call_count, 2)
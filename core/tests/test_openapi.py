@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+import yaml
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings, tag
+from django.urls import reverse
+from rest_framework import status
+
+from core.openapi import CachedSchema, cached_schema
+
+
+@tag("core.openapi")
+class TestOpenApiSchema(SimpleTestCase):
+    def setUp(self):
+        cached_schema.reset()
+        self.addCleanup(cached_schema.reset)
+
+    def test_schema_view(self):
+        response = self.client.get(reverse("schema"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/vnd.oai.openapi")
+        self.assertIn(
+            "/api/v1/account/detail/", yaml.safe_load(response.content)["paths"]
+        )
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertIn("max-age=", response["Cache-Control"])
+
+    def test_schema_view_json(self):
+        response = self.client.get(f"{reverse('schema')}?format=json")
+        self.assertEqual(response["Content-Type"], "application/vnd.oai.openapi+json")
+        self.assertIn("/api/v1/account/detail/", json.loads(response.content)["paths"])
+
+    def test_schema_view_not_modified(self):
+        etag = self.client.get(reverse("schema"))["ETag"]
+        response = self.client.get(reverse("schema"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_schema_view_gzip(self):
+        plain = self.client.get(reverse("schema"))
+        response = self.client.get(
+            reverse("schema"), headers={"Accept-Encoding": "gzip, deflate"}
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["ETag"], plain["ETag"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+
+    def test_schema_generated_without_artifact(self):
+        schema = CachedSchema(path=os.path.join(tempfile.mkdtemp(), "missing.yaml"))
+        document = schema.get("yaml")
+        self.assertEqual(document.content, cached_schema.get("yaml").content)
+
+    def test_openapi_schema_command_check(self):
+        output = StringIO()
+        call_command("openapi_schema", "--check", stdout=output)
+        self.assertIn("is up to date", output.getvalue())
+
+    def test_openapi_schema_command_write(self):
+        path = os.path.join(tempfile.mkdtemp(), "openapi.yaml")
+        with open(path, "w") as artifact:
+            artifact.write("openapi: 3.0.3\n")
+        with self.assertRaises(CommandError):
+            call_command("openapi_schema", "--path", path, "--check", stdout=StringIO())
+        output = StringIO()
+        call_command("openapi_schema", "--path", path, "--write", stdout=output)
+        self.assertIn("+info:", output.getvalue())
+        with override_settings(OPENAPI_SCHEMA_PATH=path):
+            call_command("openapi_schema", "--check", stdout=StringIO())
@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, tag
+
+from core.producer import PublishResult, get_partition, publish_to_kafka
+
+
+@tag("core.producer")
+class TestProducer(SimpleTestCase):
+    def setUp(self):
+        self.partitions = list(range(12))
+        producer_ = mock.patch("core.producer.get_producer")
+        self.addCleanup(producer_.stop)
+        self.producer = producer_.start().return_value
+        self.producer.partitions_for.return_value = set(self.partitions)
+
+    def test_get_partition_is_stable_per_key(self):
+        partition = get_partition(b"account-id", self.partitions, self.partitions)
+        self.assertIn(partition, self.partitions)
+        for _ in range(5):
+            self.assertEqual(
+                get_partition(b"account-id", self.partitions, self.partitions),
+                partition,
+            )
+
+    def test_get_partition_spreads_keys(self):
+        used = {
+            get_partition(f"user{i}@example.com".encode(), self.partitions, [])
+            for i in range(500)
+        }
+        self.assertEqual(used, set(self.partitions))
+
+    def test_get_partition_without_key(self):
+        self.assertIn(get_partition(None, self.partitions, [3]), [3])
+
+    def test_publish_to_kafka(self):
+        result = publish_to_kafka(topic="email", value={}, key="account-id")
+        self.assertIsInstance(result, PublishResult)
+        self.assertEqual(
+            result.partition,
+            get_partition(b"account-id", self.partitions, self.partitions),
+        )
+        self.assertEqual(
+            self.producer.send.call_args.kwargs.get("partition"), result.partition
+        )
+        self.assertEqual(self.producer.send.call_args.kwargs.get("key"), "account-id")
+
+    def test_publish_to_kafka_headers(self):
+        publish_to_kafka(topic="email", value={"otp": "1"}, schema_version=2)
+        send = self.producer.send.call_args.kwargs
+        self.assertEqual(
+            dict(send.get("headers")),
+            {"content-type": b"application/json", "schema-version": b"2"},
+        )
+        self.assertEqual(send.get("value"), b'{"otp":"1"}')
+
+    def test_publish_to_kafka_waits_for_the_broker(self):
+        future = self.producer.send.return_value.add_callback.return_value
+        publish_to_kafka(topic="email", value={}, timeout=5)
+        future.get.assert_called_once_with(timeout=5)
+        future.add_errback.assert_not_called()
@@ -0,0 +1,91 @@
+import asyncio
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase, tag
+
+from core.provider import (
+    LazyObjectGraph,
+    LoopLocal,
+    LoopSingleton,
+    ProcessSingleton,
+)
+from core.services import KeycloakAuthService
+from core.utils import KeycloakAuthentication
+
+
+class Repository:
+    def __init__(self):
+        self.items = []
+
+
+class Controller:
+    def __init__(self, repository: Repository):
+        self.repository = repository
+
+    def count(self):
+        return len(self.repository.items)
+
+
+@tag("core.provider")
+class TestProvider(SimpleTestCase):
+    def test_process_singleton_is_built_once(self):
+        factory = mock.Mock(side_effect=object)
+        singleton = ProcessSingleton(factory)
+        self.assertIs(singleton.get(), singleton.get())
+        factory.assert_called_once()
+
+    def test_process_singleton_is_rebuilt_after_fork(self):
+        singleton = ProcessSingleton(object)
+        parent = singleton.get()
+        with mock.patch("core.provider.os.getpid", return_value=os.getpid() + 1):
+            child = singleton.get()
+            self.assertIs(singleton.get(), child)
+        self.assertIsNot(child, parent)
+
+    def test_loop_singleton_is_built_per_loop(self):
+        singleton = LoopSingleton(mock.Mock)
+
+        async def get():
+            first, second = singleton.get(), LoopLocal(singleton).return_value
+            self.assertIs(first.return_value, second)
+            return first
+
+        self.assertIsNot(asyncio.run(get()), asyncio.run(get()))
+        with self.assertRaises(RuntimeError):
+            singleton.get()  # no running loop
+
+    def test_graph_is_built_on_first_use(self):
+        with mock.patch("core.provider.pinject.new_object_graph") as new_graph:
+            graph = LazyObjectGraph(classes=[Controller, Repository])
+            controller = graph.lazy(Controller)
+            new_graph.assert_not_called()
+            controller.count()
+        new_graph.assert_called_once()
+
+    def test_graph_provides_one_instance_per_class(self):
+        graph = LazyObjectGraph(classes=[Controller, Repository])
+        controller = graph.lazy(Controller)
+        self.assertIs(graph.provide(Controller), graph.provide(Controller))
+        self.assertIs(controller.repository, graph.provide(Controller).repository)
+        controller.repository.items.append(1)
+        self.assertEqual(controller.count(), 1)
+
+    def test_lazy_instance_can_be_patched(self):
+        graph = LazyObjectGraph(classes=[Controller, Repository])
+        controller = graph.lazy(Controller)
+        self.assertIsInstance(controller, Controller)
+        with mock.patch.object(controller, "count", return_value=5):
+            self.assertEqual(controller.count(), 5)
+        self.assertEqual(controller.count(), 0)
+        self.assertNotIn("count", vars(graph.provide(Controller)))
+
+    def test_keycloak_clients_are_shared(self):
+        self.assertIs(
+            KeycloakAuthentication().keycloak_openid,
+            KeycloakAuthService().keycloak_openid,
+        )
+        self.assertIs(
+            KeycloakAuthentication().keycloak_admin,
+            KeycloakAuthService().keycloak_admin,
+        )
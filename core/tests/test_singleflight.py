@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings, tag
+
+from core.singleflight import SingleFlight
+
+
+@tag("core.singleflight")
+class TestSingleFlight(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def concurrently(self, call, callers: int = 8) -> list:
+        results = [None] * callers
+
+        def run(index):
+            try:
+                results[index] = call()
+            except Exception as exc:
+                results[index] = exc
+
+        threads = [
+            threading.Thread(target=run, args=(index,)) for index in range(callers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def blocking(self, result):
+        """
+        a call that waits until every caller joined it
+        """
+        released = threading.Event()
+        func = mock.Mock(side_effect=lambda: released.wait(5) and result)
+        threading.Timer(0.1, released.set).start()
+        return func
+
+    def test_concurrent_calls_are_shared(self):
+        flight = SingleFlight("test")
+        func = self.blocking({"id": 1})
+        results = self.concurrently(lambda: flight.do("key", func))
+        func.assert_called_once()
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight._calls, {})
+
+    def test_exceptions_are_shared(self):
+        flight = SingleFlight("test")
+        released = threading.Event()
+
+        def fail():
+            released.wait(5)
+            raise ValueError("unavailable")
+
+        func = mock.Mock(side_effect=fail)
+        threading.Timer(0.1, released.set).start()
+        results = self.concurrently(lambda: flight.do("key", func))
+        func.assert_called_once()
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_keys_are_not_shared(self):
+        flight = SingleFlight("test")
+        func = mock.Mock(side_effect=lambda: "result")
+        flight.do("first", func)
+        flight.do("second", func)
+        flight.do("first", func)
+        self.assertEqual(func.call_count, 3)
+
+    def test_distributed_call_holds_a_lock(self):
+        flight = SingleFlight("test", distributed=True)
+
+        def func():
+            self.assertIsNotNone(cache.get(flight.lock_key("key")))
+            return "result"
+
+        self.assertEqual(flight.do("key", func), "result")
+        self.assertIsNone(cache.get(flight.lock_key("key")))
+
+    def test_distributed_call_waits_for_another_worker(self):
+        flight = SingleFlight("test", distributed=True)
+        # the lock of a call another worker is making
+        cache.add(flight.lock_key("key"), "other", timeout=10)
+        threading.Timer(0.1, cache.delete, args=[flight.lock_key("key")]).start()
+        started = time.monotonic()
+        func = mock.Mock(return_value="result")
+        self.assertEqual(flight.do("key", func), "result")
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        func.assert_called_once()
+
+    @override_settings(SINGLE_FLIGHT_LOCK_TIMEOUT=0.1)
+    def test_distributed_call_is_made_when_the_lock_outlives_the_wait(self):
+        flight = SingleFlight("test", distributed=True)
+        cache.add(flight.lock_key("key"), "other", timeout=10)
+        self.assertEqual(flight.do("key", lambda: "result"), "result")
+        self.assertEqual(cache.get(flight.lock_key("key")), "other")
+
+    def test_async_calls_are_shared(self):
+        flight = SingleFlight("test", distributed=True)
+        calls = []
+
+        async def func():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"id": 1}
+
+        async def gather():
+            return await asyncio.gather(*(flight.ado("key", func) for _ in range(8)))
+
+        results = async_to_sync(gather)()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight._tasks, {})
+        self.assertIsNone(cache.get(flight.lock_key("key")))
@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings, tag
+from django.urls import reverse
+from rest_framework import status
+
+from app.account.models import AccountModel
+from app.account.tests.base_test_case import AccountTestCase
+from core.instrumentation import normalize_sql, slow_query_log
+from core.instrumentation.slow_queries import (
+    can_explain,
+    redact_plan,
+    seq_scans,
+)
+
+
+@tag("core.slow_queries")
+class TestNormalization(SimpleTestCase):
+    def test_literals_are_replaced(self):
+        self.assertEqual(
+            normalize_sql(
+                "SELECT *  FROM user_accounts\n WHERE email = 'a@b.com' AND id IN "
+                "(%s, %s, %s) LIMIT 21"
+            ),
+            "SELECT * FROM user_accounts WHERE email = ? AND id IN (...) LIMIT ?",
+        )
+
+    def test_only_reads_are_explained(self):
+        self.assertTrue(can_explain("SELECT 1", False, "postgresql"))
+        self.assertFalse(
+            can_explain("UPDATE user_accounts SET x = 1", False, "postgresql")
+        )
+        self.assertFalse(can_explain("SELECT 1 FOR UPDATE", False, "postgresql"))
+        self.assertFalse(can_explain("SELECT 1", True, "postgresql"))
+        self.assertFalse(can_explain("SELECT 1", False, "sqlite"))
+
+    def test_plan_values_are_redacted(self):
+        plan = (
+            "Limit  (cost=0.00..8.29 rows=1 width=64)\n"
+            "  ->  Index Scan using email_idx on user_accounts  (cost=0.28..8.29)\n"
+            "        Index Cond: ((email)::text = 'a@b.com'::text)\n"
+            "        Filter: (phone_id = 233244000000)"
+        )
+        self.assertEqual(
+            redact_plan(plan),
+            "Limit  (cost=0.00..8.29 rows=1 width=64)\n"
+            "  ->  Index Scan using email_idx on user_accounts  (cost=0.28..8.29)\n"
+            "        Index Cond: ((email)::text = ?::text)\n"
+            "        Filter: (phone_id = ?)",
+        )
+
+    def test_seq_scans(self):
+        plan = "Seq Scan on user_accounts  (cost=0.00..1.01 rows=1)\n  Filter: x"
+        self.assertEqual(seq_scans(plan), ["user_accounts"])
+
+
+@tag("core.slow_queries")
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1.0)
+class TestSlowQueryLog(AccountTestCase):
+    def setUp(self):
+        super().setUp()
+        # the wrapper is installed when the connection is created
+        connection.ensure_connection()
+        self.assertIn(slow_query_log, connection.execute_wrappers)
+        slow_query_log.clear()
+
+    def slow_account_queries(self):
+        return [
+            entry
+            for entry in slow_query_log.entries()
+            if 'FROM "user_accounts"' in entry["sql"]
+        ]
+
+    def test_slow_queries_are_recorded_with_plan(self):
+        list(AccountModel.objects.filter(comment="someone@example.com"))
+        list(AccountModel.objects.filter(comment="another@example.com"))
+        (entry,) = self.slow_account_queries()
+        self.assertEqual(entry["count"], 2)
+        self.assertNotIn("example.com", entry["sql"])
+        self.assertIn("Buffers", entry["plan"])
+        self.assertNotIn("example.com", entry["plan"])
+        self.assertIn("user_accounts", entry["seq_scans"])
+        self.assertTrue(entry["call_sites"][0].startswith("core/tests/"))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_disabled(self):
+        list(AccountModel.objects.all())
+        self.assertEqual(self.slow_account_queries(), [])
+
+    def test_call_site_skips_the_repository(self):
+        self.account_repository.find_by_id(self.account_model.id)
+        (entry,) = self.slow_account_queries()
+        self.assertTrue(entry["call_sites"][0].startswith("core/tests/"))
+
+    def test_command(self):
+        list(AccountModel.objects.all())
+        output = StringIO()
+        call_command("slow_queries", "--plans", stdout=output)
+        self.assertIn("user_accounts", output.getvalue())
+        call_command("slow_queries", "--clear", stdout=StringIO())
+        self.assertIsNone(cache.get("slow_queries"))
+
+    def test_view_slow_queries(self):
+        self.jwt_decode.return_value = self.mock_decode_token(
+            id_=self.super_admin_model.id
+        )
+        response = self.client.get(
+            f"{reverse('view_slow_queries')}?order_by=count", headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(response.json()["count"], 0)
+
+    def test_view_slow_queries_permission_exc(self):
+        self.jwt_decode.return_value = self.mock_decode_token()
+        response = self.client.get(reverse("view_slow_queries"), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,193 @@
+import json
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, tag
+from kafka.errors import KafkaTimeoutError
+
+from core.exceptions import AppException
+from core.metrics import kafka_spool_replays
+from core.producer import publish_to_kafka
+from core.spool import KafkaSpool, SpooledRecord, SpoolReplayer
+
+
+@tag("core.spool")
+class TestKafkaSpool(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = str(Path(directory) / "kafka.spool")
+        self.spool = KafkaSpool(path=self.path, capacity=4096)
+        self.addCleanup(self.spool.close)
+
+    def record(self, index: int = 0, size: int = 10) -> SpooledRecord:
+        return SpooledRecord(
+            topic="email",
+            value=bytes([index % 256]) * size,
+            key=f"account-{index}",
+            headers=[("content-type", b"application/json")],
+        )
+
+    def test_append_and_read(self):
+        records = [self.record(index) for index in range(3)]
+        for record in records:
+            self.spool.append(record)
+        read, _ = self.spool.read(limit=10)
+        self.assertEqual(read, records)
+
+    def test_read_in_batches(self):
+        for index in range(5):
+            self.spool.append(self.record(index))
+        read, offset = self.spool.read(limit=2)
+        self.assertEqual(read, [self.record(0), self.record(1)])
+        self.spool.commit(offset)
+        read, _ = self.spool.read(limit=10)
+        self.assertEqual(read, [self.record(index) for index in range(2, 5)])
+
+    def test_checkpoint_survives_reopening(self):
+        for index in range(3):
+            self.spool.append(self.record(index))
+        _, offset = self.spool.read(limit=1)
+        self.spool.commit(offset)
+        self.spool.close()
+        reopened = KafkaSpool(path=self.path, capacity=4096)
+        self.addCleanup(reopened.close)
+        read, _ = reopened.read(limit=10)
+        self.assertEqual(read, [self.record(1), self.record(2)])
+
+    def test_spool_rewinds_when_drained(self):
+        self.spool.append(self.record())
+        _, offset = self.spool.read(limit=10)
+        self.spool.commit(offset)
+        self.assertEqual(self.spool.pending_bytes(), 0)
+        with self.spool.locked() as spool_map:
+            self.assertEqual(self.spool.tail(spool_map), 16)
+
+    def test_unfinished_record_is_not_read(self):
+        self.spool.append(self.record(0))
+        with self.spool.locked() as spool_map:
+            # a record written without moving the tail, as after a crash
+            tail = self.spool.tail(spool_map)
+            spool_map[tail : tail + 8] = b"\x00\x00\x00\x10\xde\xad\xbe\xef"
+        read, _ = self.spool.read(limit=10)
+        self.assertEqual(read, [self.record(0)])
+
+    def test_corrupt_record_is_skipped(self):
+        self.spool.append(self.record(0))
+        with self.spool.locked() as spool_map:
+            spool_map[30] = spool_map[30] ^ 0xFF
+        read, offset = self.spool.read(limit=10)
+        self.assertEqual(read, [])
+        self.spool.commit(offset)
+        self.assertEqual(self.spool.pending_bytes(), 0)
+
+    def test_full_spool_raises(self):
+        with self.assertRaises(AppException.InternalServerException):
+            self.spool.append(self.record(size=5000))
+
+    def test_replay_sends_and_checkpoints(self):
+        send, flush = mock.Mock(), mock.Mock()
+        replayer = SpoolReplayer(spool=self.spool, send=send, flush=flush)
+        for index in range(5):
+            self.spool.append(self.record(index))
+        replayed = kafka_spool_replays.snapshot().get('["replayed"]', 0)
+        self.assertEqual(replayer.replay(batch_size=2), 5)
+        self.assertEqual(send.call_count, 5)
+        self.assertEqual(flush.call_count, 3)
+        self.assertEqual(self.spool.pending_bytes(), 0)
+        self.assertEqual(kafka_spool_replays.snapshot()['["replayed"]'] - replayed, 5)
+
+    def test_failed_replay_keeps_records(self):
+        replayer = SpoolReplayer(
+            spool=self.spool,
+            send=mock.Mock(),
+            flush=mock.Mock(side_effect=KafkaTimeoutError()),
+        )
+        self.spool.append(self.record())
+        with self.assertRaises(KafkaTimeoutError):
+            replayer.replay()
+        read, _ = self.spool.read(limit=10)
+        self.assertEqual(read, [self.record()])
+
+    def test_replay_checkpoints_delivered_records_only(self):
+        futures = [mock.Mock() for _ in range(4)]
+        futures[2].get.side_effect = KafkaTimeoutError()
+        replayer = SpoolReplayer(
+            spool=self.spool, send=mock.Mock(side_effect=futures), flush=mock.Mock()
+        )
+        for index in range(4):
+            self.spool.append(self.record(index))
+        before = kafka_spool_replays.snapshot()
+        with self.assertRaises(AppException.InternalServerException):
+            replayer.replay()
+        read, _ = self.spool.read(limit=10)
+        self.assertEqual(read, [self.record(2), self.record(3)])
+        after = kafka_spool_replays.snapshot()
+        for outcome in ("replayed", "failed"):
+            key = json.dumps([outcome])
+            self.assertEqual(after[key] - before.get(key, 0), 2, outcome)
+
+    def test_stats_read_the_spool_file(self):
+        for index in range(3):
+            self.spool.append(self.record(index))
+        _, offset = self.spool.read(limit=1)
+        self.spool.commit(offset)
+        # another process reports what this one spooled
+        other = KafkaSpool(path=self.path, capacity=4096)
+        self.addCleanup(other.close)
+        stats = other.stats()
+        self.assertEqual(stats["pending_records"], 2)
+        self.assertEqual(stats["pending_bytes"], self.spool.pending_bytes())
+        output = StringIO()
+        with mock.patch("core.management.commands.replay_kafka_spool.spool", other):
+            call_command("replay_kafka_spool", "--stats", stdout=output)
+        self.assertIn("pending_records: 2", output.getvalue())
+
+    def test_replays_are_exclusive(self):
+        replayer = SpoolReplayer(spool=self.spool, send=mock.Mock(), flush=mock.Mock())
+        self.spool.append(self.record())
+        with self.spool.replaying():
+            replay = threading.Thread(target=replayer.replay)
+            replay.start()
+            replay.join(0.05)
+            self.assertTrue(replay.is_alive())
+            self.assertEqual(len(self.spool.read(limit=10)[0]), 1)
+        replay.join(5)
+        self.assertEqual(self.spool.pending_bytes(), 0)
+
+
+@tag("core.spool")
+class TestPublishSpooling(SimpleTestCase):
+    def setUp(self):
+        producer_ = mock.patch(
+            "core.producer.get_producer", side_effect=KafkaTimeoutError()
+        )
+        self.addCleanup(producer_.stop)
+        producer_.start()
+        replayer_ = mock.patch("core.producer.replayer")
+        self.addCleanup(replayer_.stop)
+        self.replayer = replayer_.start()
+
+    def test_publish_spools_when_kafka_is_unavailable(self):
+        result = publish_to_kafka(topic="email", value={"otp": "1"}, key="id")
+        self.assertTrue(result.spooled)
+        record = self.replayer.spool_record.call_args.args[0]
+        self.assertEqual(record.topic, "email")
+        self.assertEqual(record.value, b'{"otp":"1"}')
+        self.assertEqual(record.key, "id")
+
+    def test_publish_raises_when_spooling_fails(self):
+        self.replayer.spool_record.side_effect = OSError("disk full")
+        with self.assertRaises(AppException.InternalServerException):
+            publish_to_kafka(topic="email", value={})
+
+    def test_publish_raises_when_spool_disabled(self):
+        with self.settings(KAFKA_SPOOL_ENABLED=False):
+            with self.assertRaises(AppException.InternalServerException):
+                publish_to_kafka(topic="email", value={})
+        self.replayer.spool_record.assert_not_called()
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings, tag
+
+from core.notifications import (
+    EmailNotificationHandler,
+    SMSNotificationHandler,
+)
+from core.notifications.system_sender import (
+    SYSTEM_SENDER_KEY,
+    get_system_sender_id,
+    reset_system_sender_id,
+)
+from tests import BaseTestCase
+
+
+@tag("core.system_sender")
+class TestSystemSender(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_system_sender_id()
+        self.addCleanup(reset_system_sender_id)
+        self.super_admin = (
+            get_user_model()
+            .objects.filter(is_superuser=True)
+            .order_by("created_at")
+            .first()
+        )
+
+    def test_sender_is_resolved_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_system_sender_id(), str(self.super_admin.id))
+            self.assertEqual(get_system_sender_id(), str(self.super_admin.id))
+
+    @override_settings(NOTIFICATION_SENDER_ID="configured-sender")
+    def test_configured_sender(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(get_system_sender_id(), "configured-sender")
+
+    def test_superuser_change_invalidates_sender(self):
+        get_system_sender_id()
+        self.super_admin.save()
+        with self.assertNumQueries(1):
+            get_system_sender_id()
+
+    def test_superuser_change_invalidates_other_workers(self):
+        get_system_sender_id()
+        self.super_admin.save()
+        self.assertIsNone(cache.get(SYSTEM_SENDER_KEY))
+
+    def test_notifications_send_without_queries(self):
+        get_system_sender_id()
+        with self.assertNumQueries(0):
+            EmailNotificationHandler(
+                recipients=["user@example.com"],
+                template_name=None,
+                plain_text="your code is 123456",
+                metadata={"subject": "otp"},
+            ).send()
+            SMSNotificationHandler(
+                recipients=["0244000000"], plain_text="your code is 123456"
+            ).send()
+        email = self.kafka_email.call_args.kwargs.get("value")
+        sms = self.kafka_sms.call_args.kwargs.get("value")
+        self.assertEqual(email.get("user_id"), str(self.super_admin.id))
+        self.assertEqual(sms.get("user_id"), str(self.super_admin.id))
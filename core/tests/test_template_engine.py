@@ -0,0 +1,77 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, override_settings, tag
+
+from core.exceptions import AppException
+from core.notifications.template_engine import (
+    NotificationTemplateEngine,
+    minify_html,
+)
+
+LOCMEM_TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "OPTIONS": {
+            "loaders": [
+                (
+                    "django.template.loaders.locmem.Loader",
+                    {
+                        "base.html": "<html>\n  <body>{% block content %}{% endblock %}"
+                        "<p>{{ footer }}</p></body>\n</html>",
+                        "child.html": '{% extends "base.html" %}'
+                        "{% block content %}<p>Dear {{ email }}</p>{% endblock %}",
+                        "filtered.html": "<p>{{ email|upper }}</p>",
+                    },
+                )
+            ]
+        },
+    }
+]
+
+
+@tag("core.notifications.template_engine")
+class TestNotificationTemplateEngine(SimpleTestCase):
+    def setUp(self):
+        self.engine = NotificationTemplateEngine()
+        self.context = {"email": "<user>@example.com", "otp": "098765"}
+
+    def test_render_matches_django(self):
+        name = "email/account_otp_code.html"
+        self.assertTrue(self.engine.get(name).is_precompiled)
+        self.assertEqual(
+            self.engine.render(name, self.context),
+            minify_html(render_to_string(name, self.context)),
+        )
+        self.assertIn(
+            "&lt;user&gt;@example.com", self.engine.render(name, self.context)
+        )
+
+    def test_render_text_template_is_not_minified(self):
+        name = "sms/account_otp_code.txt"
+        self.assertEqual(
+            self.engine.render(name, self.context),
+            render_to_string(name, self.context),
+        )
+
+    @override_settings(TEMPLATES=LOCMEM_TEMPLATES)
+    def test_render_inherited_template(self):
+        template = self.engine.get("child.html")
+        self.assertTrue(template.is_precompiled)
+        self.assertEqual(
+            template.render({"email": "a@b.com"}),
+            "<html><body><p>Dear a@b.com</p><p></p></body></html>",
+        )
+
+    @override_settings(TEMPLATES=LOCMEM_TEMPLATES)
+    def test_render_falls_back_to_django(self):
+        template = self.engine.get("filtered.html")
+        self.assertFalse(template.is_precompiled)
+        self.assertEqual(template.render({"email": "a@b.com"}), "<p>A@B.COM</p>")
+
+    def test_render_missing_template_exc(self):
+        with self.assertRaises(AppException.InternalServerException):
+            self.engine.render("email/missing.html", self.context)
+
+    def test_load_missing_template_exc(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.engine.load(["email/missing.html"])
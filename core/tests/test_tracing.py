@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    override_settings,
+    tag,
+)
+
+from core.codecs import get_codec
+from core.producer import message_headers
+from core.tracing import (
+    BatchSpanProcessor,
+    FileSpanExporter,
+    TracingMiddleware,
+    current_span,
+    current_traceparent,
+    parse_traceparent,
+    start_span,
+    traced_methods,
+    use_span,
+)
+
+TRACEPARENT = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+@tag("core.tracing")
+@override_settings(TRACING_EXPORTER="file", TRACING_SAMPLE_RATE=1.0)
+class TestSpans(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("core.tracing.span.span_processor")
+        self.processor = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ended(self):
+        return [call.args[0] for call in self.processor.on_end.call_args_list]
+
+    def test_parse_traceparent(self):
+        self.assertEqual(
+            parse_traceparent(TRACEPARENT),
+            ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True),
+        )
+        self.assertIsNone(parse_traceparent("00-abc-def-01"))
+        self.assertIsNone(parse_traceparent(f"00-{'0' * 32}-00f067aa0ba902b7-01"))
+        self.assertIsNone(parse_traceparent(None))
+
+    def test_child_spans_share_the_trace(self):
+        with start_span("parent") as parent:
+            with start_span("child", kind="client") as child:
+                self.assertIs(current_span(), child)
+            self.assertIs(current_span(), parent)
+        self.assertIsNone(current_span())
+        self.assertEqual(child.trace_id, parent.trace_id)
+        self.assertEqual(child.parent_id, parent.span_id)
+        self.assertIsNone(parent.parent_id)
+        self.assertEqual([span.name for span in self.ended()], ["child", "parent"])
+
+    def test_incoming_traceparent_is_continued(self):
+        with start_span("server", traceparent=TRACEPARENT) as span:
+            self.assertEqual(span.trace_id, "4bf92f3577b34da6a3ce929d0e0e4736")
+            self.assertEqual(span.parent_id, "00f067aa0ba902b7")
+            self.assertEqual(
+                current_traceparent(),
+                f"00-4bf92f3577b34da6a3ce929d0e0e4736-{span.span_id}-01",
+            )
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(ValueError):
+            with start_span("failing"):
+                raise ValueError("boom")
+        self.assertEqual(self.ended()[0].error, "ValueError: boom")
+
+    def test_unsampled_traces_are_propagated_but_not_recorded(self):
+        unsampled = TRACEPARENT[:-2] + "00"
+        with start_span("server", traceparent=unsampled) as span:
+            with start_span("child") as child:
+                self.assertIs(child, span)
+            self.assertEqual(current_traceparent()[-2:], "00")
+        self.processor.on_end.assert_not_called()
+
+    @override_settings(TRACING_EXPORTER="none")
+    def test_nothing_is_recorded_when_disabled(self):
+        with start_span("server") as span:
+            self.assertIsNone(span)
+        with start_span("server", traceparent=TRACEPARENT) as span:
+            self.assertFalse(span.recording)
+        self.processor.on_end.assert_not_called()
+
+    def test_traced_methods(self):
+        @traced_methods(kind="client")
+        class Service:
+            def call(self):
+                return current_span()
+
+        span = Service().call()
+        self.assertEqual(span.name, "Service.call")
+        self.assertEqual(span.kind, "client")
+
+    def test_use_span_carries_the_trace(self):
+        with start_span("parent") as parent:
+            pass
+        with use_span(parent):
+            with start_span("worker") as span:
+                self.assertEqual(span.parent_id, parent.span_id)
+
+    def test_traceparent_travels_in_kafka_headers(self):
+        codec = get_codec()
+        self.assertNotIn("traceparent", dict(message_headers(codec, 1)))
+        with start_span("publish") as span:
+            headers = dict(message_headers(codec, 1))
+        self.assertEqual(headers["traceparent"], span.traceparent.encode())
+
+    def test_middleware_opens_the_server_span(self):
+        request = RequestFactory().get(
+            "/api/v1/accounts/", HTTP_TRACEPARENT=TRACEPARENT
+        )
+        response = TracingMiddleware(lambda request: HttpResponse(status=204))(request)
+        self.assertEqual(response.status_code, 204)
+        (span,) = self.ended()
+        self.assertEqual(span.kind, "server")
+        self.assertEqual(span.trace_id, "4bf92f3577b34da6a3ce929d0e0e4736")
+        self.assertEqual(span.attributes["http.status_code"], 204)
+
+
+@tag("core.tracing")
+@override_settings(TRACING_EXPORTER="file", TRACING_SAMPLE_RATE=1.0)
+class TestExport(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "spans.jsonl")
+
+    def test_file_exporter_writes_otlp_spans(self):
+        processor = BatchSpanProcessor()
+        processor.exporter = FileSpanExporter(self.path)
+        processor._pid = os.getpid()
+        with mock.patch("core.tracing.span.span_processor", processor):
+            with start_span("server", attributes={"http.method": "GET"}):
+                with start_span("child"):
+                    pass
+        processor.shutdown()
+        with open(self.path) as spans_file:
+            spans = [json.loads(line) for line in spans_file]
+        self.assertEqual([span["name"] for span in spans], ["child", "server"])
+        self.assertEqual(spans[0]["parentSpanId"], spans[1]["spanId"])
+
+    def test_full_queue_drops_spans(self):
+        processor = BatchSpanProcessor(maxsize=1)
+        processor._pid = os.getpid()
+        processor.on_end(object())
+        processor.on_end(object())
+        self.assertEqual(processor.dropped, 1)
@@ -0,0 +1,17 @@
+from .exporters import (
+    BatchSpanProcessor,
+    FileSpanExporter,
+    OtlpHttpSpanExporter,
+    span_processor,
+)
+from .middleware import TracingMiddleware
+from .span import (
+    Span,
+    current_span,
+    current_traceparent,
+    parse_traceparent,
+    start_span,
+    traced,
+    traced_methods,
+    use_span,
+)
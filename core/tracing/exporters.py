@@ -0,0 +1,196 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import urllib.request
+from typing import List
+
+from django.conf import settings
+from loguru import logger
+
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+
+def attribute_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_span(span) -> dict:
+    """
+    the span in the OTLP/JSON encoding
+    """
+    data = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": SPAN_KINDS.get(span.kind, 1),
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [
+            {"key": key, "value": attribute_value(value)}
+            for key, value in span.attributes.items()
+        ],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    return data
+
+
+def otlp_request(spans: list) -> dict:
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {
+                            "key": "service.name",
+                            "value": {"stringValue": settings.TRACING_SERVICE_NAME},
+                        }
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "core.tracing"},
+                        "spans": [otlp_span(span) for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class FileSpanExporter:
+    """
+    appends the spans to a file, one OTLP/JSON span per line
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a") as trace_file:
+            trace_file.write(
+                "".join(
+                    json.dumps(otlp_span(span), separators=(",", ":")) + "\n"
+                    for span in spans
+                )
+            )
+
+
+class OtlpHttpSpanExporter:
+    """
+    posts the spans to an OTLP/HTTP collector (JSON encoding)
+    """
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans: list):
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(otlp_request(spans), separators=(",", ":")).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def get_exporter():
+    if settings.TRACING_EXPORTER == "file":
+        return FileSpanExporter(settings.TRACING_FILE_PATH)
+    if settings.TRACING_EXPORTER == "otlp":
+        return OtlpHttpSpanExporter(settings.TRACING_OTLP_ENDPOINT)
+    return None
+
+
+class BatchSpanProcessor:
+    """
+    Collects ended spans on a bounded queue and exports them in batches from a
+    background thread, so ending a span never waits on the exporter. Spans
+    are dropped (and counted) when the queue is full. The thread is started
+    on first use and again after a fork.
+    """
+
+    def __init__(self, maxsize: int = 2048, batch_size: int = 256, interval=2.0):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.interval = interval
+        self.exporter = None
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def on_end(self, span):
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return None
+            self._queue = queue.Queue(maxsize=self.maxsize)
+            self.exporter = get_exporter()
+            threading.Thread(target=self.run, name="span-exporter", daemon=True).start()
+            self._pid = os.getpid()
+        return None
+
+    def run(self):
+        while True:
+            batch = self.drain(timeout=self.interval)
+            if batch:
+                self.export(batch)
+
+    def drain(self, timeout: float = None) -> List:
+        batch = []
+        try:
+            batch.append(
+                self._queue.get(timeout=timeout)
+                if timeout
+                else self._queue.get_nowait()
+            )
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def export(self, spans: list):
+        if self.exporter is None:
+            return None
+        try:
+            self.exporter.export(spans)
+        except Exception as exc:
+            logger.warning(f"{len(spans)} spans not exported: {exc}")
+        return None
+
+    def shutdown(self):
+        """
+        export what is left on the queue
+        """
+        if self._pid != os.getpid():
+            return None
+        while True:
+            batch = self.drain()
+            if not batch:
+                return None
+            self.export(batch)
+
+
+span_processor = BatchSpanProcessor()
+atexit.register(span_processor.shutdown)
@@ -0,0 +1,50 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .span import start_span
+
+
+class TracingMiddleware:
+    """
+    opens the server span of every request, continuing the trace of an
+    incoming W3C traceparent header
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with self.start_span(request) as span:
+            response = self.get_response(request)
+            self.end_span(span, request, response)
+        return response
+
+    async def __acall__(self, request):
+        with self.start_span(request) as span:
+            response = await self.get_response(request)
+            self.end_span(span, request, response)
+        return response
+
+    # noinspection PyMethodMayBeStatic
+    def start_span(self, request):
+        return start_span(
+            f"{request.method} {request.path}",
+            kind="server",
+            traceparent=request.headers.get("traceparent"),
+            attributes={"http.method": request.method, "http.target": request.path},
+        )
+
+    # noinspection PyMethodMayBeStatic
+    def end_span(self, span, request, response):
+        if span is not None and span.recording:
+            resolver_match = getattr(request, "resolver_match", None)
+            if resolver_match is not None:
+                span.name = f"{request.method} {resolver_match.route}"
+            span.set_attribute("http.status_code", response.status_code)
@@ -0,0 +1,203 @@
+import functools
+import inspect
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+
+from .exporters import span_processor
+
+TRACEPARENT_PATTERN = re.compile(
+    r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$", re.IGNORECASE
+)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    a timed operation of a trace. spans of unsampled traces are not recording,
+    they only carry the trace context so it can be propagated.
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "kind",
+        "recording",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        recording: bool = True,
+        kind: str = "internal",
+        attributes: dict = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.recording = recording
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.recording else '00'}"
+
+    def set_attribute(self, key: str, value):
+        if self.recording:
+            self.attributes[key] = value
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        if self.recording:
+            span_processor.on_end(self)
+
+
+def parse_traceparent(traceparent: Optional[str]):
+    """
+    :return: the trace id, parent span id and sampled flag of a W3C traceparent
+    header, or None when the header is missing or malformed
+    """
+    match = TRACEPARENT_PATTERN.match((traceparent or "").strip())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    return trace_id.lower(), parent_id.lower(), bool(int(flags, 16) & 1)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    span = _current_span.get()
+    return span.traceparent if span else None
+
+
+@contextmanager
+def use_span(span: Optional[Span]):
+    """
+    make span the current span of the block without ending it, e.g to carry a
+    trace into a worker thread
+    """
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_span(
+    name: str, kind: str = "internal", traceparent: str = None, attributes: dict = None
+):
+    """
+    open a span as child of the current span, of the traceparent or, without
+    either, as the root of a new trace sampled at TRACING_SAMPLE_RATE. inside
+    an unsampled trace no span is opened, the current span stays current.
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        if not parent.recording:
+            yield parent
+            return
+        span = Span(name, parent.trace_id, parent.span_id, kind=kind)
+    else:
+        context = parse_traceparent(traceparent)
+        if context is None and settings.TRACING_EXPORTER == "none":
+            yield None
+            return
+        if context is not None:
+            trace_id, parent_id, sampled = context
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = random.random() < settings.TRACING_SAMPLE_RATE
+        recording = sampled and settings.TRACING_EXPORTER != "none"
+        span = Span(name, trace_id, parent_id, recording, kind)
+    if span.recording and attributes:
+        span.attributes.update(attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def traced(name: str = None, kind: str = "internal"):
+    """
+    decorator running the function in a span named after it
+    """
+
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def ainner(*args, **kwargs):
+                with start_span(span_name, kind=kind):
+                    return await func(*args, **kwargs)
+
+            return ainner
+
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with start_span(span_name, kind=kind):
+                return func(*args, **kwargs)
+
+        return inner
+
+    return decorate
+
+
+def traced_methods(kind: str = "internal"):
+    """
+    class decorator running every public method defined on the class in a span
+    named after the class of the instance and the method
+    """
+
+    def wrap(name, method):
+        if inspect.iscoroutinefunction(method):
+
+            @functools.wraps(method)
+            async def ainner(self, *args, **kwargs):
+                with start_span(f"{type(self).__name__}.{name}", kind=kind):
+                    return await method(self, *args, **kwargs)
+
+            return ainner
+
+        @functools.wraps(method)
+        def inner(self, *args, **kwargs):
+            with start_span(f"{type(self).__name__}.{name}", kind=kind):
+                return method(self, *args, **kwargs)
+
+        return inner
+
+    def decorate(cls):
+        for name, attribute in list(vars(cls).items()):
+            if not name.startswith("_") and callable(attribute):
+                setattr(cls, name, wrap(name, attribute))
+        return cls
+
+    return decorate
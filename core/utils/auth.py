@@ -1,13 +1,17 @@
+import time
 from typing import Optional, Tuple
 
 from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from jwcrypto.jws import InvalidJWSSignature
 from jwt import PyJWTError
 from rest_framework import permissions
 from rest_framework.authentication import BaseAuthentication
 
-from app.account.models import AccountModel
+from app.account.cache import account_cache
 from core.constants import GroupEnum
 from core.exceptions import AppException
+from core.instrumentation import timed
+from core.metrics import keycloak_call_duration
 from core.services import KeycloakAuthService
 
 
@@ -23,12 +27,26 @@ class KeycloakAuthentication(BaseAuthentication, KeycloakAuthService):
                 error_message="invalid authentication scheme"
             )
         try:
-            iam_data = self.keycloak_openid.decode_token(token)
-            account = AccountModel.objects.get(pk=iam_data.get("preferred_username"))
+            with timed("keycloak"):
+                started = time.perf_counter()
+                iam_data = self.verify_token(token)
+                keycloak_call_duration.observe(
+                    time.perf_counter() - started, method="decode_token"
+                )
+            account = account_cache.get(iam_data.get("preferred_username"))
             return account, None
         except PyJWTError as exc:
             raise AppException.BadRequestException(error_message=exc.args) from exc
 
+    def verify_token(self, token: str) -> dict:
+        try:
+            return self.keycloak_openid.decode_token(token)
+        except InvalidJWSSignature:
+            # signed with a key the realm rotated in after it was fetched
+            if not self.keycloak_openid.rotate_public_key():
+                raise
+            return self.keycloak_openid.decode_token(token)
+
     def get_authorization_scheme(
         self, authorization_value: Optional[str]
     ) -> Tuple[str, str]:
@@ -56,7 +74,7 @@ class IsSuperAdmin(permissions.BasePermission):
 
     def has_permission(self, request, view):
         if request.user.is_authenticated:
-            return GroupEnum.super_admin.value in [
-                group.name for group in request.user.groups.all()
-            ]
+            return GroupEnum.super_admin.value in account_cache.group_names(
+                request.user
+            )
         return False
@@ -1,3 +1,4 @@
+import functools
 from typing import Any
 
 from drf_spectacular.utils import (
@@ -10,9 +11,12 @@ from rest_framework.pagination import PageNumberPagination
 from core.exceptions import AppException, exception_message
 
 
-def api_responses(status_codes: list, schema: Any):
-    responses = {}
-    over_all_exceptions = {
+@functools.lru_cache(maxsize=None)
+def exception_responses() -> dict:
+    """
+    the documented error responses, built once and shared by every view
+    """
+    return {
         400: OpenApiResponse(
             description="exception caused by invalid client requests",
             response=OpenApiTypes.OBJECT,
@@ -118,6 +122,11 @@ def api_responses(status_codes: list, schema: Any):
             ],
         ),
     }
+
+
+def api_responses(status_codes: list, schema: Any):
+    responses = {}
+    over_all_exceptions = exception_responses()
     for code in status_codes:
         if over_all_exceptions.get(code):
             responses[code] = over_all_exceptions.get(code)
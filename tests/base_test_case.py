@@ -1,10 +1,12 @@
 from unittest import mock
 
+from django.core.cache import cache
 from rest_framework.test import APIRequestFactory, APITestCase
 
 
 class BaseTestCase(APITestCase):
     def setUp(self):
+        self.addCleanup(cache.clear)
         self.setup_test_data()
         self.setup_patches()
         self.instantiate_classes()
@@ -33,3 +35,8 @@ class BaseTestCase(APITestCase):
         )
         self.addCleanup(kafka_sms_.stop)
         self.kafka_sms = kafka_sms_.start()
+        kafka_event_ = mock.patch(
+            "core.event.event_notification_handler.publish_to_kafka"
+        )
+        self.addCleanup(kafka_event_.stop)
+        self.kafka_event = kafka_event_.start()
@@ -0,0 +1,82 @@
+"""
+Run the micro-benchmarks of tests/benchmarks against the test database and
+store the results, which tests.benchmarks.compare compares with an earlier run.
+
+usage: DJANGO_SETTINGS_MODULE=config.settings.testing python -m tests.benchmarks
+    [-k repository] [--rounds 20] [--output benchmarks/results/micro.json]
+
+the settings module has to be set up front, importing the tests package needs
+configured settings
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import django
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-k", dest="keyword", help="only run matching benchmarks")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.005, help="seconds")
+    parser.add_argument("--output", default="benchmarks/results/micro.json")
+    args = parser.parse_args()
+
+    django.setup()
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    from tests.benchmarks import BenchmarkSession
+
+    setup_test_environment()
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        session = BenchmarkSession(rounds=args.rounds, min_time=args.min_time)
+        results = session.run(keyword=args.keyword)
+    finally:
+        teardown_databases(databases, verbosity=0)
+        teardown_test_environment()
+
+    print(f"{'benchmark':<58}{'median':>12}{'stddev':>12}{'ops/s':>12}")
+    for name, stats in results.items():
+        print(
+            f"{name:<58}{stats['median'] * 1e6:>10.1f}us"
+            f"{stats['stddev'] * 1e6:>10.1f}us{stats['ops']:>12.0f}"
+        )
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as output_file:
+        json.dump(
+            {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": sys.version.split()[0],
+                "benchmarks": results,
+            },
+            output_file,
+            indent=2,
+        )
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
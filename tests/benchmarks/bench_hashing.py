@@ -0,0 +1,17 @@
+from django.contrib.auth.hashers import check_password, make_password
+
+from app.account.models import AccountModel
+
+from .data import APIKEY, PASSWORD
+
+
+def bench_hash_apikey(benchmark):
+    benchmark(AccountModel.hash_apikey, APIKEY)
+
+
+def bench_make_password(benchmark):
+    benchmark(make_password, PASSWORD)
+
+
+def bench_check_password(benchmark):
+    benchmark(check_password, PASSWORD, make_password(PASSWORD))
@@ -0,0 +1,17 @@
+from app.account.repository import AccountRepository
+
+from .data import seed_accounts
+
+
+def bench_find(benchmark):
+    seeded = seed_accounts(1000)
+    benchmark(AccountRepository().find, {"email": seeded[500].email})
+
+
+def bench_update_by_id(benchmark):
+    seeded = seed_accounts(1000)
+    benchmark(
+        AccountRepository().update_by_id,
+        str(seeded[500].id),
+        {"is_phone_verified": True},
+    )
@@ -0,0 +1,21 @@
+from rest_framework.renderers import JSONRenderer
+
+from app.account.serializer import AccountSerializer
+from core.http import FastJSONRenderer
+
+from .data import accounts
+
+
+def serialize(instances: list):
+    return AccountSerializer(instances, many=True).data
+
+
+def bench_account_serializer(benchmark):
+    for count in (100, 1000):
+        benchmark(serialize, accounts(count), variant=f"{count} rows")
+
+
+def bench_account_rendering(benchmark):
+    data = serialize(accounts(100))
+    for renderer in (JSONRenderer(), FastJSONRenderer()):
+        benchmark(renderer.render, data, variant=type(renderer).__name__)
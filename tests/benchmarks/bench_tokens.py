@@ -0,0 +1,59 @@
+import base64
+import time
+from unittest import mock
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test import RequestFactory
+from keycloak import KeycloakOpenID
+
+from app.account.controller import AccountController
+from app.account.repository import AccountRepository
+from core.utils import KeycloakAuthentication
+from tests import MockKeycloakAuthService
+
+from .data import seed_accounts
+
+PAYLOAD = {"id": "0f0e6a1c-3c1d-4a4e-9f0e-7f4c2e9d5b11", "exp": 4102444800}
+
+
+def controller() -> AccountController:
+    return AccountController(
+        account_repository=AccountRepository(),
+        keycloak_auth_service=MockKeycloakAuthService(),
+    )
+
+
+def bench_generate_token(benchmark):
+    benchmark(controller().generate_token, PAYLOAD)
+
+
+def bench_decode_token(benchmark):
+    account_controller = controller()
+    benchmark(
+        account_controller.decode_token, account_controller.generate_token(PAYLOAD)
+    )
+
+
+def bench_keycloak_authentication(benchmark):
+    """
+    authenticate a bearer token signed with a local key, the realm public key
+    is served from memory instead of keycloak
+    """
+    (account,) = seed_accounts(1)
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_key = base64.b64encode(
+        private_key.public_key().public_bytes(
+            serialization.Encoding.DER,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    ).decode()
+    token = jwt.encode(
+        {"preferred_username": str(account.id), "exp": int(time.time()) + 3600},
+        private_key,
+        algorithm="RS256",
+    )
+    request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+    with mock.patch.object(KeycloakOpenID, "public_key", return_value=public_key):
+        benchmark(KeycloakAuthentication().authenticate, request)
@@ -0,0 +1,59 @@
+"""
+Compare two micro-benchmark results and flag the benchmarks whose median
+time grew beyond the tolerance. Exits with status 1 when any did, so it can
+gate a CI job.
+
+usage: python tests/benchmarks/compare.py baseline.json current.json
+    [--tolerance 0.10]
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline: dict, current: dict, tolerance: float):
+    """
+    :return: (name, baseline median, current median, relative change) of every
+    benchmark present in both results, and the names of the regressions
+    """
+    rows, regressions = [], []
+    for name, stats in current["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            continue
+        change = stats["median"] / before["median"] - 1
+        rows.append((name, before["median"], stats["median"], change))
+        if change > tolerance:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.10, help="allowed slowdown, 0.10 = 10%%"
+    )
+    args = parser.parse_args()
+    with open(args.baseline) as baseline_file, open(args.current) as current_file:
+        baseline, current = json.load(baseline_file), json.load(current_file)
+    rows, regressions = compare(baseline, current, args.tolerance)
+    print(
+        f"{baseline.get('commit')} -> {current.get('commit')}"
+        f" (tolerance {args.tolerance:.0%})"
+    )
+    print(f"{'benchmark':<58}{'before':>12}{'after':>12}{'change':>9}")
+    for name, before, after, change in rows:
+        flag = "  REGRESSION" if name in regressions else ""
+        print(
+            f"{name:<58}{before * 1e6:>10.1f}us{after * 1e6:>10.1f}us"
+            f"{change:>+9.1%}{flag}"
+        )
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed beyond the tolerance")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
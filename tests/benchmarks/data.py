@@ -0,0 +1,32 @@
+import uuid
+
+from django.contrib.auth.hashers import make_password
+
+from app.account.models import AccountModel
+from core.constants import AccountStatusEnum
+
+PASSWORD = "Bench-Password-1"
+APIKEY = "o2Vh3QmT8xLk5RzY1bNc7WdF0gJs4PeA9uKi6HtMq"
+
+
+def accounts(count: int, password: str = None) -> list:
+    """
+    unsaved accounts sharing a password hashed once
+    """
+    hashed = make_password(password or PASSWORD)
+    return [
+        AccountModel(
+            id=uuid.uuid4(),
+            username=f"bench-{index}",
+            email=f"bench-{index}@example.com",
+            phone=f"+2000{index:08d}",
+            password=hashed,
+            iam_provider_id=str(uuid.uuid4()),
+            status=AccountStatusEnum.active.value,
+        )
+        for index in range(count)
+    ]
+
+
+def seed_accounts(count: int) -> list:
+    return AccountModel.objects.bulk_create(accounts(count))
@@ -0,0 +1,109 @@
+"""
+A small benchmark runner in the style of pytest-benchmark. A benchmark is a
+function named bench_* in a tests/benchmarks/bench_*.py module, taking the
+benchmark fixture and calling it with the code to measure, e.g
+
+    def bench_hash_apikey(benchmark):
+        benchmark(AccountModel.hash_apikey, APIKEY)
+"""
+import importlib
+import inspect
+import pkgutil
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from django.db import transaction
+
+
+class Benchmark:
+    """
+    Times a callable over a number of rounds. The number of calls per round
+    is calibrated so a round lasts at least min_time, which keeps the timer
+    resolution out of the results of sub-microsecond code.
+    """
+
+    def __init__(
+        self,
+        session: "BenchmarkSession",
+        name: str,
+        rounds: int,
+        min_time: float,
+        warmup: int = 1,
+    ):
+        self.session = session
+        self.name = name
+        self.rounds = rounds
+        self.min_time = min_time
+        self.warmup = warmup
+
+    def __call__(self, func: Callable, *args, variant: str = None, **kwargs):
+        name = f"{self.name}[{variant}]" if variant else self.name
+        for _ in range(self.warmup):
+            result = func(*args, **kwargs)
+        iterations = self.calibrate(func, args, kwargs)
+        timings = []
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                result = func(*args, **kwargs)
+            timings.append((time.perf_counter() - started) / iterations)
+        self.session.record(name, timings, iterations)
+        return result
+
+    def calibrate(self, func: Callable, args: tuple, kwargs: dict) -> int:
+        iterations = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                func(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.min_time or iterations >= 1_000_000:
+                return iterations
+            iterations *= 10 if elapsed < self.min_time / 10 else 2
+
+
+class BenchmarkSession:
+    def __init__(self, rounds: int = 20, min_time: float = 0.005):
+        self.rounds = rounds
+        self.min_time = min_time
+        self.results: Dict[str, dict] = {}
+
+    def record(self, name: str, timings: List[float], iterations: int):
+        self.results[name] = {
+            "min": min(timings),
+            "max": max(timings),
+            "mean": statistics.fmean(timings),
+            "median": statistics.median(timings),
+            "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            "ops": 1 / statistics.median(timings),
+            "rounds": len(timings),
+            "iterations": iterations,
+        }
+
+    def run(self, package: str = "tests.benchmarks", keyword: str = None):
+        """
+        run the benchmarks of the bench_* modules of package, each inside a
+        transaction that is rolled back so seeded rows do not leak
+        """
+        module = importlib.import_module(package)
+        for module_info in pkgutil.iter_modules(module.__path__):
+            if not module_info.name.startswith("bench_"):
+                continue
+            bench_module = importlib.import_module(f"{package}.{module_info.name}")
+            for name, func in inspect.getmembers(bench_module, inspect.isfunction):
+                if (
+                    not name.startswith("bench_")
+                    or func.__module__ != bench_module.__name__
+                ):
+                    continue
+                benchmark_name = f"{module_info.name}.{name}"
+                if keyword and keyword not in benchmark_name:
+                    continue
+                benchmark = Benchmark(
+                    self, benchmark_name, rounds=self.rounds, min_time=self.min_time
+                )
+                with transaction.atomic():
+                    func(benchmark)
+                    transaction.set_rollback(True)
+        return self.results
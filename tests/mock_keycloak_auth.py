@@ -21,3 +21,12 @@ class MockKeycloakAuthService(KeycloakAuthService):
 
     def change_password(self, *args, **kwargs):
         return True
+
+    async def aget_token(self, *args, **kwargs):
+        return self.get_token(*args, **kwargs)
+
+    async def arefresh_token(self, *args, **kwargs):
+        return self.refresh_token(*args, **kwargs)
+
+    async def acreate_user(self, *args, **kwargs):
+        return self.create_user(*args, **kwargs)
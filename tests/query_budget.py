@@ -0,0 +1,341 @@
+"""
+Query-count budgets. A budget caps the SQL queries, redis commands and keycloak
+round trips a request may make; the budgets live in a JSON baseline next to the
+tests together with the SQL captured when it was recorded, so a test exceeding
+its budget fails with a diff of the queries. Run the tests with
+UPDATE_QUERY_BUDGETS=1 to rewrite the baseline from the current code, which is
+how budgets are ratcheted down after a change removes queries.
+"""
+import base64
+import difflib
+import functools
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from unittest import mock
+from urllib.parse import parse_qs
+
+import jwt
+import redis
+import requests
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from keycloak.connection import ConnectionManager
+
+from core.instrumentation import normalize_sql
+
+UPDATE_ENV = "UPDATE_QUERY_BUDGETS"
+
+
+class KeycloakStub:
+    """
+    answers the keycloak calls of python-keycloak in-process, below the client
+    so its request building and response parsing still run: the realm public
+    key, the token endpoint, introspection, user creation and password resets.
+    Tokens are RS256 JWTs signed with a key generated once per process.
+    """
+
+    _private_key = None
+
+    def __init__(self, realm: str = None, token_lifetime: int = 300):
+        self.realm = realm or settings.KEYCLOAK_REALM
+        self.token_lifetime = token_lifetime
+        if KeycloakStub._private_key is None:
+            KeycloakStub._private_key = rsa.generate_private_key(
+                public_exponent=65537, key_size=2048
+            )
+        self.private_key = KeycloakStub._private_key
+        self.public_key = base64.b64encode(
+            self.private_key.public_key().public_bytes(
+                serialization.Encoding.DER,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+        ).decode()
+        self.calls: List[str] = []
+        realm_path = rf"realms/{re.escape(self.realm)}"
+        self.routes = [
+            ("GET", rf"{realm_path}/?", self.realm_info),
+            ("POST", rf"{realm_path}/protocol/openid-connect/token", self.token),
+            (
+                "POST",
+                rf"{realm_path}/protocol/openid-connect/token/introspect",
+                self.introspect,
+            ),
+            ("POST", rf"admin/{realm_path}/users", self.create_user),
+            ("PUT", rf"admin/{realm_path}/users/[^/]+/reset-password", self.no_content),
+        ]
+
+    def issue_tokens(self, subject: str) -> dict:
+        now = int(time.time())
+        claims = {
+            "sub": subject,
+            "preferred_username": subject,
+            "iat": now,
+            "exp": now + self.token_lifetime,
+            "jti": uuid.uuid4().hex,
+        }
+        return {
+            "access_token": jwt.encode(claims, self.private_key, algorithm="RS256"),
+            "refresh_token": jwt.encode(
+                {**claims, "typ": "Refresh"}, self.private_key, algorithm="RS256"
+            ),
+            "token_type": "Bearer",
+            "expires_in": self.token_lifetime,
+            "refresh_expires_in": self.token_lifetime,
+        }
+
+    def realm_info(self, path: str, data) -> requests.Response:
+        return self.response(200, {"realm": self.realm, "public_key": self.public_key})
+
+    def token(self, path: str, data) -> requests.Response:
+        form = data if isinstance(data, dict) else parse_qs(data or "")
+        form = {
+            key: value[0] if isinstance(value, list) else value
+            for key, value in form.items()
+        }
+        if form.get("grant_type") == "refresh_token":
+            claims = jwt.decode(
+                form.get("refresh_token"),
+                self.private_key.public_key(),
+                algorithms=["RS256"],
+            )
+            return self.response(200, self.issue_tokens(claims["sub"]))
+        subject = form.get("username") or form.get("client_id")
+        return self.response(200, self.issue_tokens(subject))
+
+    def introspect(self, path: str, data) -> requests.Response:
+        return self.response(200, {"active": True})
+
+    def create_user(self, path: str, data) -> requests.Response:
+        return self.response(
+            201, headers={"Location": f"{path.rstrip('/')}/{uuid.uuid4()}"}
+        )
+
+    def no_content(self, path: str, data) -> requests.Response:
+        return self.response(204)
+
+    # noinspection PyMethodMayBeStatic
+    def response(self, status_code: int, payload=None, headers=None):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = b"" if payload is None else json.dumps(payload).encode()
+        response.headers.update({"Content-Type": "application/json", **(headers or {})})
+        return response
+
+    def dispatch(self, method: str, path: str, data=None) -> requests.Response:
+        path = path.split("?", 1)[0].lstrip("/")
+        self.calls.append(f"{method} {path}")
+        for route_method, pattern, view in self.routes:
+            if route_method == method and re.fullmatch(pattern, path):
+                return view(path, data)
+        return self.response(404, {"error": f"{method} {path} is not stubbed"})
+
+    @contextmanager
+    def installed(self):
+        stub = self
+
+        def raw_get(manager, path, **kwargs):
+            return stub.dispatch("GET", path)
+
+        def raw_post(manager, path, data, **kwargs):
+            return stub.dispatch("POST", path, data)
+
+        def raw_put(manager, path, data, **kwargs):
+            return stub.dispatch("PUT", path, data)
+
+        def raw_delete(manager, path, data=None, **kwargs):
+            return stub.dispatch("DELETE", path, data)
+
+        async def a_raw_get(manager, path, **kwargs):
+            return stub.dispatch("GET", path)
+
+        async def a_raw_post(manager, path, data, **kwargs):
+            return stub.dispatch("POST", path, data)
+
+        async def a_raw_put(manager, path, data, **kwargs):
+            return stub.dispatch("PUT", path, data)
+
+        async def a_raw_delete(manager, path, data=None, **kwargs):
+            return stub.dispatch("DELETE", path, data)
+
+        with mock.patch.multiple(
+            ConnectionManager,
+            raw_get=raw_get,
+            raw_post=raw_post,
+            raw_put=raw_put,
+            raw_delete=raw_delete,
+            a_raw_get=a_raw_get,
+            a_raw_post=a_raw_post,
+            a_raw_put=a_raw_put,
+            a_raw_delete=a_raw_delete,
+        ):
+            yield self
+
+
+@dataclass
+class CapturedCalls:
+    queries: List[str] = field(default_factory=list)
+    redis: List[str] = field(default_factory=list)
+    keycloak: List[str] = field(default_factory=list)
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "queries": len(self.queries),
+            "redis": len(self.redis),
+            "keycloak": len(self.keycloak),
+        }
+
+    def as_budget(self) -> dict:
+        return {**self.counts(), "sql": self.queries}
+
+
+@contextmanager
+def capture_calls(keycloak: KeycloakStub):
+    """
+    record the SQL, redis commands and keycloak calls made inside the block
+    """
+    captured = CapturedCalls()
+    execute_command = redis.Redis.execute_command
+
+    def counted_execute_command(client, *args, **options):
+        captured.redis.append(str(args[0]) if args else "")
+        return execute_command(client, *args, **options)
+
+    keycloak_calls = len(keycloak.calls)
+    with mock.patch.object(
+        redis.Redis, "execute_command", counted_execute_command
+    ), CaptureQueriesContext(connection) as queries:
+        yield captured
+    captured.queries.extend(
+        normalize_sql(query["sql"]) for query in queries.captured_queries
+    )
+    captured.keycloak.extend(keycloak.calls[keycloak_calls:])
+
+
+class BudgetFile:
+    """
+    the baseline of a test module, written back once after its tests ran
+    when budgets are being updated
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.updating = os.environ.get(UPDATE_ENV, "") not in ("", "0")
+        self._budgets: Optional[Dict[str, dict]] = None
+        self._dirty = False
+
+    @property
+    def budgets(self) -> Dict[str, dict]:
+        if self._budgets is None:
+            try:
+                with open(self.path) as budget_file:
+                    self._budgets = json.load(budget_file)
+            except FileNotFoundError:
+                self._budgets = {}
+        return self._budgets
+
+    def record(self, name: str, captured: CapturedCalls):
+        self.budgets[name] = captured.as_budget()
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        with open(self.path, "w") as budget_file:
+            json.dump(dict(sorted(self.budgets.items())), budget_file, indent=2)
+            budget_file.write("\n")
+        self._dirty = False
+
+
+def budget_failure(name: str, budget: dict, captured: CapturedCalls) -> str:
+    counts = captured.counts()
+    exceeded = ", ".join(
+        f"{kind} {counts[kind]} > {budget[kind]}"
+        for kind in counts
+        if budget.get(kind) is not None and counts[kind] > budget[kind]
+    )
+    diff = difflib.unified_diff(
+        budget.get("sql", []),
+        captured.queries,
+        fromfile=f"{name} (baseline)",
+        tofile=f"{name} (captured)",
+        lineterm="",
+    )
+    message = [f"{name} exceeded its budget: {exceeded}", *diff]
+    if len(message) == 1:
+        # the baseline already had these queries, the budget was lowered
+        message.append("captured SQL, same as the baseline:")
+        message.extend(f"  {query}" for query in captured.queries)
+    if counts["keycloak"] > budget.get("keycloak", counts["keycloak"]):
+        message.append("keycloak calls: " + ", ".join(captured.keycloak))
+    if counts["redis"] > budget.get("redis", counts["redis"]):
+        message.append("redis commands: " + ", ".join(captured.redis))
+    message.append(f"rerun with {UPDATE_ENV}=1 to accept the new numbers")
+    return "\n".join(message)
+
+
+class QueryBudgetMixin:
+    """
+    test case mixin enforcing the budgets of budget_file, with keycloak
+    answered by a KeycloakStub for the whole test
+    """
+
+    budget_file: BudgetFile = None
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.budget_file.save()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.keycloak = KeycloakStub()
+        installed = self.keycloak.installed()
+        installed.__enter__()
+        self.addCleanup(installed.__exit__, None, None, None)
+        super().setUp()
+
+    @contextmanager
+    def assertQueryBudget(self, name: str, **limits):
+        """
+        fail when the block makes more queries, redis commands or keycloak
+        calls than the baseline of name, limits override the baseline
+        """
+        with capture_calls(self.keycloak) as captured:
+            yield captured
+        if self.budget_file.updating:
+            self.budget_file.record(name, captured)
+            return
+        budget = self.budget_file.budgets.get(name)
+        if budget is None:
+            self.fail(f"{name} has no budget, run with {UPDATE_ENV}=1 to record it")
+        budget = {**budget, **limits}
+        counts = captured.counts()
+        if any(
+            budget.get(kind) is not None and counts[kind] > budget[kind]
+            for kind in counts
+        ):
+            self.fail(budget_failure(name, budget, captured))
+
+
+def query_budget(name: str, **limits):
+    """
+    run the decorated test inside assertQueryBudget(name)
+    """
+
+    def decorator(test):
+        @functools.wraps(test)
+        def wrapper(self, *args, **kwargs):
+            with self.assertQueryBudget(name, **limits):
+                return test(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator